@@ -29,3 +29,11 @@ admin.site.register(PasswordReset)
 admin.site.register(ContactForm)
 admin.site.register(Activity)
 admin.site.register(UserClick)
+admin.site.register(LocationClickBucket)
+admin.site.register(TrendingLocation)
+admin.site.register(CatalogVersion)
+admin.site.register(DashboardCounter)
+admin.site.register(LocationStats)
+admin.site.register(LocationDailyStats)
+admin.site.register(MonthlyReport)
+admin.site.register(ImportedRow)
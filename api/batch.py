@@ -0,0 +1,101 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/'
+
+# conditional headers belong to the batch request itself, not to the requests inside it
+SKIPPED_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE', 'CONTENT_TYPE', 'CONTENT_LENGTH')
+
+
+def get_api_path(url):
+    parts = urlsplit(url)
+
+    if parts.scheme or parts.netloc:
+        raise ValueError(f"{url} is not a relative url")
+
+    path = parts.path if parts.path.startswith(API_PREFIX) else API_PREFIX + parts.path.lstrip('/')
+    return path, parts.query
+
+def build_request(request, path, query):
+    # the sub-request reuses the user and token the batch request was already authenticated with
+    sub_request = HttpRequest()
+    sub_request.method = 'GET'
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = {key: value for key, value in request.META.items() if key not in SKIPPED_HEADERS and not key.startswith('wsgi.')}
+    sub_request.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query})
+    sub_request.GET = QueryDict(query)
+    sub_request.COOKIES = request.COOKIES
+    sub_request.user = request.user
+
+    if request.user.is_authenticated:
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+
+    return sub_request
+
+def get_response_body(response):
+    if hasattr(response, 'data'):
+        return response.data
+
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+
+    if not content:
+        return None
+
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+
+    return content.decode(response.charset)
+
+def run_request(request, url):
+    try:
+        path, query = get_api_path(url)
+        match = resolve(path)
+    except (ValueError, Resolver404):
+        return {'path': url, 'status': status.HTTP_404_NOT_FOUND, 'body': {'error': "Not found"}}
+
+    if match.url_name == 'batch':
+        return {'path': url, 'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': "Batches can not be nested"}}
+
+    started = time.perf_counter()
+
+    try:
+        response = match.func(build_request(request, path, query), *match.args, **match.kwargs)
+        result = {'path': url, 'status': response.status_code, 'body': get_response_body(response)}
+    except Exception:
+        # the exception can carry internal details (queries, paths), so it is only logged
+        logger.exception("Batched request to %s failed", url)
+        result = {'path': url, 'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {'error': "Internal server error"}}
+
+    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+def run_threaded_request(request, url):
+    try:
+        return run_request(request, url)
+    finally:
+        # every worker thread opens its own connection, which would otherwise stay open after the pool is gone
+        connections.close_all()
+
+def run_batch(request, urls, max_workers=None):
+    # the requests are read-only and independent of each other, so they run side by side on separate
+    # connections; inside a transaction they have to share the caller's connection to see its writes
+    workers = min(max_workers or settings.BATCH_MAX_WORKERS, len(urls))
+
+    if workers <= 1 or connection.in_atomic_block:
+        return [run_request(request, url) for url in urls]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda url: run_threaded_request(request, url), urls))
@@ -0,0 +1,134 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ResponseCache():
+    # every cached response is keyed on the generations of the scopes it depends on (e.g. "location:12", "events"),
+    # so invalidating a scope only means replacing its generation; stale entries are never read again and expire.
+    # generations expire with the entries built on them, so a cache that outlives a database reset can't pin
+    # responses to ids that now belong to other rows
+    alias = 'responses'
+    key_prefix = 'response'
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return settings.RESPONSE_CACHE_TIMEOUT
+
+    def get_generation_key(self, scope):
+        return f"{self.key_prefix}:generation:{scope}"
+
+    def get_generations(self, scopes):
+        keys = [self.get_generation_key(scope) for scope in scopes]
+        generations = self.cache.get_many(keys)
+
+        for key in keys:
+            if key not in generations:
+                self.cache.add(key, uuid.uuid4().hex, self.timeout)
+                generations[key] = self.cache.get(key)
+
+        return [generations[key] for key in keys]
+
+    def get_key(self, name, request, scopes):
+        generations = self.get_generations(scopes)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+        return f"{self.key_prefix}:{name}:{path}:{'.'.join(str(generation) for generation in generations)}"
+
+    def get_or_build(self, name, key, build, timeout=None, cacheable=None):
+        # for responses that carry their own version stamp in the key instead of scopes, or that simply expire
+        if name not in cached_views:
+            cached_views.append(name)
+
+        key = f"{self.key_prefix}:{name}:{key}"
+        data = self.cache.get(key)
+        self.record(name, data is not None)
+
+        if data is None:
+            data = build()
+
+            if cacheable is None or cacheable(data):
+                self.cache.set(key, data, timeout or self.timeout)
+
+        return data
+
+    def invalidate(self, scopes):
+        self.cache.set_many({self.get_generation_key(scope): uuid.uuid4().hex for scope in scopes}, self.timeout)
+
+    def record(self, name, hit):
+        key = f"{self.key_prefix}:stats:{name}:{'hits' if hit else 'misses'}"
+
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+    def get_stats(self, names):
+        keys = {name: (f"{self.key_prefix}:stats:{name}:hits", f"{self.key_prefix}:stats:{name}:misses") for name in names}
+        counts = self.cache.get_many([key for pair in keys.values() for key in pair])
+        stats = {}
+
+        for name, (hits_key, misses_key) in keys.items():
+            hits = counts.get(hits_key, 0)
+            misses = counts.get(misses_key, 0)
+            stats[name] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+
+        return stats
+
+response_cache = ResponseCache()
+cached_views = []
+
+
+def invalidate_responses(scopes):
+    if scopes:
+        transaction.on_commit(lambda: response_cache.invalidate(scopes))
+
+
+def cache_response(name, scopes, extend=None, daily=False):
+    # caches the shared part of a GET response; `extend` merges the per-user fields into a copy of it afterwards
+    cached_views.append(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = response_cache.get_key(name, request, scopes(request, *args, **kwargs))
+
+            if daily:
+                key += f":{timezone.localdate().isoformat()}"
+
+            data = response_cache.cache.get(key)
+            response_cache.record(name, data is not None)
+
+            if data is None:
+                response = view(request, *args, **kwargs)
+
+                if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+                    return response
+
+                data = response.data
+                response_cache.cache.set(key, data, response_cache.timeout)
+
+            if extend:
+                data = extend(request, dict(data), *args, **kwargs)
+
+            return Response(data, status=status.HTTP_200_OK)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,215 @@
+import csv
+import io
+import zlib
+
+from django.conf import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # parquet exports are only offered when pyarrow is installed, csv always works
+    pa = pq = None
+
+from .models import ItineraryItem, Review, UserClick, Bookmark, Day
+
+
+# every export is a flat list of (column, lookup, type) read with values_list; date_lookup is what
+# ?start= and ?end= filter on, exports without one can not be filtered by date
+EXPORTS = {
+    'visits': {
+        'queryset': lambda: ItineraryItem.objects.filter(day__isnull=False).order_by('id'),
+        'date_lookup': 'day__date',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('location_id', 'location_id', 'int'),
+            ('location_name', 'location__name', 'str'),
+            ('location_type', 'location__location_type', 'str'),
+            ('day_id', 'day_id', 'int'),
+            ('date', 'day__date', 'date'),
+            ('completed', 'day__completed', 'bool'),
+            ('order', 'order', 'int'),
+            ('itinerary_id', 'day__itinerary_id', 'int'),
+            ('user_id', 'day__itinerary__user_id', 'int'),
+        ],
+    },
+    'reviews': {
+        'queryset': lambda: Review.objects.order_by('id'),
+        'date_lookup': 'datetime_created__date',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('location_id', 'location_id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('rating', 'rating', 'int'),
+            ('comment', 'comment', 'str'),
+            ('created', 'datetime_created', 'datetime'),
+        ],
+    },
+    'clicks': {
+        'queryset': lambda: UserClick.objects.order_by('id'),
+        'date_lookup': None,
+        'columns': [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('location_id', 'location_id', 'int'),
+            ('amount', 'amount', 'int'),
+        ],
+    },
+    'bookmarks': {
+        'queryset': lambda: Bookmark.objects.order_by('id'),
+        'date_lookup': 'datetime_created__date',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('location_id', 'location_id', 'int'),
+            ('created', 'datetime_created', 'datetime'),
+        ],
+    },
+    'day_ratings': {
+        'queryset': lambda: Day.objects.filter(completed=True).order_by('id'),
+        'date_lookup': 'date',
+        'columns': [
+            ('id', 'id', 'int'),
+            ('itinerary_id', 'itinerary_id', 'int'),
+            ('user_id', 'itinerary__user_id', 'int'),
+            ('date', 'date', 'date'),
+            ('rating', 'rating', 'int'),
+        ],
+    },
+}
+
+FORMATS = ('csv', 'parquet')
+
+
+class ExportError(ValueError):
+    pass
+
+
+def is_parquet_available():
+    return pa is not None
+
+def get_export_rows(name, start=None, end=None):
+    if name not in EXPORTS:
+        raise ExportError(f"Unknown export {name}, expected one of {', '.join(EXPORTS)}")
+
+    export = EXPORTS[name]
+    queryset = export['queryset']()
+
+    if start or end:
+        if export['date_lookup'] is None:
+            raise ExportError(f"The {name} export has no date to filter on")
+
+        if start:
+            queryset = queryset.filter(**{f"{export['date_lookup']}__gte": start})
+        if end:
+            queryset = queryset.filter(**{f"{export['date_lookup']}__lte": end})
+
+    # iterator() reads through a server-side cursor on postgres, one chunk of rows in memory at a time
+    return queryset.values_list(*[lookup for column, lookup, kind in export['columns']]).iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
+
+def get_chunks(rows):
+    chunk = []
+
+    for row in rows:
+        chunk.append(row)
+
+        if len(chunk) == settings.STREAMING_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def generate_csv(name, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column for column, lookup, kind in EXPORTS[name]['columns']])
+
+    for chunk in get_chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class ChunkSink(io.RawIOBase):
+    # collects whatever the parquet writer has flushed so it can be streamed out after every row group
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def get_parquet_schema(name):
+    types = {
+        'int': pa.int64(),
+        'str': pa.string(),
+        'bool': pa.bool_(),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('us', tz='UTC'),
+    }
+
+    return pa.schema([(column, types[kind]) for column, lookup, kind in EXPORTS[name]['columns']])
+
+def generate_parquet(name, rows, compression='snappy'):
+    if not is_parquet_available():
+        raise ExportError("Parquet exports need pyarrow to be installed")
+
+    schema = get_parquet_schema(name)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+
+    # every chunk becomes one row group, so only a single chunk is ever held in memory
+    for chunk in get_chunks(rows):
+        writer.write_table(pa.Table.from_pylist([dict(zip(schema.names, row)) for row in chunk], schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+def generate_export(name, file_format='csv', start=None, end=None, gzip=False):
+    # returns the file name and a generator of its bytes; parquet compresses its own column chunks,
+    # so gzip there picks the codec instead of wrapping the file
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown format {file_format}, expected one of {', '.join(FORMATS)}")
+
+    if file_format == 'parquet' and not is_parquet_available():
+        raise ExportError("Parquet exports need pyarrow to be installed")
+
+    rows = get_export_rows(name, start, end)
+
+    if file_format == 'parquet':
+        return f"{name}.parquet", generate_parquet(name, rows, compression='gzip' if gzip else 'snappy')
+
+    if gzip:
+        return f"{name}.csv.gz", gzip_stream(generate_csv(name, rows))
+
+    return f"{name}.csv", generate_csv(name, rows)
@@ -0,0 +1,206 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import invalidate_responses
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+VARIANTS_DIRECTORY = 'variants'
+
+# pillow format and save options per variant extension, the quality comes from IMAGE_VARIANT_FORMATS
+FORMATS = {
+    'webp': ('WEBP', {'method': 4}),
+    'jpeg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+def get_variant_name(name, variant, extension):
+    # every original gets its own directory of variants, so originals that only differ in extension never collide
+    return f"{VARIANTS_DIRECTORY}/{name.lstrip('/')}/{variant}.{extension}"
+
+def get_variant_names(name):
+    return {
+        (variant, extension): get_variant_name(name, variant, extension)
+        for variant in settings.IMAGE_VARIANTS
+        for extension in settings.IMAGE_VARIANT_FORMATS
+    }
+
+def get_variant_urls(name, variants_name=None):
+    # built from the names alone, so serializing a list of images costs no queries or storage calls; an image whose
+    # variants were not rendered for its current name yet has none, clients show the original until then
+    if not name or name != variants_name:
+        return None
+
+    urls = {variant: {} for variant in settings.IMAGE_VARIANTS}
+
+    for (variant, extension), variant_name in get_variant_names(name).items():
+        urls[variant][extension] = default_storage.url(variant_name)
+
+    return urls
+
+def mark_rendered(name):
+    # the rows showing this image link its variants from now on; imported names can keep a leading slash
+    from django.db.models import F
+    from .models import LocationImage, Food, Service, Driver, CATALOG_GROUPS, bump_catalog_versions
+
+    location_ids = set()
+    groups = set()
+
+    for model in (LocationImage, Food, Service, Driver):
+        rows = model.objects.filter(image__in=[name, f"/{name}"]).exclude(variants_name=F('image'))
+
+        if model is not Driver:
+            location_ids.update(rows.values_list('location_id', flat=True))
+
+        if rows.update(variants_name=F('image')):
+            groups.update(CATALOG_GROUPS.get(model, ()))
+
+    # the update skips the row signals that bump the catalog versions and drop the cached location pages
+    if groups:
+        bump_catalog_versions(groups)
+
+    invalidate_responses([f"location:{location_id}" for location_id in location_ids])
+
+def is_rendered(name, variant_names):
+    # rendered variants are newer than their original; an original replaced under the same name renders again
+    modified = default_storage.get_modified_time(name)
+
+    return all(
+        default_storage.exists(variant_name) and default_storage.get_modified_time(variant_name) >= modified
+        for variant_name in variant_names
+    )
+
+def resize(image, width, height, crop):
+    # never upscales: crop fills the box around the center, otherwise the whole image fits inside it
+    if crop:
+        scale = min(1, image.width / width, image.height / height)
+        return ImageOps.fit(image, (max(1, round(width * scale)), max(1, round(height * scale))), Image.Resampling.LANCZOS)
+
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return resized
+
+def encode(image, extension):
+    pillow_format, options = FORMATS[extension]
+
+    if image.mode == 'RGBA' and pillow_format == 'JPEG':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, quality=settings.IMAGE_VARIANT_FORMATS[extension], **options)
+    return buffer.getvalue()
+
+def render_variants(name, force=False):
+    # runs in a worker process: decodes the original once and writes every variant of it, returning
+    # (name, variants written, error)
+    name = name.lstrip('/')
+    variant_names = get_variant_names(name)
+
+    try:
+        if not force and is_rendered(name, variant_names.values()):
+            mark_rendered(name)
+            return name, 0, None
+
+        with default_storage.open(name) as file, Image.open(file) as original:
+            # jpegs decode straight at a fraction of their size when that is still larger than every variant
+            largest = max(max(width, height) for width, height, crop in settings.IMAGE_VARIANTS.values())
+            original.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(original)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for variant, (width, height, crop) in settings.IMAGE_VARIANTS.items():
+            resized = resize(image, width, height, crop)
+
+            for extension in settings.IMAGE_VARIANT_FORMATS:
+                variant_name = variant_names[(variant, extension)]
+                content = encode(resized, extension)
+                # storages pick a new name instead of overwriting
+                default_storage.delete(variant_name)
+                default_storage.save(variant_name, ContentFile(content))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        return name, 0, str(e)
+
+    mark_rendered(name)
+    return name, len(variant_names), None
+
+def get_image_names(directory=''):
+    # every image under `directory` of the media storage, without the variants
+    directories, files = default_storage.listdir(directory)
+
+    for file_name in sorted(files):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+            yield f"{directory}/{file_name}" if directory else file_name
+
+    for child in sorted(directories):
+        if directory or child != VARIANTS_DIRECTORY:
+            yield from get_image_names(f"{directory}/{child}" if directory else child)
+
+
+def log_render_result(name, future):
+    # nothing waits on a queued render, so its failures would otherwise go unnoticed
+    try:
+        name, written, error = future.result()
+    except Exception:
+        logger.exception("Rendering the variants of %s failed", name)
+        return
+
+    if error:
+        logger.warning("Could not render the variants of %s: %s", name, error)
+
+
+class VariantPipeline():
+    # uploads are rendered on a pool of spawned processes that lives as long as the server process, off the request
+    # and out of the GIL; IMAGE_WORKERS = 0 renders in the saving process instead
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS, mp_context=get_context('spawn'), initializer=django.setup)
+
+            return self.executor
+
+    def queue(self, names):
+        if not settings.IMAGE_WORKERS:
+            return [render_variants(name) for name in names]
+
+        executor = self.get_executor()
+        futures = [executor.submit(render_variants, name) for name in names]
+
+        for name, future in zip(names, futures):
+            future.add_done_callback(partial(log_render_result, name))
+
+        return futures
+
+    def render(self, names, workers=None, force=False):
+        # the backfill: yields a result per name as the workers finish them
+        names = list(names)
+        workers = min(workers or os.cpu_count(), len(names))
+
+        if workers <= 1:
+            for name in names:
+                yield render_variants(name, force)
+
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=django.setup) as executor:
+            yield from executor.map(render_variants, names, [force] * len(names), chunksize=4)
+
+image_variants = VariantPipeline()
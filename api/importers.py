@@ -0,0 +1,758 @@
+import csv
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_responses
+from .images import image_variants
+from .managers import RollupManager
+from .models import (
+    Location, Spot, FoodPlace, Accommodation, LocationImage, Tag, FoodTag, Activity, FeeType, AudienceType,
+    Food, Service, Event, User, Preferences, ModelItinerary, ModelItineraryLocationOrder, ImportedRow,
+    CATALOG_GROUPS, COUNTED_MODELS, bump_catalog_versions,
+)
+
+
+TIME_FORMATS = ['%H:%M:%S', '%I:%M %p', '%I:%M%p']
+
+
+class CsvImportError(ValueError):
+    pass
+
+
+def get_time(value):
+    if not value:
+        return None
+
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+
+    return None
+
+def get_flags(row, names):
+    # the tag and activity columns hold a 1 for every name that applies to the row
+    return [name for name in names if int(row.get(name) or 0) == 1]
+
+
+
+class BulkImporter(ABC):
+    # reads a csv a batch of rows at a time and writes every batch with bulk_create, all of it inside one transaction.
+    # bulk writes send no signals, so finish() does once for the whole import what the row signals in models.py
+    # would have done for every row: catalog versions, cached responses, the search indexes and the rollups.
+    # importers with a source keep a content hash per row (see ImportedRow) and only apply the rows that changed
+    file_name = None
+    source = None
+    delimiter = ','
+    has_header = True
+    can_close_missing = False
+
+    def __init__(self, path=None, close_missing=False):
+        self.path = path or os.path.join(settings.BASE_DIR, self.file_name)
+        self.batch_size = settings.IMPORT_BATCH_SIZE
+        self.close_missing = close_missing
+        self.imported = 0
+        self.unchanged = 0
+        self.closed = 0
+        self.seen_keys = set()
+        self.row_hashes = {}
+        self.warnings = []
+        self.changed_models = set()
+        self.location_ids = set()
+        self.image_names = set()
+        self.counters = defaultdict(int)
+        self.lookups = {}
+        self.vocabularies = {}
+
+    def read_rows(self):
+        with open(self.path, newline='', encoding='utf-8') as file:
+            if self.has_header:
+                yield from csv.DictReader(file, delimiter=self.delimiter)
+            else:
+                yield from csv.reader(file, delimiter=self.delimiter)
+
+    def get_batches(self):
+        batch = []
+
+        for row in self.read_rows():
+            batch.append(row)
+
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def run(self):
+        with transaction.atomic():
+            for batch in self.get_batches():
+                rows = self.get_changed_rows(batch) if self.source else batch
+
+                if rows:
+                    self.import_batch(rows)
+
+                self.save_row_hashes()
+
+            if self.close_missing:
+                self.close_missing_rows()
+
+            self.finish()
+
+        return self.imported
+
+    @abstractmethod
+    def import_batch(self, rows):
+        pass
+
+    def get_key(self, row):
+        # only importers with a source key their rows
+        raise NotImplementedError
+
+    def is_applied(self, key):
+        return True
+
+    def get_row_hash(self, row):
+        return hashlib.md5(json.dumps(row, sort_keys=True).encode()).hexdigest()
+
+    def get_changed_rows(self, rows):
+        # a row is skipped when its hash matches the one recorded for its key and what it created is still there;
+        # a key the file repeats keeps its first row
+        keys = [self.get_key(row) for row in rows]
+        hashes = dict(ImportedRow.objects.filter(source=self.source, key__in=keys).values_list('key', 'content_hash'))
+        changed = []
+
+        for key, row in zip(keys, rows):
+            if key in self.seen_keys:
+                self.warn(f"Skipped a repeated row for {key}")
+                continue
+
+            self.seen_keys.add(key)
+            content_hash = self.get_row_hash(row)
+
+            if hashes.get(key) == content_hash and self.is_applied(key):
+                self.unchanged += 1
+            else:
+                self.row_hashes[key] = content_hash
+                changed.append(row)
+
+        return changed
+
+    def skip(self, row):
+        # a row that could not be applied keeps its old hash, so the next import tries it again
+        self.row_hashes.pop(self.get_key(row), None)
+
+    def save_row_hashes(self):
+        if not self.row_hashes:
+            return
+
+        now = timezone.now()
+        ImportedRow.objects.bulk_create(
+            [ImportedRow(source=self.source, key=key, content_hash=content_hash, imported_at=now) for key, content_hash in self.row_hashes.items()],
+            update_conflicts=True,
+            unique_fields=['source', 'key'],
+            update_fields=['content_hash', 'imported_at'],
+            batch_size=self.batch_size
+        )
+        self.row_hashes = {}
+
+    def close_missing_rows(self):
+        # the keys an earlier import recorded that the file no longer has; their hashes are cleared so that a row
+        # which comes back is applied again
+        recorded = ImportedRow.objects.filter(source=self.source).exclude(content_hash='').values_list('key', flat=True)
+        keys = [key for key in recorded.iterator(chunk_size=2000) if key not in self.seen_keys]
+
+        if keys:
+            self.close_rows(keys)
+            ImportedRow.objects.filter(source=self.source, key__in=keys).update(content_hash='')
+
+    def close_rows(self, keys):
+        # only importers that can_close_missing close rows
+        raise NotImplementedError
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+    def create(self, model, instances):
+        if not instances:
+            return instances
+
+        if model._meta.parents:
+            self.create_locations(model, instances)
+        else:
+            model.objects.bulk_create(instances, batch_size=self.batch_size)
+
+        self.changed_models.add(model)
+
+        if model in COUNTED_MODELS:
+            for name in [COUNTED_MODELS[model]] + [COUNTED_MODELS[parent] for parent in model._meta.parents if parent in COUNTED_MODELS]:
+                self.counters[name] += len(instances)
+
+        return instances
+
+    def create_locations(self, model, locations):
+        # bulk_create refuses multi-table models, so the location rows are bulk created first and the subtype rows
+        # inserted on their keys with one multi-row INSERT per batch; this also skips the subtype lookup
+        # Location.save does after every save
+        parents = Location.objects.bulk_create([
+            Location(**{field.attname: getattr(location, field.attname) for field in Location._meta.concrete_fields if not field.primary_key})
+            for location in locations
+        ], batch_size=self.batch_size)
+
+        for location, parent in zip(locations, parents):
+            location.pk = location.id = parent.pk
+            location._state.adding = False
+            location._state.db = parent._state.db
+
+        self.insert_rows(model, locations)
+        self.location_ids.update(location.pk for location in locations)
+
+    def insert_rows(self, model, instances):
+        fields = model._meta.local_concrete_fields
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(field.column) for field in fields)
+        row = f"({', '.join(['%s'] * len(fields))})"
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(fields, instances))
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(instances), batch_size):
+                batch = instances[start:start + batch_size]
+                cursor.execute(
+                    f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES {', '.join([row] * len(batch))}",
+                    [field.get_db_prep_save(field.pre_save(instance, True), connection) for instance in batch for field in fields]
+                )
+
+    def get_lookup(self, model):
+        # name -> id of the rows a csv refers to by name, read once per import
+        if model not in self.lookups:
+            self.lookups[model] = dict(model.objects.values_list('name', 'id'))
+
+        return self.lookups[model]
+
+    def get_location_id(self, model, name):
+        location_id = self.get_lookup(model).get(name)
+
+        if location_id is None:
+            self.warn(f"{model.__name__} not detected: {name}")
+        else:
+            self.location_ids.add(location_id)
+
+        return location_id
+
+    def get_vocabulary(self, model, names):
+        # name -> id for tags, food tags and activities, kept in memory for the whole import; the names that
+        # don't exist yet are created together instead of one get_or_create per row
+        if model not in self.vocabularies:
+            self.vocabularies[model] = {}
+
+            for pk, name in model.objects.order_by('id').values_list('id', 'name'):
+                self.vocabularies[model].setdefault(name, pk)
+
+        vocabulary = self.vocabularies[model]
+        missing = [name for name in dict.fromkeys(names) if name not in vocabulary]
+
+        for instance in self.create(model, [model(name=name) for name in missing]):
+            vocabulary[instance.name] = instance.pk
+
+        return vocabulary
+
+    def finish(self):
+        groups = {group for model in self.changed_models if model in CATALOG_GROUPS for group in CATALOG_GROUPS[model]}
+        scopes = {f"location:{location_id}" for location_id in self.location_ids}
+
+        if self.changed_models & {Tag, FoodTag, Activity}:
+            scopes.update(['locations', 'tags'])
+
+        if Event in self.changed_models:
+            scopes.add('events')
+
+        if groups:
+            bump_catalog_versions(groups)
+
+        invalidate_responses(sorted(scopes))
+
+        if self.location_ids:
+            location_ids = sorted(self.location_ids)
+            transaction.on_commit(lambda: update_search_indexes(location_ids))
+
+        if self.image_names:
+            # bulk created images skip the signal that renders the variants of an upload
+            image_names = sorted(self.image_names)
+            transaction.on_commit(lambda: image_variants.queue(image_names))
+
+        if self.counters or self.location_ids:
+            RollupManager().queue(counters=self.counters, location_ids=self.location_ids)
+
+def update_search_indexes(location_ids):
+    from .search import trigram_index, location_search_index
+    trigram_index.update_locations(location_ids)
+    location_search_index.update_locations(location_ids)
+
+
+class LocationImporter(BulkImporter):
+    # spots, food places and accommodations are keyed on Location.name: a new name is created, a changed row updates
+    # the location, its tags and its images, and close_missing closes the locations an earlier import had but the
+    # file no longer lists
+    model = None
+    tag_model = None
+    tag_names = []
+    tag_fields = None
+    location_fields = ['address', 'description', 'latitude', 'longitude', 'is_closed']
+    subtype_fields = []
+    can_close_missing = True
+
+    def get_key(self, row):
+        return row['Place']
+
+    def is_applied(self, key):
+        return key in self.get_lookup(self.model)
+
+    @abstractmethod
+    def get_location(self, row):
+        pass
+
+    def get_image_paths(self, row):
+        return [unquote(row['Image'])]
+
+    def import_batch(self, rows):
+        location_ids = self.get_lookup(self.model)
+        names = self.get_lookup(Location)
+        new_rows = []
+        changed_rows = []
+
+        for row in rows:
+            if row['Place'] in location_ids:
+                changed_rows.append(row)
+            elif row['Place'] in names:
+                self.warn(f"{row['Place']} already exists as another kind of location")
+                self.skip(row)
+            else:
+                new_rows.append(row)
+
+        locations = self.create(self.model, [self.get_location(row) for row in new_rows])
+
+        for location in locations:
+            location_ids[location.name] = names[location.name] = location.pk
+
+        self.create_defaults(locations)
+
+        updated = [self.get_location(row) for row in changed_rows]
+
+        for location in updated:
+            location.pk = location.id = location_ids[location.name]
+
+        if updated:
+            Location.objects.bulk_update(updated, self.location_fields, batch_size=self.batch_size)
+
+            if self.subtype_fields:
+                self.model.objects.bulk_update(updated, self.subtype_fields, batch_size=self.batch_size)
+
+            self.changed_models.add(self.model)
+            self.location_ids.update(location.pk for location in updated)
+
+        self.save_images(locations + updated, new_rows + changed_rows)
+
+        if self.tag_model:
+            self.save_tags(locations + updated, new_rows + changed_rows, [location.pk for location in updated])
+
+        self.imported += len(rows)
+
+    def create_defaults(self, locations):
+        pass
+
+    def save_images(self, locations, rows):
+        # the csv images a location doesn't have yet are added, images uploaded through the app are left alone
+        existing = defaultdict(set)
+
+        for location_id, image in LocationImage.objects.filter(location_id__in=[location.pk for location in locations]).values_list('location_id', 'image'):
+            existing[location_id].add(image)
+
+        images = []
+
+        for location, row in zip(locations, rows):
+            paths = [path for path in dict.fromkeys(self.get_image_paths(row)) if path not in existing[location.pk]]
+            images += [
+                LocationImage(location_id=location.pk, image=path, is_primary_image=index == 0 and not existing[location.pk])
+                for index, path in enumerate(paths)
+            ]
+
+        self.create(LocationImage, images)
+        self.image_names.update(image.image.name for image in images)
+
+    def save_tags(self, locations, rows, updated_ids):
+        # a changed row replaces the tags its location had, like tags.set() would
+        through = self.model.tags.through
+        location_field, tag_field = self.tag_fields
+        flags = [get_flags(row, self.tag_names) for row in rows]
+        tag_ids = self.get_vocabulary(self.tag_model, [name for names in flags for name in names])
+
+        if updated_ids:
+            through.objects.filter(**{f"{location_field}__in": updated_ids}).delete()
+            self.changed_models.add(through)
+
+        self.create(through, [
+            through(**{location_field: location.pk, tag_field: tag_ids[name]})
+            for location, names in zip(locations, flags) for name in names
+        ])
+
+    def close_rows(self, keys):
+        location_ids = list(self.model.objects.filter(name__in=keys, is_closed=False).values_list('id', flat=True))
+
+        if location_ids:
+            Location.objects.filter(id__in=location_ids).update(is_closed=True)
+            self.changed_models.add(self.model)
+            self.location_ids.update(location_ids)
+            self.closed += len(location_ids)
+
+
+class SpotImporter(LocationImporter):
+    file_name = 'TravelPackage - Spot_NoFee.csv'
+    source = 'spots'
+    model = Spot
+    tag_model = Tag
+    tag_names = ['Historical', 'Nature', 'Religious', 'Art', 'Activities', 'Entertainment', 'Culture']
+    tag_fields = ('spot_id', 'tag_id')
+    subtype_fields = ['opening_time', 'closing_time']
+
+    def get_location(self, row):
+        return Spot(
+            name=row['Place'],
+            address=row['Address'],
+            is_closed=bool(int(row.get('IsClosed') or 0)),
+            latitude=float(row['Latitude']),
+            longitude=float(row['Longitude']),
+            opening_time=get_time(row.get('Start')),
+            closing_time=get_time(row.get('End')),
+            location_type='1',
+            description=row['Description']
+        )
+
+    def get_image_paths(self, row):
+        return row['Image'].split(',')
+
+    def create_defaults(self, spots):
+        # the fee every new spot gets from create_default_fee and create_default_audience_type
+        fee_types = self.create(FeeType, [FeeType(spot_id=spot.pk, name="Entrance Fee") for spot in spots])
+        self.create(AudienceType, [AudienceType(fee_type_id=fee_type.pk, name="General", price=0) for fee_type in fee_types])
+
+
+class FoodPlaceImporter(LocationImporter):
+    file_name = 'TravelPackage - FoodPlace.csv'
+    source = 'foodplaces'
+    model = FoodPlace
+    tag_model = FoodTag
+    tag_names = ['Seafood', 'Vegan-friendly', 'Chinese', 'Filipino', 'Italian', 'Japanese', 'Korean', 'Takeout', 'Dine-in', 'Delivery', 'Cafe', 'Fastfood', 'American', 'Asian', 'Fusion', 'European', 'International']
+    tag_fields = ('foodplace_id', 'foodtag_id')
+    subtype_fields = ['opening_time', 'closing_time']
+
+    def get_location(self, row):
+        return FoodPlace(
+            name=row['Place'],
+            address=row['Address'],
+            description=row.get('Description', 'No Description Provided.'),
+            latitude=float(row['Latitude']),
+            longitude=float(row['Longitude']),
+            is_closed=bool(int(row.get('IsClosed') or 0)),
+            location_type='2',
+            opening_time=get_time(row.get('Start')),
+            closing_time=get_time(row.get('End'))
+        )
+
+
+class AccommodationImporter(LocationImporter):
+    file_name = 'TravelPackage - Accommodations.csv'
+    source = 'accommodations'
+    model = Accommodation
+
+    def get_location(self, row):
+        return Accommodation(
+            name=row['Place'],
+            address=row['Address'],
+            description=row.get('Description', 'No Description Provided.'),
+            latitude=float(row['Latitude']),
+            longitude=float(row['Longitude']),
+            is_closed=bool(int(row.get('IsClosed') or 0)),
+            location_type='3',
+        )
+
+
+class LocationItemImporter(BulkImporter):
+    # food and services are keyed on their place and item name, a changed row updates the item it matches
+    model = None
+    location_model = None
+    fields = []
+
+    def get_key(self, row):
+        return json.dumps([row.get('Place'), row.get('Item')])
+
+    @abstractmethod
+    def get_item(self, row, location_id):
+        pass
+
+    def import_batch(self, rows):
+        items = []
+
+        for row in rows:
+            location_id = self.get_location_id(self.location_model, row.get('Place'))
+
+            if location_id is None:
+                self.skip(row)
+            else:
+                items.append(self.get_item(row, location_id))
+
+        item_ids = {
+            (location_id, item): pk
+            for pk, location_id, item in self.model.objects.filter(location_id__in={item.location_id for item in items}).values_list('id', 'location_id', 'item')
+        }
+        new_items = []
+        updated = []
+
+        for item in items:
+            if (item.location_id, item.item) in item_ids:
+                item.pk = item_ids[(item.location_id, item.item)]
+                updated.append(item)
+            else:
+                new_items.append(item)
+
+        self.create(self.model, new_items)
+
+        if updated:
+            self.model.objects.bulk_update(updated, self.fields, batch_size=self.batch_size)
+            self.changed_models.add(self.model)
+
+        self.imported += len(items)
+
+
+class FoodImporter(LocationItemImporter):
+    file_name = 'TravelPackage - FoodItem.csv'
+    source = 'food'
+    model = Food
+    location_model = FoodPlace
+    fields = ['price', 'image']
+
+    def get_item(self, row, location_id):
+        return Food(location_id=location_id, item=row.get('Item'), price=float(row.get('Price') or 0), image=row.get('Image'))
+
+
+class ServiceImporter(LocationItemImporter):
+    file_name = 'TravelPackage - Service.csv'
+    source = 'services'
+    model = Service
+    location_model = Accommodation
+    fields = ['price', 'description', 'image']
+
+    def get_item(self, row, location_id):
+        return Service(
+            location_id=location_id,
+            item=row.get('Item'),
+            price=float(row.get('Price') or 0),
+            description=row.get('Description'),
+            image=row.get('Image')
+        )
+
+
+class FeeImporter(BulkImporter):
+    file_name = 'TravelPackage - Fees.csv'
+    source = 'fees'
+
+    def get_key(self, row):
+        return json.dumps([row.get('Place'), row.get('Fee Type'), bool(int(row.get('is_required') or 0)), row.get('audience')])
+
+    def import_batch(self, rows):
+        fees = []
+
+        for row in rows:
+            spot_id = self.get_location_id(Spot, row.get('Place'))
+
+            if spot_id is None:
+                self.skip(row)
+            else:
+                fees.append((spot_id, row.get('Fee Type'), bool(int(row.get('is_required') or 0)), row))
+
+        # fee types are matched on spot, name and is_required and audiences on their fee type and name; a new fee type
+        # comes with the General audience create_default_audience_type gives it, which a General row then updates
+        spot_ids = {spot_id for spot_id, name, is_required, row in fees}
+        fee_type_ids = {
+            (spot_id, name, is_required): pk
+            for pk, spot_id, name, is_required in FeeType.objects.filter(spot_id__in=spot_ids).values_list('id', 'spot_id', 'name', 'is_required')
+        }
+        new_fee_types = {}
+
+        for spot_id, name, is_required, row in fees:
+            key = (spot_id, name, is_required)
+
+            if key not in fee_type_ids and key not in new_fee_types:
+                new_fee_types[key] = FeeType(spot_id=spot_id, name=name, is_required=is_required)
+
+        fee_type_ids.update({key: fee_type.pk for key, fee_type in zip(new_fee_types, self.create(FeeType, list(new_fee_types.values())))})
+        self.create(AudienceType, [AudienceType(fee_type_id=fee_type.pk, name="General", price=0) for fee_type in new_fee_types.values()])
+
+        audience_ids = {
+            (fee_type_id, name): pk
+            for pk, fee_type_id, name in AudienceType.objects.filter(fee_type_id__in=fee_type_ids.values()).values_list('id', 'fee_type_id', 'name')
+        }
+        new_audiences = []
+        updated = []
+
+        for spot_id, name, is_required, row in fees:
+            audience = AudienceType(
+                fee_type_id=fee_type_ids[(spot_id, name, is_required)],
+                name=row.get('audience'),
+                price=float(row.get('price') or 0),
+                description=row.get('Description', '')
+            )
+
+            if not audience.name:
+                self.warn(f"Missing audience name for spot '{row.get('Place')}'")
+
+            if (audience.fee_type_id, audience.name) in audience_ids:
+                audience.pk = audience_ids[(audience.fee_type_id, audience.name)]
+                updated.append(audience)
+            else:
+                new_audiences.append(audience)
+
+        self.create(AudienceType, new_audiences)
+
+        if updated:
+            AudienceType.objects.bulk_update(updated, ['price', 'description'], batch_size=self.batch_size)
+            self.changed_models.add(AudienceType)
+
+        self.imported += len(fees)
+
+
+class ActivityImporter(BulkImporter):
+    file_name = 'TravelPackage - Activities.csv'
+    source = 'activities'
+    activity_names = ['Sightseeing', 'Swimming', 'Hiking', 'Photography', 'Island Hopping', 'Shopping', 'Meditation', 'Diving', 'Camping', 'Boating', 'Cultural Exploration', 'Movie Watching', 'Food Trip', 'Nature Walks']
+
+    def get_key(self, row):
+        return row['Location']
+
+    def import_batch(self, rows):
+        # replaces the activities of every listed spot, like spot.activity.set() did
+        activities = {}
+
+        for row in rows:
+            spot_id = self.get_lookup(Spot).get(row['Location'])
+
+            if spot_id is None:
+                raise CsvImportError(f"Spot with name {row['Location']} does not exist. Please create the spot first.")
+
+            activities[spot_id] = get_flags(row, self.activity_names)
+            self.location_ids.add(spot_id)
+
+        activity_ids = self.get_vocabulary(Activity, [name for names in activities.values() for name in names])
+
+        Spot.activity.through.objects.filter(spot_id__in=activities).delete()
+        self.changed_models.add(Spot.activity.through)
+        self.create(Spot.activity.through, [
+            Spot.activity.through(spot_id=spot_id, activity_id=activity_ids[name])
+            for spot_id, names in activities.items() for name in names
+        ])
+
+        self.imported += len(rows)
+
+
+class EventImporter(BulkImporter):
+    file_name = 'TravelPackage - Events.csv'
+
+    def import_batch(self, rows):
+        self.imported += len(self.create(Event, [
+            Event(
+                name=row['Name'],
+                start_date=datetime.strptime(row['Start'], '%m/%d/%Y').date(),
+                end_date=datetime.strptime(row['End'], '%m/%d/%Y').date(),
+                latitude=float(row['Latitude']),
+                longitude=float(row['Longitude']),
+                description=row['Description'],
+            )
+            for row in rows
+        ]))
+
+
+class UserImporter(BulkImporter):
+    file_name = 'User.csv'
+
+    def import_batch(self, rows):
+        # hashing is most of the work here, the hashers release the GIL while they run
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            passwords = list(executor.map(make_password, [row['password'] for row in rows]))
+
+        users = self.create(User, [
+            User(email=row['email'], first_name=row['first_name'], last_name=row['last_name'], password=password)
+            for row, password in zip(rows, passwords)
+        ])
+
+        # the preferences create_preferences makes for every new user, all of them unset
+        self.create(Preferences, [Preferences(user_id=user.pk) for user in users])
+        self.counters['preferences'] += len(users)
+
+        self.imported += len(users)
+
+
+class ModelItineraryImporter(BulkImporter):
+    file_name = 'TravelPackage - ModelItinerary.csv'
+    delimiter = '\t'
+    has_header = False
+
+    def import_batch(self, rows):
+        spot_ids = self.get_lookup(Spot)
+        itineraries = []
+
+        for row in rows:
+            if not row:
+                continue
+
+            locations = [location.strip() for location in row[0].split(',') if location.strip()]
+
+            for location in locations:
+                if location not in spot_ids:
+                    self.warn(f"Location not detected: {location}")
+
+            itineraries.append([spot_ids[location] for location in locations if location in spot_ids])
+
+        model_itineraries = self.create(ModelItinerary, [ModelItinerary() for spots in itineraries])
+        self.create(ModelItineraryLocationOrder, [
+            ModelItineraryLocationOrder(itinerary_id=model_itinerary.pk, spot_id=spot_id, order=order)
+            for model_itinerary, spots in zip(model_itineraries, itineraries) for order, spot_id in enumerate(spots)
+        ])
+
+        self.imported += len(model_itineraries)
+
+
+class ImportCommand(BaseCommand):
+    importer = None
+    success_message = 'Data imported successfully'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help="CSV file to import instead of the one in the project root")
+
+        if self.importer.can_close_missing:
+            parser.add_argument('--close-missing', action='store_true', help="Mark the locations an earlier import had but the file no longer lists as closed")
+
+    def handle(self, *args, **options):
+        importer = self.importer(options['file'], close_missing=options.get('close_missing', False))
+
+        try:
+            imported = importer.run()
+        except CsvImportError as error:
+            raise CommandError(str(error))
+
+        for warning in importer.warnings:
+            self.stdout.write(self.style.WARNING(warning))
+
+        self.stdout.write(f"Imported {imported} rows from {importer.path}, {importer.unchanged} unchanged, {importer.closed} closed")
+        self.stdout.write(self.style.SUCCESS(self.success_message))
@@ -0,0 +1,361 @@
+import io
+import math
+import random
+import secrets
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from multiprocessing import get_context
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .cache import invalidate_responses
+from .managers import RollupManager, TrendingManager
+from .models import (
+    User, Preferences, Itinerary, Day, ItineraryItem, UserClick, Bookmark, Review, Location, LocationClickBucket,
+    PREFERENCE_FIELDS, bump_catalog_versions,
+)
+
+
+# average volumes per generated user (or per itinerary / day), all of them overridable from generate_load_data
+DEFAULTS = {
+    'itineraries_per_user': 2.0,
+    'days_per_itinerary': 3.0,
+    'items_per_day': 3.0,
+    'bookmarks_per_user': 3.0,
+    'reviews_per_user': 1.5,
+    'clicks_per_user': 8.0,
+    'days_back': 365,
+    'days_ahead': 60,
+    'zipf': 1.1,
+    'cluster_size': 12,
+}
+
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Grace', 'John', 'Angel', 'Paolo', 'Bea', 'Carlo', 'Joy', 'Miguel', 'Liza', 'Ramon', 'Kim']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Villanueva', 'Ramos', 'Aquino', 'Castillo', 'Rivera', 'Tan']
+COMMENTS = {
+    1: ["Not worth the trip.", "Very disappointing."],
+    2: ["Could be better.", "Too crowded for us."],
+    3: ["It was okay.", "Decent, nothing special."],
+    4: ["Really enjoyed it.", "Would come back again."],
+    5: ["A must visit in Cebu!", "Loved every minute of it."],
+}
+PEOPLE = [1, 2, 3, 4, 5, 6]
+PEOPLE_WEIGHTS = [30, 35, 12, 12, 6, 5]
+DAY_RATINGS = [1, 2, 3, 4, 5]
+DAY_RATING_WEIGHTS = [0.02, 0.03, 0.15, 0.35, 0.45]
+PREFERENCE_RATE = 0.35
+COMPLETION_RATE = 0.85
+DAY_RATING_RATE = 0.7
+CLICK_REPEAT_MEAN = 2.0
+DAY_COLOR = "#184E77"
+
+# advisory lock the workers hold while they take primary keys from the sequences
+RESERVE_LOCK = 4807311
+
+# the columns every generated row fills in, and which of them hold chunk-local ids of another table
+TABLES = [
+    (User, ['id', 'password', 'last_login', 'is_superuser', 'is_staff', 'is_active', 'date_joined', 'email', 'requires_otp', 'first_name', 'last_name', 'set_preferences', 'contact_number'], {'id': User}),
+    (Preferences, ['id', 'user_id', *PREFERENCE_FIELDS], {'id': Preferences, 'user_id': User}),
+    (Itinerary, ['id', 'user_id', 'number_of_people', 'budget', 'name', 'version'], {'id': Itinerary, 'user_id': User}),
+    (Day, ['id', 'date', 'itinerary_id', 'color', 'completed', 'order', 'rating'], {'id': Day, 'itinerary_id': Itinerary}),
+    (ItineraryItem, ['id', 'day_id', 'location_id', 'order'], {'id': ItineraryItem, 'day_id': Day}),
+    (UserClick, ['id', 'user_id', 'location_id', 'amount'], {'id': UserClick, 'user_id': User}),
+    (Bookmark, ['id', 'user_id', 'location_id', 'datetime_created'], {'id': Bookmark, 'user_id': User}),
+    (Review, ['id', 'location_id', 'user_id', 'comment', 'rating', 'datetime_created'], {'id': Review, 'user_id': User}),
+]
+
+
+class LoadDataError(ValueError):
+    pass
+
+
+def get_catalog(zipf, seed):
+    # popularity follows a zipf law over a random ranking of the locations, and every location gets a quality
+    # its reviews scatter around
+    rows = list(Location.objects.order_by('id').values_list('id', 'latitude', 'longitude', 'location_type'))
+
+    if not rows:
+        raise LoadDataError("There are no locations to generate activity for, import the catalog first")
+
+    rng = random.Random(seed)
+    ranks = list(range(1, len(rows) + 1))
+    rng.shuffle(ranks)
+    weights = [1 / rank ** zipf for rank in ranks]
+    anchors = [index for index, row in enumerate(rows) if row[3] == '1'] or list(range(len(rows)))
+
+    return {
+        'ids': [row[0] for row in rows],
+        'coordinates': np.array([(row[1], row[2]) for row in rows]),
+        'weights': weights,
+        'cum_weights': list(accumulate(weights)),
+        'anchors': anchors,
+        'anchor_cum_weights': list(accumulate(weights[index] for index in anchors)),
+        'quality': [min(5.0, max(1.0, rng.gauss(4.0, 0.6))) for row in rows],
+    }
+
+
+# per process state, set once by init_worker
+worker = {}
+
+def init_worker(catalog, options):
+    worker.clear()
+    worker.update(catalog=catalog, options=options, neighbours={})
+
+def get_count(rng, mean):
+    # exponentially distributed, so most users do a little and a few do a lot
+    if mean <= 0:
+        return 0
+
+    return int(rng.expovariate(1 / mean) + 0.5)
+
+def get_moment(rng, start, end):
+    return start + (end - start) * rng.random()
+
+def get_neighbours(index):
+    # the cluster_size locations closest to an anchor with their popularity; an equirectangular distance is
+    # plenty at city scale and is computed only for the anchors that actually get picked
+    if index not in worker['neighbours']:
+        catalog = worker['catalog']
+        coordinates = catalog['coordinates']
+        latitude, longitude = coordinates[index]
+        dy = coordinates[:, 0] - latitude
+        dx = (coordinates[:, 1] - longitude) * math.cos(math.radians(latitude))
+        size = min(worker['options']['cluster_size'] + 1, len(coordinates))
+        nearest = [int(i) for i in np.argpartition(dx * dx + dy * dy, size - 1)[:size] if i != index]
+        worker['neighbours'][index] = (nearest, list(accumulate(catalog['weights'][i] for i in nearest)))
+
+    return worker['neighbours'][index]
+
+def pick_locations(rng, count, indexes=None, cum_weights=None):
+    # `count` different locations drawn by popularity
+    catalog = worker['catalog']
+
+    if indexes is None:
+        indexes, cum_weights = range(len(catalog['ids'])), catalog['cum_weights']
+
+    count = min(count, len(indexes))
+    picked = {}
+    attempts = 0
+
+    while len(picked) < count and attempts < 20:
+        picked.update(dict.fromkeys(rng.choices(indexes, cum_weights=cum_weights, k=count - len(picked))))
+        attempts += 1
+
+    return list(picked)[:count]
+
+def get_day_locations(rng):
+    # a day starts at a popular spot and continues to the places around it
+    catalog = worker['catalog']
+    anchor = rng.choices(catalog['anchors'], cum_weights=catalog['anchor_cum_weights'])[0]
+    count = 1 + get_count(rng, worker['options']['items_per_day'] - 1)
+    neighbours, cum_weights = get_neighbours(anchor)
+
+    if not neighbours or count == 1:
+        return [anchor]
+
+    return [anchor] + pick_locations(rng, count - 1, neighbours, cum_weights)
+
+def generate_chunk(task):
+    chunk_index, first_user, user_count = task
+    catalog = worker['catalog']
+    options = worker['options']
+    rng = random.Random(f"{options['seed']}:{chunk_index}")
+    trending = TrendingManager()
+    now = options['now']
+    today = timezone.localdate(now)
+    window_start = now - timedelta(days=options['days_back'])
+    hourly_start = now - timedelta(days=trending.hourly_retention_days)
+    tables = {model: [] for model, fields, offsets in TABLES}
+    buckets = Counter()
+
+    for number in range(first_user, first_user + user_count):
+        user = len(tables[User])
+        joined = get_moment(rng, window_start, now)
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        email = f"{first_name}.{last_name}.{options['run']}.{number}@loadtest.example".lower()
+        tables[User].append([user, options['password'], None, False, False, True, joined, email, False, first_name, last_name, True, None])
+        tables[Preferences].append([user, user] + [rng.random() < PREFERENCE_RATE for field in PREFERENCE_FIELDS])
+        visited = []
+
+        for trip in range(get_count(rng, options['itineraries_per_user'])):
+            itinerary = len(tables[Itinerary])
+            tables[Itinerary].append([itinerary, user, rng.choices(PEOPLE, PEOPLE_WEIGHTS)[0], round(rng.lognormvariate(8.5, 0.6), -2), "My Trip", 0])
+            start = today + timedelta(days=rng.randint(-options['days_back'], options['days_ahead']))
+
+            for order in range(1, 2 + get_count(rng, options['days_per_itinerary'] - 1)):
+                day_date = start + timedelta(days=order - 1)
+                completed = day_date < today and rng.random() < COMPLETION_RATE
+                rating = rng.choices(DAY_RATINGS, DAY_RATING_WEIGHTS)[0] if completed and rng.random() < DAY_RATING_RATE else 0
+                day = len(tables[Day])
+                tables[Day].append([day, day_date, itinerary, DAY_COLOR, completed, order, rating])
+
+                for position, location in enumerate(get_day_locations(rng)):
+                    tables[ItineraryItem].append([len(tables[ItineraryItem]), day, catalog['ids'][location], position])
+
+                    if completed:
+                        visited.append(location)
+
+        for location in pick_locations(rng, get_count(rng, options['bookmarks_per_user'])):
+            tables[Bookmark].append([len(tables[Bookmark]), user, catalog['ids'][location], get_moment(rng, joined, now)])
+
+        # reviews mostly go to places the user has been to
+        review_count = get_count(rng, options['reviews_per_user'])
+        reviewed = list(dict.fromkeys(visited))
+        rng.shuffle(reviewed)
+        reviewed = reviewed[:review_count]
+        reviewed += [location for location in pick_locations(rng, review_count) if location not in reviewed][:review_count - len(reviewed)]
+
+        for location in reviewed:
+            rating = min(5, max(1, round(rng.gauss(catalog['quality'][location], 0.8))))
+            tables[Review].append([len(tables[Review]), catalog['ids'][location], user, rng.choice(COMMENTS[rating]), rating, get_moment(rng, joined, now)])
+
+        for location in pick_locations(rng, get_count(rng, options['clicks_per_user'])):
+            location_id = catalog['ids'][location]
+            amount = 1 + get_count(rng, CLICK_REPEAT_MEAN)
+            tables[UserClick].append([len(tables[UserClick]), user, location_id, amount])
+
+            for click in range(amount):
+                moment = get_moment(rng, joined, now)
+                buckets[(location_id, 'D', trending.get_bucket_start(moment, 'D'))] += 1
+
+                if moment >= hourly_start:
+                    buckets[(location_id, 'H', trending.get_bucket_start(moment, 'H'))] += 1
+
+    write_tables(tables)
+
+    return {model.__name__: len(rows) for model, rows in tables.items()}, buckets
+
+def format_value(value):
+    # postgres' COPY text format: \N is NULL and backslashes, tabs and newlines are escaped
+    if value is None:
+        return '\\N'
+
+    if value is True:
+        return 't'
+
+    if value is False:
+        return 'f'
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def reserve_ids(cursor, counts):
+    # a block of consecutive primary keys per table, taken from its sequence while the other workers wait;
+    # generate load data while nothing else writes to these tables
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [RESERVE_LOCK])
+    bases = {}
+
+    for model, count in counts.items():
+        if count:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [model._meta.db_table])
+            first = cursor.fetchone()[0]
+            cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [model._meta.db_table, first + count - 1])
+            bases[model] = first
+
+    return bases
+
+def copy_rows(cursor, model, fields, rows):
+    buffer = io.StringIO()
+
+    for row in rows:
+        buffer.write('\t'.join(map(format_value, row)))
+        buffer.write('\n')
+
+    buffer.seek(0)
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(model._meta.get_field(field).column) for field in fields)
+    cursor.copy_expert(f"COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+
+def write_tables(tables):
+    with connection.cursor() as cursor:
+        with transaction.atomic():
+            bases = reserve_ids(cursor, {model: len(rows) for model, rows in tables.items()})
+
+        with transaction.atomic():
+            for model, fields, offsets in TABLES:
+                rows = tables[model]
+
+                if not rows:
+                    continue
+
+                positions = [(fields.index(field), bases[offset_model]) for field, offset_model in offsets.items()]
+
+                for row in rows:
+                    for position, base in positions:
+                        row[position] += base
+
+                copy_rows(cursor, model, fields, rows)
+
+def save_click_buckets(buckets):
+    # added onto the buckets that already exist through a temporary table and a single upsert
+    if not buckets:
+        return
+
+    table = connection.ops.quote_name(LocationClickBucket._meta.db_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("CREATE TEMPORARY TABLE load_click_buckets (location_id bigint, granularity varchar(1), bucket_start timestamptz, amount integer) ON COMMIT DROP")
+        buffer = io.StringIO(''.join(
+            '\t'.join(map(format_value, (location_id, granularity, bucket_start, amount))) + '\n'
+            for (location_id, granularity, bucket_start), amount in buckets.items()
+        ))
+        cursor.copy_expert("COPY load_click_buckets FROM STDIN", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} (location_id, granularity, bucket_start, amount) "
+            f"SELECT location_id, granularity, bucket_start, amount FROM load_click_buckets "
+            f"ON CONFLICT (location_id, granularity, bucket_start) DO UPDATE SET amount = {table}.amount + EXCLUDED.amount"
+        )
+
+def generate_load_data(users, workers=1, chunk_size=1000, seed=None, password=None, progress=None, **volumes):
+    # users are generated and written chunk_size at a time, each chunk with its own random stream and in its own
+    # transaction, on a pool of worker processes when workers > 1
+    if connection.vendor != 'postgresql':
+        raise LoadDataError("Load data is written with COPY, which needs PostgreSQL")
+
+    options = dict(DEFAULTS, **{name: value for name, value in volumes.items() if value is not None})
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    catalog = get_catalog(options['zipf'], seed)
+    options.update(seed=seed, run=secrets.token_hex(3), now=timezone.now(), password=make_password(password))
+
+    tasks = [(index, first, min(chunk_size, users - first)) for index, first in enumerate(range(0, users, chunk_size))]
+    counts = Counter()
+    buckets = Counter()
+
+    def collect(results):
+        for done, (chunk_counts, chunk_buckets) in enumerate(results, start=1):
+            counts.update(chunk_counts)
+            buckets.update(chunk_buckets)
+
+            if progress:
+                progress(done, len(tasks), counts)
+
+    if workers <= 1:
+        init_worker(catalog, options)
+        collect(map(generate_chunk, tasks))
+    else:
+        # forked workers open their own connections, none may be inherited from this process
+        connections.close_all()
+
+        with get_context('fork').Pool(workers, initializer=init_worker, initargs=(catalog, options)) as pool:
+            collect(pool.imap_unordered(generate_chunk, tasks))
+
+    save_click_buckets(buckets)
+    counts['LocationClickBucket'] = len(buckets)
+
+    return counts
+
+def refresh_after_load():
+    # the rows were copied in without signals, so everything derived from them is rebuilt once
+    counters, refreshed, months = RollupManager().rebuild()
+    TrendingManager().compute_trending()
+    bump_catalog_versions(['locations'])
+    invalidate_responses(['locations'] + [f"location:{location_id}" for location_id in Location.objects.values_list('id', flat=True)])
+
+    return refreshed, months
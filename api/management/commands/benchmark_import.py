@@ -0,0 +1,92 @@
+import csv
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from api.importers import SpotImporter, get_flags, get_time
+from api.models import Spot, Tag, LocationImage
+
+HEADER = ['Place', 'Address', 'IsClosed', 'Start', 'End', 'Latitude', 'Longitude'] + SpotImporter.tag_names + ['Image', 'Description']
+
+
+def write_spots(path, count):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+
+        for i in range(count):
+            flags = ['1' if (i + index) % 3 == 0 else '0' for index in range(len(SpotImporter.tag_names))]
+            writer.writerow([f"Benchmark Spot {i}", "Cebu", '0', '7:00:00', '6:00 PM', '10.3', '123.9'] + flags + [f"/benchmark/{i}-a.jpg,/benchmark/{i}-b.jpg", "Benchmark"])
+
+def import_row_by_row(path):
+    # what import_spots did before BulkImporter: a save per spot and image, with every row signal, and a tag lookup per flag
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            spot = Spot.objects.create(
+                name=row['Place'],
+                address=row['Address'],
+                is_closed=bool(int(row['IsClosed'])),
+                latitude=float(row['Latitude']),
+                longitude=float(row['Longitude']),
+                opening_time=get_time(row['Start']),
+                closing_time=get_time(row['End']),
+                location_type='1',
+                description=row['Description']
+            )
+
+            for index, image in enumerate(row['Image'].split(',')):
+                LocationImage.objects.create(location=spot, image=image, is_primary_image=index == 0)
+
+            spot.tags.set([Tag.objects.get_or_create(name=name)[0] for name in get_flags(row, SpotImporter.tag_names)])
+
+def import_bulk(path):
+    SpotImporter(path).run()
+
+class QueryCounter():
+    # counted through an execute wrapper, queries_log only keeps the last 9000 queries
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+def time_imports(count):
+    # seconds and queries for importing the same spots both ways, each rolled back afterwards
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, 'spots.csv')
+    write_spots(path, count)
+    results = {}
+
+    try:
+        for name, run in [('row by row', import_row_by_row), ('bulk', import_bulk)]:
+            with transaction.atomic():
+                queries = QueryCounter()
+
+                with connection.execute_wrapper(queries):
+                    start = time.perf_counter()
+                    run(path)
+                    results[name] = (time.perf_counter() - start, queries.count)
+
+                transaction.set_rollback(True)
+    finally:
+        directory.cleanup()
+
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Benchmark only: import the same generated spots row by row and with the bulk importer, rolling both back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Number of spots to generate')
+
+    def handle(self, *args, **options):
+        results = time_imports(options['rows'])
+
+        for name, (seconds, queries) in results.items():
+            self.stdout.write(f"{name}: {seconds * 1000:.1f}ms, {queries} queries")
+
+        (row_seconds, row_queries), (bulk_seconds, bulk_queries) = results['row by row'], results['bulk']
+        self.stdout.write(f"Bulk import is {row_seconds / bulk_seconds:.1f}x faster with {row_queries / bulk_queries:.1f}x fewer queries")
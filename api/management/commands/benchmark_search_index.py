@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from api.search import location_search_index
+
+class Command(BaseCommand):
+    # every server worker keeps its own index (see warm_search_indexes), the one built here is thrown away on exit
+    help = 'Benchmark only: time building the in-memory BM25 location search index and a sample query in this process; server workers build their own'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', type=str, default='waterfall canyoneering', help='Query to time against the built index')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        location_search_index.build()
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = location_search_index.search(options['query'])
+        query_time = time.perf_counter() - start
+
+        self.stdout.write(f"Indexed {len(location_search_index.documents)} locations and {len(location_search_index.postings)} terms in {build_time * 1000:.1f}ms")
+        self.stdout.write(f"'{options['query']}' matched {len(results)} locations in {query_time * 1000:.2f}ms")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.managers import TrendingManager
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed trending top-N lists from the hourly click buckets'
+
+    def handle(self, *args, **options):
+        trending = TrendingManager().compute_trending()
+
+        self.stdout.write(self.style.SUCCESS(f'Computed {len(trending)} trending entries'))
@@ -0,0 +1,42 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from api.exports import EXPORTS, FORMATS, ExportError, generate_export
+
+class Command(BaseCommand):
+    help = 'Stream an analytics export (visits, reviews, clicks, bookmarks or day ratings) as csv or parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', dest='file_format', choices=FORMATS, default='csv')
+        parser.add_argument('--start', type=date.fromisoformat, help='first date to include, YYYY-MM-DD')
+        parser.add_argument('--end', type=date.fromisoformat, help='last date to include, YYYY-MM-DD')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', help='file to write to, the export is written to stdout otherwise')
+
+    def handle(self, *args, **options):
+        try:
+            file_name, content = generate_export(
+                options['name'],
+                file_format=options['file_format'],
+                start=options['start'],
+                end=options['end'],
+                gzip=options['gzip']
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        size = 0
+
+        try:
+            for chunk in content:
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}"))
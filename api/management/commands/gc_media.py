@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.storage import ContentAddressedStorage, get_referenced_names
+
+class Command(BaseCommand):
+    help = 'Delete the media blobs no row references anymore, along with their image variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24, help='blobs written more recently are kept, their upload may not be committed yet')
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("The default storage does not store content addressed blobs")
+
+        # read before listing the blobs, a blob saved in between is still inside the grace period
+        referenced = get_referenced_names()
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        deleted = kept = freed = 0
+
+        for name in list(storage.get_blob_names()):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                kept += 1
+                continue
+
+            freed += storage.size(name)
+            deleted += 1
+
+            if not options['dry_run']:
+                storage.delete_blob(name)
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} orphaned blobs ({freed / 1024 / 1024:.1f} MB), kept {kept}"))
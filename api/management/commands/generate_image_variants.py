@@ -0,0 +1,30 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from api.images import image_variants, get_image_names
+
+class Command(BaseCommand):
+    help = 'Render the resized variants of every image in the media storage that is missing them and link them on its rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='', help='only the images under this media directory')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes rendering in parallel')
+        parser.add_argument('--force', action='store_true', help='render again even if the variants are up to date')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        rendered = skipped = failed = 0
+
+        for name, written, error in image_variants.render(get_image_names(options['path'].strip('/')), options['workers'], options['force']):
+            if error:
+                failed += 1
+                self.stderr.write(f"Could not render {name}: {error}")
+            elif written:
+                rendered += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered variants of {rendered} images, {skipped} already up to date, {failed} failed in {time.monotonic() - start:.1f}s"
+        ))
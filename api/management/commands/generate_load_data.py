@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api.loadgen import DEFAULTS, LoadDataError, generate_load_data, refresh_after_load
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, itineraries, clicks, bookmarks and reviews at volume for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes writing in parallel')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='users generated and written per transaction')
+        parser.add_argument('--seed', type=int, help='makes the generated data repeatable')
+        parser.add_argument('--password', help='password of every generated user, they can not log in otherwise')
+        parser.add_argument('--skip-refresh', action='store_true', help="don't rebuild the rollups and trending lists afterwards")
+
+        for name, default in DEFAULTS.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def progress(done, total, counts):
+            self.stdout.write(f"Chunk {done}/{total}: {sum(counts.values())} rows written")
+
+        try:
+            counts = generate_load_data(
+                options['users'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                seed=options['seed'],
+                password=options['password'],
+                progress=progress,
+                **{name: options[name] for name in DEFAULTS}
+            )
+        except LoadDataError as e:
+            raise CommandError(str(e))
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+
+        if not options['skip_refresh']:
+            refreshed, months = refresh_after_load()
+            self.stdout.write(f"Refreshed the stats of {refreshed} locations and {months} monthly reports")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated {sum(counts.values())} rows in {time.monotonic() - start:.1f}s"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.managers import RollupManager
+
+class Command(BaseCommand):
+    help = 'Rebuild the dashboard counters, per-location stats and monthly reports from the raw tables'
+
+    def handle(self, *args, **options):
+        counters, refreshed, months = RollupManager().rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counters)} counters, the stats of {refreshed} locations and {months} monthly reports'))
@@ -4,10 +4,18 @@ from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import MinMaxScaler
 # from memory_profiler import profile
 
-from django.db.models import Count, Q
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Q, F, Max, Sum
+from django.db.models.functions import Greatest, TruncDate, TruncWeek, TruncMonth
 from django.contrib.auth.base_user import BaseUserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+import calendar
+import math
+import threading
 from .config import db
 
 
@@ -440,4 +448,850 @@ class RecommendationsManager():
         merged_data['scaled_score'] = scaler.fit_transform(weighted_score_array)
         merged_data = merged_data.sort_values(by='scaled_score', ascending=False)
 
-        return merged_data.head(8)['id'].to_list()
\ No newline at end of file
+        return merged_data.head(8)['id'].to_list()
+
+class TrendingManager():
+    window_days = 7
+    half_life_hours = 24
+    top_n = 20
+    hourly_retention_days = 14
+    refresh_interval = timedelta(minutes=30)
+    refresh_key = 'trending-refresh'
+    refresh_lock = 5201926
+
+    def get_bucket_start(self, moment, granularity):
+        # buckets follow local (Asia/Manila) hours and days so daily counters line up with calendar days
+        moment = timezone.localtime(moment)
+
+        if granularity == 'D':
+            return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    def record_click(self, location_id, moment=None, amount=1):
+        from .models import LocationClickBucket
+        moment = moment or timezone.now()
+
+        for granularity in ('H', 'D'):
+            bucket_start = self.get_bucket_start(moment, granularity)
+            buckets = LocationClickBucket.objects.filter(
+                location_id=location_id,
+                granularity=granularity,
+                bucket_start=bucket_start
+            )
+
+            if buckets.update(amount=F('amount') + amount):
+                continue
+
+            try:
+                with transaction.atomic():
+                    LocationClickBucket.objects.create(
+                        location_id=location_id,
+                        granularity=granularity,
+                        bucket_start=bucket_start,
+                        amount=amount
+                    )
+            except IntegrityError:
+                # another request created the bucket between the update and the insert
+                buckets.update(amount=F('amount') + amount)
+
+        RollupManager().add_clicks(location_id, self.get_bucket_start(moment, 'D').date(), amount)
+
+    def lock_trending(self, wait=True):
+        # serializes the delete and bulk create of the lists across workers, the rows are unique on (location_type, rank)
+        if connection.vendor != 'postgresql':
+            return True
+
+        with connection.cursor() as cursor:
+            if wait:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [self.refresh_lock])
+                return True
+
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [self.refresh_lock])
+            return cursor.fetchone()[0]
+
+    @transaction.atomic
+    def compute_trending(self, now=None, wait=True):
+        from .models import LocationClickBucket, TrendingLocation
+        now = now or timezone.now()
+
+        if not self.lock_trending(wait):
+            return None
+
+        window_start = now - timedelta(days=self.window_days)
+        decay_rate = math.log(2) / self.half_life_hours
+
+        buckets = LocationClickBucket.objects.filter(
+            granularity='H',
+            bucket_start__gte=window_start,
+            location__is_closed=False
+        ).values_list('location_id', 'location__location_type', 'bucket_start', 'amount')
+
+        scores = defaultdict(float)
+        location_types = {}
+
+        for location_id, location_type, bucket_start, amount in buckets.iterator(chunk_size=2000):
+            age_hours = max((now - bucket_start).total_seconds() / 3600, 0)
+            scores[location_id] += amount * math.exp(-decay_rate * age_hours)
+            location_types[location_id] = location_type
+
+        ranked = defaultdict(list)
+        for location_id, score in sorted(scores.items(), key=lambda entry: (-entry[1], entry[0])):
+            location_type = location_types[location_id]
+
+            if len(ranked[location_type]) < self.top_n:
+                ranked[location_type].append((location_id, score))
+
+        trending = [
+            TrendingLocation(
+                location_id=location_id,
+                location_type=location_type,
+                rank=rank,
+                score=score,
+                computed_at=now
+            )
+            for location_type, entries in ranked.items()
+            for rank, (location_id, score) in enumerate(entries, start=1)
+        ]
+
+        TrendingLocation.objects.all().delete()
+        TrendingLocation.objects.bulk_create(trending)
+
+        # daily buckets are kept for history, hourly buckets are only needed inside the decay window
+        LocationClickBucket.objects.filter(
+            granularity='H',
+            bucket_start__lt=now - timedelta(days=self.hourly_retention_days)
+        ).delete()
+
+        return trending
+
+    def get_trending(self, location_type=None, limit=None):
+        from .models import TrendingLocation
+        last_computed = TrendingLocation.objects.aggregate(last_computed=Max('computed_at'))['last_computed']
+
+        # stale lists are still served, only the request that claims the refresh flag recomputes them and it
+        # skips the refresh if the compute_trending command or another worker is already writing the lists
+        if last_computed is None or timezone.now() - last_computed > self.refresh_interval:
+            if cache.add(self.refresh_key, 1, timeout=self.refresh_interval.total_seconds()):
+                self.compute_trending(wait=False)
+
+        trending = TrendingLocation.objects.select_related('location')
+
+        if location_type:
+            trending = trending.filter(location_type=location_type)
+        else:
+            trending = trending.order_by('-score', 'location_id')
+
+        return [entry.location for entry in trending[:limit or self.top_n]]
+
+
+class ItineraryVersionConflict(Exception):
+    def __init__(self, version):
+        super().__init__(f"Itinerary has changed, current version is {version}")
+        self.version = version
+
+
+class DayItemsManager():
+    operations = ('add', 'remove', 'move')
+
+    def get_int(self, operation, key, required=True):
+        value = operation.get(key)
+
+        if value is None and not required:
+            return None
+
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' must be a number for {operation.get('op')} operations")
+
+    def apply_operations(self, day, operations, version=None):
+        # applies add/remove/move operations on the day's items in memory first, so a bad batch writes nothing,
+        # then persists them with one bulk query per kind of change; orders are renumbered from 0 per day
+        from .models import Itinerary, Day, ItineraryItem, Location, batched_itinerary_changes
+
+        if not isinstance(operations, list) or not operations:
+            raise ValueError("operations must be a non-empty list")
+
+        if not all(isinstance(operation, dict) for operation in operations):
+            raise ValueError("every operation must be an object")
+
+        with transaction.atomic():
+            itinerary = Itinerary.objects.select_for_update().get(pk=day.itinerary_id)
+
+            if version is not None and self.get_int({'op': 'batch', 'version': version}, 'version') != itinerary.version:
+                raise ItineraryVersionConflict(itinerary.version)
+
+            days = {day.id: day for day in Day.objects.filter(itinerary=itinerary)}
+            items = list(ItineraryItem.objects.filter(day__itinerary=itinerary))
+            items_by_id = {item.id: item for item in items}
+            original_positions = {item.id: (item.day_id, item.order) for item in items}
+            day_items = defaultdict(list)
+
+            for item in sorted(items, key=lambda item: (item.order, item.id)):
+                day_items[item.day_id].append(item)
+
+            location_ids = {self.get_int(operation, 'location') for operation in operations if operation.get('op') == 'add'}
+            locations = Location.objects.in_bulk(location_ids)
+            removed = []
+            affected_days = {day.id}
+
+            for operation in operations:
+                op = operation.get('op')
+
+                if op not in self.operations:
+                    raise ValueError(f"Unknown operation '{op}', expected one of {', '.join(self.operations)}")
+
+                target_day_id = self.get_int(operation, 'day', required=False) or day.id
+                if target_day_id not in days:
+                    raise ValueError(f"Day {target_day_id} is not part of this itinerary")
+
+                if op == 'add':
+                    location = locations.get(self.get_int(operation, 'location'))
+                    if location is None:
+                        raise ValueError(f"Location {operation.get('location')} not found")
+
+                    item = ItineraryItem(day_id=target_day_id, location=location)
+                else:
+                    item = items_by_id.get(self.get_int(operation, 'id'))
+                    if item is None or item in removed:
+                        raise ValueError(f"Item {operation.get('id')} not found in this itinerary")
+
+                    day_items[item.day_id].remove(item)
+                    affected_days.add(item.day_id)
+
+                    if op == 'remove':
+                        removed.append(item)
+                        continue
+
+                    item.day_id = target_day_id
+
+                order = self.get_int(operation, 'order', required=False)
+                target_items = day_items[target_day_id]
+                target_items.insert(len(target_items) if order is None else max(order, 0), item)
+                affected_days.add(target_day_id)
+
+            created = []
+            changed = []
+            for day_id in affected_days:
+                for order, item in enumerate(day_items[day_id]):
+                    item.order = order
+
+                    if item.pk is None:
+                        created.append(item)
+                    elif original_positions[item.id] != (day_id, order):
+                        changed.append(item)
+
+            # bulk writes skip the item signals, so the whole batch is reported as one itinerary change
+            with batched_itinerary_changes('items') as changes:
+                if removed:
+                    ItineraryItem.objects.filter(id__in=[item.id for item in removed]).delete()
+
+                ItineraryItem.objects.bulk_create(created)
+                ItineraryItem.objects.bulk_update(changed, ['order', 'day'])
+                changes['itinerary_ids'].add(itinerary.pk)
+
+            # the removed items went through their delete signals, the created and moved ones are counted here
+            moved = [item for item in changed if original_positions[item.id][0] != item.day_id]
+            RollupManager().queue(item_changes=(
+                [(item.location_id, item.day_id, 1) for item in created + moved] +
+                [(item.location_id, original_positions[item.id][0], -1) for item in moved]
+            ))
+
+            itinerary.refresh_from_db(fields=['version'])
+
+        return itinerary.version, sorted(affected_days, key=lambda day_id: (day_id != day.id, days[day_id].date, day_id))
+
+
+# the rollup changes queued by the transactions of each thread, see RollupManager.queue
+rollup_buffer = threading.local()
+
+
+def get_date(value):
+    # signal instances can still hold the string they were created with
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+
+    if isinstance(value, datetime):
+        return timezone.localdate(value)
+
+    return value
+
+
+class RollupManager():
+    location_chunk_size = 1000
+    # about three years of days, ten years of weeks or months per series
+    max_series_buckets = {'day': 1096, 'week': 522, 'month': 120}
+    counter_names = (
+        'users', 'locations', 'spots', 'accommodations', 'food_places', 'itineraries', 'preferences',
+        'preferences_art', 'preferences_activity', 'preferences_culture', 'preferences_entertainment',
+        'preferences_history', 'preferences_nature', 'preferences_religion',
+    )
+    stats_fields = ('review_count', 'rating_total', 'bookmark_count', 'visit_count', 'planned_visit_count')
+
+    def get_pieces(self):
+        pieces = getattr(rollup_buffer, 'pieces', None)
+
+        if pieces is None:
+            pieces = rollup_buffer.pieces = []
+
+        return pieces
+
+    def queue(self, counters=None, location_ids=(), itinerary_ids=(), location_deltas=None, item_changes=(),
+              completed_before=None, day_dates=None, location_dates=(), months=()):
+        # every call buffers its changes on this thread and registers its own on_commit callback, so rolling back
+        # a savepoint drops both. The callback of the piece queued last applies all committed pieces at once, so
+        # a cascade or a batch writes each touched stats row once; should that last piece have been rolled back,
+        # the committed ones are applied with the next commit on this thread.
+        # location_deltas are {location id: {stats field: delta}}, item_changes (location id, day id, delta)
+        # triples, completed_before keeps the completed flag of a day before the transaction changed it,
+        # day_dates keeps the dates of deleted days and location_dates are the buckets of the daily stats
+        piece = {
+            'counters': dict(counters or {}),
+            'location_ids': set(location_ids),
+            'itinerary_ids': set(itinerary_ids),
+            'location_deltas': location_deltas or {},
+            'item_changes': [(location_id, day_id, delta) for location_id, day_id, delta in item_changes if day_id],
+            'completed_before': completed_before or {},
+            'day_dates': {day_id: get_date(day) for day_id, day in (day_dates or {}).items()},
+            'location_dates': {(location_id, get_date(day)) for location_id, day in location_dates},
+            'months': {MonthlyReportManager().get_month(month) for month in months},
+        }
+
+        self.get_pieces().append(piece)
+        transaction.on_commit(lambda: self.commit(piece))
+
+    def commit(self, piece):
+        piece['committed'] = True
+
+        if piece.get('dropped'):
+            # an earlier flush ran while this piece was still waiting for its callback
+            self.apply(self.merge([piece]))
+            return
+
+        pieces = self.get_pieces()
+
+        if pieces[-1] is not piece:
+            return
+
+        rollup_buffer.pieces = []
+
+        for pending in pieces:
+            pending['dropped'] = not pending.get('committed')
+
+        self.apply(self.merge([pending for pending in pieces if pending.get('committed')]))
+
+    def merge(self, pieces):
+        changes = {
+            'counters': defaultdict(int),
+            'location_ids': set(),
+            'itinerary_ids': set(),
+            'location_deltas': defaultdict(lambda: defaultdict(int)),
+            'item_changes': defaultdict(int),
+            'completed_before': {},
+            'day_dates': {},
+            'location_dates': set(),
+            'months': set(),
+        }
+
+        for piece in pieces:
+            for name, delta in piece['counters'].items():
+                changes['counters'][name] += delta
+
+            for location_id, deltas in piece['location_deltas'].items():
+                for field, delta in deltas.items():
+                    changes['location_deltas'][location_id][field] += delta
+
+            for location_id, day_id, delta in piece['item_changes']:
+                changes['item_changes'][(location_id, day_id)] += delta
+
+            for day_id, completed in piece['completed_before'].items():
+                # the first flag seen is the one the day had when the transaction started
+                changes['completed_before'].setdefault(day_id, completed)
+
+            for name in ('location_ids', 'itinerary_ids', 'day_dates', 'location_dates', 'months'):
+                changes[name].update(piece[name])
+
+        return changes
+
+    def apply(self, changes):
+        from .models import DashboardCounter, ItineraryItem, Day
+
+        for name, delta in changes['counters'].items():
+            if delta:
+                # missing counters are left alone, get_counters rebuilds them from the tables on the next read
+                DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+        item_changes = changes['item_changes']
+        completed_before = changes['completed_before']
+        day_ids = {day_id for location_id, day_id in item_changes} | set(completed_before)
+        days = {day_id: (day, completed) for day_id, day, completed in Day.objects.filter(id__in=day_ids).values_list('id', 'date', 'completed')} if day_ids else {}
+
+        day_dates = dict(changes['day_dates'])
+        day_dates.update((day_id, day) for day_id, (day, completed) in days.items())
+        location_dates = set(changes['location_dates'])
+        location_dates.update((location_id, day_dates[day_id]) for location_id, day_id in item_changes if day_id in day_dates)
+        # the monthly reports only count completed days, so only the months of days completed before or after
+        # the change are recomputed
+        completed_days = {day_id for day_id, (day, completed) in days.items() if completed}
+        completed_days.update(day_id for day_id, completed in completed_before.items() if completed)
+        months = set(changes['months'])
+        months.update(MonthlyReportManager().get_month(day) for day_id, day in day_dates.items() if day_id in completed_days)
+
+        if changes['itinerary_ids']:
+            location_dates.update(
+                ItineraryItem.objects.filter(day__itinerary__in=changes['itinerary_ids']).values_list('location_id', 'day__date').distinct()
+            )
+            months.update(Day.objects.filter(itinerary__in=changes['itinerary_ids'], completed=True).dates('date', 'month'))
+
+        location_deltas = changes['location_deltas']
+
+        for location_id, delta in self.get_visit_deltas(item_changes, completed_before, days).items():
+            location_deltas[location_id]['visit_count'] += delta
+
+        for (location_id, day_id), delta in item_changes.items():
+            location_deltas[location_id]['planned_visit_count'] += delta
+
+        self.add_location_stats(location_deltas, changes['location_ids'])
+
+        if location_dates:
+            self.refresh_daily_stats(location_dates)
+
+        if months:
+            MonthlyReportManager().refresh_months(months)
+
+    def get_visit_deltas(self, item_changes, completed_before, days):
+        # a location's visits are its items on completed days: the items added to or removed from a day count with
+        # the day's flag, and a day completed or reopened in the same transaction also moves the items it already had
+        from .models import ItineraryItem
+
+        toggled = {day_id for day_id, completed in completed_before.items() if day_id in days and days[day_id][1] != completed}
+        items_after = defaultdict(int)
+
+        if toggled:
+            for location_id, day_id, count in ItineraryItem.objects.filter(day__in=toggled).values('location', 'day').annotate(count=Count('id')).order_by().values_list('location', 'day', 'count'):
+                items_after[(location_id, day_id)] = count
+
+        deltas = defaultdict(int)
+
+        for location_id, day_id in set(item_changes) | set(items_after):
+            delta = item_changes.get((location_id, day_id), 0)
+            # a deleted day keeps the flag it had, its items are all gone
+            completed = days[day_id][1] if day_id in days else False
+            was_completed = completed_before.get(day_id, completed)
+
+            if day_id in toggled:
+                count = items_after[(location_id, day_id)]
+                deltas[location_id] += count * completed - (count - delta) * was_completed
+            else:
+                deltas[location_id] += delta * was_completed
+
+        return {location_id: delta for location_id, delta in deltas.items() if delta}
+
+    def add_location_stats(self, location_deltas, location_ids=()):
+        # adds the deltas to the stats rows in place, one update per distinct set of deltas, so concurrent
+        # transactions never overwrite each other's counts; the missing rows are created first
+        from .models import Location, LocationStats
+
+        location_ids = set(location_ids) | set(location_deltas)
+
+        if not location_ids:
+            return
+
+        location_types = dict(Location.objects.filter(id__in=location_ids).values_list('id', 'location_type'))
+        LocationStats.objects.bulk_create(
+            [LocationStats(location_id=location_id, location_type=location_type) for location_id, location_type in location_types.items()],
+            ignore_conflicts=True
+        )
+
+        grouped = defaultdict(list)
+        for location_id, deltas in location_deltas.items():
+            key = tuple(deltas.get(field, 0) for field in self.stats_fields)
+
+            if location_id in location_types and any(key):
+                grouped[key].append(location_id)
+
+        for key, ids in grouped.items():
+            # clamped at zero, a count that drifted is repaired by the next rebuild
+            LocationStats.objects.filter(location__in=ids).update(
+                updated_at=timezone.now(),
+                **{field: Greatest(F(field) + delta, 0) for field, delta in zip(self.stats_fields, key) if delta}
+            )
+
+    def count_all(self):
+        from .models import User, Location, Spot, Accommodation, FoodPlace, Itinerary, Preferences, PREFERENCE_FIELDS
+
+        counters = {
+            'users': User.objects.count(),
+            'locations': Location.objects.count(),
+            'spots': Spot.objects.count(),
+            'accommodations': Accommodation.objects.count(),
+            'food_places': FoodPlace.objects.count(),
+            'itineraries': Itinerary.objects.count(),
+        }
+        counters.update(Preferences.objects.aggregate(
+            preferences=Count('id'),
+            **{f"preferences_{field}": Count('id', filter=Q(**{field: True})) for field in PREFERENCE_FIELDS}
+        ))
+
+        return counters
+
+    def rebuild_counters(self):
+        from .models import DashboardCounter
+
+        counters = self.count_all()
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(name=name, value=value) for name, value in counters.items()],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['value']
+        )
+
+        return counters
+
+    def get_counters(self):
+        from .models import DashboardCounter
+
+        counters = dict(DashboardCounter.objects.values_list('name', 'value'))
+
+        if any(name not in counters for name in self.counter_names):
+            counters = self.rebuild_counters()
+
+        return counters
+
+    def refresh_locations(self, location_ids):
+        # recomputes the stats rows of the given locations only, each aggregate stays on that location's own rows
+        from .models import Location, LocationStats, Review, Bookmark, ItineraryItem
+
+        location_ids = list(location_ids)
+        reviews = {
+            row['location']: row
+            for row in Review.objects.filter(location__in=location_ids).values('location').annotate(count=Count('id'), total=Sum('rating')).order_by()
+        }
+        bookmarks = dict(
+            Bookmark.objects.filter(location__in=location_ids).values('location').annotate(count=Count('id')).order_by().values_list('location', 'count')
+        )
+        visits = {
+            row['location']: row
+            for row in ItineraryItem.objects.filter(location__in=location_ids, day__isnull=False)
+                .values('location').annotate(planned=Count('id'), completed=Count('id', filter=Q(day__completed=True))).order_by()
+        }
+
+        stats = [
+            LocationStats(
+                location_id=location_id,
+                location_type=location_type,
+                review_count=reviews[location_id]['count'] if location_id in reviews else 0,
+                rating_total=reviews[location_id]['total'] if location_id in reviews else 0,
+                bookmark_count=bookmarks.get(location_id, 0),
+                visit_count=visits[location_id]['completed'] if location_id in visits else 0,
+                planned_visit_count=visits[location_id]['planned'] if location_id in visits else 0,
+                updated_at=timezone.now()
+            )
+            for location_id, location_type in Location.objects.filter(id__in=location_ids).values_list('id', 'location_type')
+        ]
+
+        LocationStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['location'],
+            update_fields=['location_type', 'review_count', 'rating_total', 'bookmark_count', 'visit_count', 'planned_visit_count', 'updated_at']
+        )
+
+        return len(stats)
+
+    def get_daily_stats(self, location_ids, dates=None):
+        # grouped per (location, date); reviews and bookmarks count on the local day they were made,
+        # planned and completed visits on the date of the itinerary day
+        from .models import Review, Bookmark, ItineraryItem, LocationClickBucket
+
+        reviews = Review.objects.filter(location__in=location_ids)
+        bookmarks = Bookmark.objects.filter(location__in=location_ids)
+        items = ItineraryItem.objects.filter(location__in=location_ids, day__isnull=False)
+        clicks = LocationClickBucket.objects.filter(location__in=location_ids, granularity='D')
+
+        if dates is not None:
+            reviews = reviews.filter(datetime_created__date__in=dates)
+            bookmarks = bookmarks.filter(datetime_created__date__in=dates)
+            items = items.filter(day__date__in=dates)
+            clicks = clicks.filter(bucket_start__date__in=dates)
+
+        stats = defaultdict(lambda: defaultdict(int))
+
+        for row in reviews.annotate(day=TruncDate('datetime_created')).values('location', 'day').annotate(count=Count('id'), total=Sum('rating')).order_by():
+            stats[(row['location'], row['day'])].update(reviews=row['count'], rating_total=row['total'])
+
+        for row in bookmarks.annotate(day=TruncDate('datetime_created')).values('location', 'day').annotate(count=Count('id')).order_by():
+            stats[(row['location'], row['day'])]['bookmarks'] = row['count']
+
+        for row in items.values('location', 'day__date').annotate(planned=Count('id'), completed=Count('id', filter=Q(day__completed=True))).order_by():
+            stats[(row['location'], row['day__date'])].update(planned_visits=row['planned'], completed_visits=row['completed'])
+
+        for location_id, bucket_start, amount in clicks.values_list('location', 'bucket_start', 'amount'):
+            stats[(location_id, timezone.localdate(bucket_start))]['clicks'] += amount
+
+        return stats
+
+    def save_daily_stats(self, stats, location_dates):
+        from .models import LocationDailyStats
+
+        LocationDailyStats.objects.bulk_create(
+            [LocationDailyStats(location_id=location_id, date=day, **stats.get((location_id, day), {})) for location_id, day in location_dates],
+            update_conflicts=True,
+            unique_fields=['location', 'date'],
+            update_fields=['bookmarks', 'reviews', 'rating_total', 'planned_visits', 'completed_visits', 'clicks'],
+            batch_size=1000
+        )
+
+    def refresh_daily_stats(self, location_dates):
+        from .models import Location
+
+        location_ids = set(Location.objects.filter(id__in={location_id for location_id, day in location_dates}).values_list('id', flat=True))
+        location_dates = [(location_id, day) for location_id, day in location_dates if location_id in location_ids]
+        stats = self.get_daily_stats(location_ids, {day for location_id, day in location_dates})
+
+        self.save_daily_stats(stats, location_dates)
+
+    def add_clicks(self, location_id, day, amount=1):
+        from .models import LocationDailyStats
+
+        daily_stats = LocationDailyStats.objects.filter(location_id=location_id, date=day)
+
+        if daily_stats.update(clicks=F('clicks') + amount):
+            return
+
+        try:
+            with transaction.atomic():
+                LocationDailyStats.objects.create(location_id=location_id, date=day, clicks=amount)
+        except IntegrityError:
+            daily_stats.update(clicks=F('clicks') + amount)
+
+    def get_location_totals(self, location_id):
+        # lifetime totals are the location's stats row, which every flush keeps current; a missing row is rebuilt
+        from .models import LocationStats
+
+        fields = ['bookmark_count', 'review_count', 'rating_total', 'planned_visit_count', 'visit_count']
+        totals = LocationStats.objects.filter(location_id=location_id).values(*fields).first()
+
+        if totals is None:
+            self.refresh_locations([location_id])
+            totals = LocationStats.objects.filter(location_id=location_id).values(*fields).first() or dict.fromkeys(fields, 0)
+
+        return {
+            'bookmarks': totals['bookmark_count'],
+            'reviews': totals['review_count'],
+            'rating_total': totals['rating_total'],
+            'planned_visits': totals['planned_visit_count'],
+            'completed_visits': totals['visit_count'],
+        }
+
+    def get_location_series(self, location_id, bucket, start, end):
+        # one row per active day of the location, summed per bucket; empty buckets are filled with zeros
+        from .models import LocationDailyStats
+
+        truncate = {'day': F('date'), 'week': TruncWeek('date'), 'month': TruncMonth('date')}[bucket]
+        rows = {
+            row['bucket']: row
+            for row in LocationDailyStats.objects.filter(location_id=location_id, date__range=(start, end))
+                .annotate(bucket=truncate)
+                .values('bucket')
+                .annotate(
+                    bookmarks=Sum('bookmarks'),
+                    reviews=Sum('reviews'),
+                    rating_total=Sum('rating_total'),
+                    planned_visits=Sum('planned_visits'),
+                    completed_visits=Sum('completed_visits'),
+                    clicks=Sum('clicks')
+                )
+                .order_by('bucket')
+        }
+
+        series = []
+        for current in self.get_buckets(bucket, start, end):
+            row = rows.get(current, {})
+            reviews = row.get('reviews', 0)
+            series.append({
+                'date': current,
+                'bookmarks': row.get('bookmarks', 0),
+                'reviews': reviews,
+                'average_rating': round(row['rating_total'] / reviews, 2) if reviews else 0,
+                'planned_visits': row.get('planned_visits', 0),
+                'completed_visits': row.get('completed_visits', 0),
+                'clicks': row.get('clicks', 0),
+            })
+
+        return series
+
+    def get_buckets(self, bucket, start, end):
+        # counted up front rather than stepped past the end, so a range ending on date.max does not overflow
+        if bucket == 'week':
+            first = start - timedelta(days=start.weekday())
+            return [first + timedelta(days=7 * week) for week in range((end - first).days // 7 + 1)]
+
+        if bucket == 'month':
+            return MonthlyReportManager().get_months(start, end)
+
+        return [start + timedelta(days=day) for day in range((end - start).days + 1)]
+
+    def count_buckets(self, bucket, start, end):
+        if bucket == 'week':
+            return (end - start + timedelta(days=start.weekday())).days // 7 + 1
+
+        if bucket == 'month':
+            return MonthlyReportManager().count_months(start, end)
+
+        return (end - start).days + 1
+
+    def rebuild(self):
+        from .models import Location, LocationDailyStats
+
+        counters = self.rebuild_counters()
+        months = MonthlyReportManager().rebuild()
+        location_ids = list(Location.objects.order_by('id').values_list('id', flat=True))
+        refreshed = 0
+
+        for start in range(0, len(location_ids), self.location_chunk_size):
+            chunk = location_ids[start:start + self.location_chunk_size]
+            refreshed += self.refresh_locations(chunk)
+
+            with transaction.atomic():
+                stats = self.get_daily_stats(chunk)
+                LocationDailyStats.objects.filter(location__in=chunk).delete()
+                self.save_daily_stats(stats, list(stats))
+
+        return counters, refreshed, months
+
+
+class MonthlyReportManager():
+    max_months = 120
+
+    def get_month(self, value):
+        return get_date(value).replace(day=1)
+
+    def get_month_range(self, month):
+        return (month, month.replace(day=calendar.monthrange(month.year, month.month)[1]))
+
+    def count_months(self, start_month, end_month):
+        return (end_month.year - start_month.year) * 12 + end_month.month - start_month.month + 1
+
+    def get_months(self, start_month, end_month):
+        # stepped on (year, month) so the month after December 9999 is never built as a date
+        months = []
+        year, month = start_month.year, start_month.month
+
+        while (year, month) <= (end_month.year, end_month.month):
+            months.append(date(year, month, 1))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        return months
+
+    def refresh_months(self, months):
+        # recomputes the given months from the rollup flush, so reading a report never writes; a month left
+        # without completed days loses its report
+        from .models import MonthlyReport, Day
+
+        months = sorted(months)
+        active = set(Day.objects.filter(date__range=(months[0], self.get_month_range(months[-1])[1]), completed=True).dates('date', 'month'))
+        MonthlyReport.objects.filter(month__in=[month for month in months if month not in active]).delete()
+
+        for month in months:
+            if month in active:
+                self.compute_month(month)
+
+    def compute_month(self, month):
+        # one grouped query per figure over that month's completed days only
+        from .models import MonthlyReport, MonthlyLocationVisits, MonthlyVisitor, Day, Itinerary, ItineraryItem
+
+        month_range = self.get_month_range(month)
+
+        with transaction.atomic():
+            # concurrent flushes of the same month take turns, the later one reads what the earlier one committed
+            report, created = MonthlyReport.objects.select_for_update().get_or_create(month=month)
+
+            items = ItineraryItem.objects.filter(day__date__range=month_range, day__completed=True)
+            daily_visits = {
+                day.isoformat(): visits
+                for day, visits in items.values('day__date').annotate(visits=Count('id')).order_by('day__date').values_list('day__date', 'visits')
+            }
+            location_visits = items.values('location').annotate(visits=Count('id')).order_by().values_list('location', 'visits')
+            visitors = (
+                Itinerary.objects.filter(day__date__range=month_range, day__completed=True)
+                    .values('user').annotate(max_people=Max('number_of_people')).order_by().values_list('user', 'max_people')
+            )
+
+            report.completed_days = Day.objects.filter(date__range=month_range, completed=True).count()
+            report.daily_visits = daily_visits
+            report.locations_visited = sum(daily_visits.values())
+            report.computed_at = timezone.now()
+            report.save()
+
+            report.location_visits.all().delete()
+            report.visitors.all().delete()
+            MonthlyLocationVisits.objects.bulk_create([
+                MonthlyLocationVisits(report=report, location_id=location_id, visits=visits) for location_id, visits in location_visits
+            ])
+            MonthlyVisitor.objects.bulk_create([
+                MonthlyVisitor(report=report, user_id=user_id, max_people=max_people) for user_id, max_people in visitors
+            ])
+
+        return report
+
+    def get_reports(self, start_month, end_month):
+        # the rollup flush and rebuild_rollups keep the stored reports current; a month without one had no
+        # completed days and is reported as an unsaved row of zeros
+        from .models import MonthlyReport
+
+        reports = {report.month: report for report in MonthlyReport.objects.filter(month__range=(start_month, end_month))}
+
+        return [reports.get(month) or MonthlyReport(month=month) for month in self.get_months(start_month, end_month)]
+
+    def get_report(self, start_month, end_month):
+        # any range is a sum over the monthly rollups; visitors are only distinct per user, so their
+        # group sizes are taken as the largest one within the range before summing
+        from .models import MonthlyLocationVisits, MonthlyVisitor
+
+        reports = self.get_reports(start_month, end_month)
+        stored_reports = [report for report in reports if report.pk]
+        daily_visits = {}
+
+        for report in reports:
+            daily_visits.update(report.daily_visits)
+
+        total_locations_visited = sum(report.locations_visited for report in reports)
+        location_frequency = (
+            MonthlyLocationVisits.objects.filter(report__in=stored_reports)
+                .values('location__name')
+                .annotate(frequency=Sum('visits'))
+                .order_by('-frequency', 'location__name')
+        )
+        unique_visitors_count = (
+            MonthlyVisitor.objects.filter(report__in=stored_reports)
+                .values('user')
+                .annotate(max_people=Max('max_people'))
+                .aggregate(unique_visitors_count=Sum('max_people'))
+        )['unique_visitors_count']
+
+        return {
+            'completed_trips': sum(report.completed_days for report in reports),
+            'unique_visitor_counts': unique_visitors_count,
+            'location_frequency': list(location_frequency),
+            'completed_trips_info': [
+                {
+                    'date': date.fromisoformat(day),
+                    'total_locations_visited': visits,
+                    'percentage_completed_trips': (visits / total_locations_visited) * 100,
+                }
+                for day, visits in sorted(daily_visits.items())
+            ],
+        }
+
+    def rebuild(self):
+        from .models import Day, MonthlyReport
+
+        months = list(Day.objects.filter(completed=True).dates('date', 'month'))
+        MonthlyReport.objects.exclude(month__in=months).delete()
+
+        for month in months:
+            self.compute_month(month)
+
+        return len(months)
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_type', models.CharField(max_length=1)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.location')),
+            ],
+            options={
+                'ordering': ['location_type', 'rank'],
+                'unique_together': {('location_type', 'rank')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationClickBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('H', 'Hourly'), ('D', 'Daily')], default='H', max_length=1)),
+                ('bucket_start', models.DateTimeField()),
+                ('amount', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='click_buckets', to='api.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='api_locatio_granula_e48cc3_idx')],
+                'unique_together': {('location', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
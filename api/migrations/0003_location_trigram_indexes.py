@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm is optional: without it (or on SQLite) search falls back to the in-process trigram index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute("CREATE INDEX IF NOT EXISTS api_location_name_trgm ON api_location USING gin (name gin_trgm_ops)")
+    schema_editor.execute("CREATE INDEX IF NOT EXISTS api_location_address_trgm ON api_location USING gin (address gin_trgm_ops)")
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS api_location_name_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS api_location_address_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_trendinglocation_locationclickbucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itinerary',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_itinerary_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='day',
+            index=models.Index(fields=['completed', 'rating', 'date'], name='api_day_complet_d92d63_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_location_stats(apps, schema_editor):
+    # the counters rebuild themselves on first read; the per-location stats are seeded here once
+    Location = apps.get_model('api', 'Location')
+    LocationStats = apps.get_model('api', 'LocationStats')
+    Review = apps.get_model('api', 'Review')
+    Bookmark = apps.get_model('api', 'Bookmark')
+    ItineraryItem = apps.get_model('api', 'ItineraryItem')
+
+    reviews = {
+        row['location']: row
+        for row in Review.objects.values('location').annotate(count=models.Count('id'), total=models.Sum('rating')).order_by()
+    }
+    bookmarks = dict(Bookmark.objects.values('location').annotate(count=models.Count('id')).order_by().values_list('location', 'count'))
+    visits = dict(
+        ItineraryItem.objects.filter(day__completed=True).values('location').annotate(count=models.Count('id')).order_by().values_list('location', 'count')
+    )
+
+    LocationStats.objects.bulk_create([
+        LocationStats(
+            location_id=location_id,
+            location_type=location_type,
+            review_count=reviews[location_id]['count'] if location_id in reviews else 0,
+            rating_total=reviews[location_id]['total'] if location_id in reviews else 0,
+            bookmark_count=bookmarks.get(location_id, 0),
+            visit_count=visits.get(location_id, 0)
+        )
+        for location_id, location_type in Location.objects.values_list('id', 'location_type').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_day_completed_rating_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LocationStats',
+            fields=[
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.location')),
+                ('location_type', models.CharField(max_length=1)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.PositiveBigIntegerField(default=0)),
+                ('bookmark_count', models.PositiveIntegerField(default=0)),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location_type', 'review_count'], name='api_locatio_locatio_c66a41_idx'), models.Index(fields=['bookmark_count'], name='api_locatio_bookmar_1dae5e_idx'), models.Index(fields=['visit_count'], name='api_locatio_visit_c_1c0922_idx')],
+            },
+        ),
+        migrations.RunPython(fill_location_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_dashboard_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('completed_days', models.PositiveIntegerField(default=0)),
+                ('locations_visited', models.PositiveIntegerField(default=0)),
+                ('daily_visits', models.JSONField(default=dict)),
+                ('changes', models.PositiveBigIntegerField(default=0)),
+                ('computed_changes', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_people', models.PositiveIntegerField(null=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitors', to='api.monthlyreport')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('report', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyLocationVisits',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.location')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_visits', to='api.monthlyreport')),
+            ],
+            options={
+                'unique_together': {('report', 'location')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-19 14:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def fill_daily_stats(apps, schema_editor):
+    Review = apps.get_model('api', 'Review')
+    Bookmark = apps.get_model('api', 'Bookmark')
+    ItineraryItem = apps.get_model('api', 'ItineraryItem')
+    LocationClickBucket = apps.get_model('api', 'LocationClickBucket')
+    LocationDailyStats = apps.get_model('api', 'LocationDailyStats')
+
+    stats = defaultdict(dict)
+
+    for row in Review.objects.annotate(day=TruncDate('datetime_created')).values('location', 'day').annotate(count=models.Count('id'), total=models.Sum('rating')).order_by():
+        stats[(row['location'], row['day'])].update(reviews=row['count'], rating_total=row['total'])
+
+    for row in Bookmark.objects.annotate(day=TruncDate('datetime_created')).values('location', 'day').annotate(count=models.Count('id')).order_by():
+        stats[(row['location'], row['day'])]['bookmarks'] = row['count']
+
+    items = ItineraryItem.objects.filter(day__isnull=False).values('location', 'day__date')
+    for row in items.annotate(planned=models.Count('id'), completed=models.Count('id', filter=models.Q(day__completed=True))).order_by():
+        stats[(row['location'], row['day__date'])].update(planned_visits=row['planned'], completed_visits=row['completed'])
+
+    for location_id, bucket_start, amount in LocationClickBucket.objects.filter(granularity='D').values_list('location', 'bucket_start', 'amount'):
+        day_stats = stats[(location_id, timezone.localdate(bucket_start))]
+        day_stats['clicks'] = day_stats.get('clicks', 0) + amount
+
+    LocationDailyStats.objects.bulk_create([
+        LocationDailyStats(location_id=location_id, date=day, **day_stats) for (location_id, day), day_stats in stats.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_monthly_reports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookmarks', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.PositiveIntegerField(default=0)),
+                ('planned_visits', models.PositiveIntegerField(default=0)),
+                ('completed_visits', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='api.location')),
+            ],
+            options={
+                'unique_together': {('location', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
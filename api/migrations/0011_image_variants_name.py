@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-19 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_imported_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='variants_name',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='variants_name',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='locationimage',
+            name='variants_name',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='variants_name',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+    ]
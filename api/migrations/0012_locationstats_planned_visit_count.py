@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+def fill_planned_visit_counts(apps, schema_editor):
+    ItineraryItem = apps.get_model('api', 'ItineraryItem')
+    LocationStats = apps.get_model('api', 'LocationStats')
+
+    planned = ItineraryItem.objects.filter(day__isnull=False).values('location').annotate(count=models.Count('id')).order_by()
+    stats = LocationStats.objects.in_bulk([row['location'] for row in planned])
+
+    for row in planned:
+        if row['location'] in stats:
+            stats[row['location']].planned_visit_count = row['count']
+
+    LocationStats.objects.bulk_update(stats.values(), ['planned_visit_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_image_variants_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationstats',
+            name='planned_visit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_planned_visit_counts, migrations.RunPython.noop),
+    ]
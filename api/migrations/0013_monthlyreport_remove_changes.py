@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-19 18:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_locationstats_planned_visit_count'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='monthlyreport',
+            name='changes',
+        ),
+        migrations.RemoveField(
+            model_name='monthlyreport',
+            name='computed_changes',
+        ),
+    ]
@@ -1,11 +1,14 @@
 from collections import defaultdict
+from contextlib import contextmanager
 from datetime import timedelta, date
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.dispatch import receiver
-from django.db.models.signals import post_save
-from .managers import CustomUserManager
+from django.dispatch import receiver, Signal
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
+from .managers import CustomUserManager, RollupManager
+from .cache import invalidate_responses
+from .images import image_variants
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.utils import timezone
@@ -14,7 +17,12 @@ from django.db.models import Count, Avg, Sum
 from haversine import haversine, Unit
 from django.core.validators import MaxValueValidator, MinValueValidator
 
-import os, math
+import os, math, threading
+
+
+def is_prefetched(instance, name):
+    return name in getattr(instance, '_prefetched_objects_cache', {})
+
 
 class OTP(models.Model):
     user = models.OneToOneField("User", on_delete=models.CASCADE)
@@ -126,24 +134,20 @@ class Location(models.Model):
     @property
     def get_min_cost(self):
         if self.location_type == "1":
-            spot = Spot.objects.get(id=self.id)
-            return spot.get_min_cost
+            return self.spot.get_min_cost
 
         elif self.location_type == "2":
-            foodplace = FoodPlace.objects.get(id=self.id)
-            return foodplace.get_min_cost
+            return self.foodplace.get_min_cost
 
         return 0
 
     @property    
     def get_max_cost(self):
         if self.location_type == "1":
-            spot = Spot.objects.get(id=self.id)
-            return spot.get_max_cost
+            return self.spot.get_max_cost
 
         elif self.location_type == "2":
-            foodplace = FoodPlace.objects.get(id=self.id)
-            return foodplace.get_max_cost
+            return self.foodplace.get_max_cost
 
         return 0
     
@@ -164,14 +168,20 @@ class Location(models.Model):
             accommodation.save()
 
     @property
-    def nearby_events(self, radius_meters=750):
-        current_date = timezone.now().date()
+    def nearby_events(self):
+        return self.get_nearby_events()
 
-        nearby_events = Event.objects.filter(
-            start_date__lte=current_date,
-            end_date__gte=current_date
-        )
+    def get_nearby_events(self, current_events=None, radius_meters=750):
+        # current_events lets a caller look up today's events once for many locations
+        if current_events is None:
+            current_date = timezone.now().date()
 
+            current_events = Event.objects.filter(
+                start_date__lte=current_date,
+                end_date__gte=current_date
+            )
+
+        nearby_events = current_events
         spot_coordinates = (self.latitude, self.longitude)
         nearby_events = [
             event for event in nearby_events
@@ -223,6 +233,8 @@ def location_image_path(instance, filename):
 class LocationImage(models.Model):
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to=location_image_path, default='location_images/DefaultLocationImage.jpg', max_length=512)
+    # the image name the variants were last rendered for, they are only linked while it matches the image
+    variants_name = models.CharField(max_length=512, blank=True, default='')
     is_primary_image = models.BooleanField(default=False)
 
     def __str__(self):
@@ -248,6 +260,10 @@ class Spot(Location):
 
     @property
     def get_min_cost(self):
+        if is_prefetched(self, 'feetype_set'):
+            prices = [audience_type.price for fee_type in self.feetype_set.all() if fee_type.is_required for audience_type in fee_type.audience_types.all()]
+            return min(prices, default=0)
+
         all_fee_types = self.feetype_set.filter(is_required=True)
         all_audience_types = AudienceType.objects.filter(fee_type__in=all_fee_types)
 
@@ -259,8 +275,12 @@ class Spot(Location):
 
     @property
     def get_max_cost(self):
-        required_fee_types = self.feetype_set.filter(is_required=True)
-        optional_fee_types = self.feetype_set.filter(is_required=False)
+        if is_prefetched(self, 'feetype_set'):
+            required_fee_types = [fee_type for fee_type in self.feetype_set.all() if fee_type.is_required]
+            optional_fee_types = [fee_type for fee_type in self.feetype_set.all() if not fee_type.is_required]
+        else:
+            required_fee_types = self.feetype_set.filter(is_required=True)
+            optional_fee_types = self.feetype_set.filter(is_required=False)
 
         total_optional_fee_price = sum(
             audience_type.price
@@ -268,7 +288,7 @@ class Spot(Location):
             for audience_type in fee_type.audience_types.all()
         )
 
-        if required_fee_types.exists():
+        if required_fee_types:
             max_required_fee = max(
                 audience_type.price
                 for fee_type in required_fee_types
@@ -314,6 +334,9 @@ class FoodPlace(Location):
     
     @property
     def get_min_cost(self):
+        if is_prefetched(self, 'food_set'):
+            return min((food.price for food in self.food_set.all()), default=300.0)
+
         min_food = Food.objects.filter(location=self).order_by('price').first()
         if min_food is not None and hasattr(min_food, 'price'):
             return min_food.price
@@ -322,6 +345,9 @@ class FoodPlace(Location):
 
     @property
     def get_max_cost(self):
+        if is_prefetched(self, 'food_set'):
+            return max((food.price for food in self.food_set.all()), default=300.0)
+
         max_food = Food.objects.filter(location=self).order_by('-price').first()
 
         if max_food is not None and hasattr(max_food, 'price'):
@@ -349,10 +375,60 @@ class Itinerary(models.Model):
     number_of_people = models.PositiveIntegerField(default=1)
     budget = models.FloatField(default=0)
     name = models.CharField(max_length=60, default="My Trip")
+    version = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-id']
 
+    def save(self, *args, **kwargs):
+        # bumped in the database so an instance loaded before a day/item change can't write an old version back
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        self.version = models.F('version') + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
+    @staticmethod
+    def bump_version(**filters):
+        Itinerary.objects.filter(**filters).update(version=models.F('version') + 1)
+
+    def set_calendar(self, start_date, end_date):
+        # makes the itinerary's days cover exactly start_date..end_date with a fixed number of queries:
+        # missing dates are bulk created, days outside the range deleted and the order renumbered by date
+        if end_date < start_date:
+            # an empty range would delete every day of the trip, with its items and ratings
+            raise ValueError("end_date must not be before start_date")
+
+        existing_days = list(self.day_set.all())
+        kept_days = [day for day in existing_days if start_date <= day.date <= end_date]
+        existing_dates = {day.date for day in kept_days}
+        new_days = [
+            Day(itinerary=self, date=start_date + timedelta(days=offset))
+            for offset in range((end_date - start_date).days + 1)
+            if start_date + timedelta(days=offset) not in existing_dates
+        ]
+
+        days = sorted(kept_days + new_days, key=lambda day: (day.date, day.pk is None, day.pk or 0))
+        renumbered = []
+
+        for order, day in enumerate(days, start=1):
+            if day.pk is not None and day.order != order:
+                renumbered.append(day)
+
+            day.order = order
+
+        with transaction.atomic(), batched_itinerary_changes('calendar') as changes:
+            if len(kept_days) < len(existing_days):
+                self.day_set.exclude(date__range=(start_date, end_date)).delete()
+
+            Day.objects.bulk_create(new_days)
+            Day.objects.bulk_update(renumbered, ['order'])
+            changes['itinerary_ids'].add(self.pk)
+
+        return days
+
 class Day(models.Model):
     date = models.DateField()
     itinerary = models.ForeignKey(Itinerary, on_delete=models.CASCADE)
@@ -363,6 +439,9 @@ class Day(models.Model):
 
     class Meta:
         ordering = ['date']
+        indexes = [
+            models.Index(fields=['completed', 'rating', 'date']),
+        ]
 
 class ItineraryItem(models.Model):
     day = models.ForeignKey(Day, on_delete=models.CASCADE, null=True)
@@ -375,26 +454,29 @@ class ItineraryItem(models.Model):
     def __str__(self):
         return f"{self.day.date} - {self.location.name} - {self.order}"
 
-    def get_transportation_type(self):
+    def get_transportation_type(self, previous_item=None):
         if self.order == 0:
             return 0
         else:
-            previous_item = ItineraryItem.objects.get(order=self.order - 1, day=self.day)
+            if previous_item is None:
+                previous_item = ItineraryItem.objects.get(order=self.order - 1, day=self.day)
+
             previous_location = previous_item.location
             distance = self.location.get_distance_from_origin(previous_location)
+            boat_activities = {"Boating", "Island Hopping"}
 
             if self.location.location_type == '1':
-                spot = Spot.objects.get(id=self.location.id)
+                spot = self.location.spot
                 if previous_location.location_type == '1':
-                    previous_spot = Spot.objects.get(id=previous_location.id)
-                    if previous_spot.activity.filter(name="Boating").exists() or previous_spot.activity.filter(name="Island Hopping").exists():
+                    previous_spot = previous_location.spot
+                    if boat_activities.intersection(previous_spot.get_activities):
                         return {
                             "name": "Other Transportation (Boat, Mixed, etc.)", 
                             "meters": distance
                         }
                 # consider din dapat kung spot ba yung previous location
                 # if previous_location.activity.filter()
-                elif  spot.activity.filter(name="Boating").exists() or spot.activity.filter(name="Island Hopping").exists(): 
+                elif boat_activities.intersection(spot.get_activities): 
                     return {
                         "name": "Other Transportation (Boat, Mixed, etc.)",
                         "meters": distance
@@ -476,6 +558,7 @@ class Food(models.Model):
     item = models.CharField(max_length=100)
     price = models.FloatField()
     image = models.ImageField(blank=True, null=True, upload_to='location_food/')
+    variants_name = models.CharField(max_length=512, blank=True, default='')
 
 class Service(models.Model):
     location = models.ForeignKey(Accommodation, on_delete=models.CASCADE)
@@ -483,6 +566,7 @@ class Service(models.Model):
     description = models.CharField(max_length=500)
     price = models.FloatField()
     image = models.ImageField(blank=True, null=True, upload_to='location_service/')
+    variants_name = models.CharField(max_length=512, blank=True, default='')
 
 
 class Event(models.Model):
@@ -550,6 +634,7 @@ class Driver(models.Model):
     )
     plate_number = models.CharField(max_length=7)
     image = models.ImageField(blank=True, null=True, upload_to='drivers/', default='drivers/DefaultDriverImage.png')
+    variants_name = models.CharField(max_length=512, blank=True, default='')
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -571,6 +656,152 @@ class UserClick(models.Model):
     def __str__(self):
         return f"{self.user.email} clicked on {self.location.name}: {self.amount}x"
 
+class LocationClickBucket(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="click_buckets")
+    granularity = models.CharField(
+        max_length=1,
+        choices=[
+            ('H', 'Hourly'),
+            ('D', 'Daily'),
+        ],
+        default='H'
+    )
+    bucket_start = models.DateTimeField()
+    amount = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('location', 'granularity', 'bucket_start')
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.location.name} [{self.granularity}] {self.bucket_start}: {self.amount}x"
+
+class TrendingLocation(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    location_type = models.CharField(max_length=1)
+    rank = models.PositiveIntegerField()
+    score = models.FloatField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['location_type', 'rank']
+        unique_together = ('location_type', 'rank')
+
+    def __str__(self):
+        return f"#{self.rank} {self.location.name}: {self.score}"
+
+
+class CatalogVersion(models.Model):
+    group = models.CharField(max_length=30, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.group} v{self.version}"
+
+    @classmethod
+    def bump(cls, groups):
+        now = timezone.now()
+
+        for group in groups:
+            if not cls.objects.filter(group=group).update(version=models.F('version') + 1, updated_at=now):
+                cls.objects.get_or_create(group=group, defaults={'version': 1, 'updated_at': now})
+
+    @classmethod
+    def get_versions(cls, groups):
+        versions = {entry.group: entry for entry in cls.objects.filter(group__in=groups)}
+        return [(group, versions[group].version, versions[group].updated_at) if group in versions else (group, 0, None) for group in groups]
+
+
+
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=30, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class LocationStats(models.Model):
+    location = models.OneToOneField(Location, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    location_type = models.CharField(max_length=1)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveBigIntegerField(default=0)
+    bookmark_count = models.PositiveIntegerField(default=0)
+    visit_count = models.PositiveIntegerField(default=0)
+    planned_visit_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location_type', 'review_count']),
+            models.Index(fields=['bookmark_count']),
+            models.Index(fields=['visit_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.location.name}: {self.review_count} reviews, {self.bookmark_count} bookmarks, {self.visit_count} visits"
+
+class LocationDailyStats(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    bookmarks = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    planned_visits = models.PositiveIntegerField(default=0)
+    completed_visits = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # the unique index doubles as the (location, date range) index the time series reads
+        unique_together = ('location', 'date')
+
+    def __str__(self):
+        return f"{self.location.name} {self.date}"
+
+class MonthlyReport(models.Model):
+    month = models.DateField(unique=True)
+    completed_days = models.PositiveIntegerField(default=0)
+    locations_visited = models.PositiveIntegerField(default=0)
+    daily_visits = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%B %Y}: {self.completed_days} completed days"
+
+class MonthlyLocationVisits(models.Model):
+    report = models.ForeignKey(MonthlyReport, on_delete=models.CASCADE, related_name="location_visits")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    visits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('report', 'location')
+
+class MonthlyVisitor(models.Model):
+    report = models.ForeignKey(MonthlyReport, on_delete=models.CASCADE, related_name="visitors")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    max_people = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        unique_together = ('report', 'user')
+
+class ImportedRow(models.Model):
+    # the content hash of every csv row an import_* command applied, keyed on the row's natural key,
+    # so a re-import only touches the rows that changed since
+    source = models.CharField(max_length=30)
+    key = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=32)
+    imported_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('source', 'key')
+
+    def __str__(self):
+        return f"{self.source}: {self.key}"
 
 @receiver(post_save, sender=Spot)
 def create_default_fee(sender, instance, created, **kwargs):
@@ -580,4 +811,364 @@ def create_default_fee(sender, instance, created, **kwargs):
 @receiver(post_save, sender=FeeType)
 def create_default_audience_type(sender, instance, created, **kwargs):
     if created:
-        AudienceType.objects.create(fee_type=instance, name="General", price=0)
\ No newline at end of file
+        AudienceType.objects.create(fee_type=instance, name="General", price=0)
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Spot)
+@receiver(post_save, sender=FoodPlace)
+@receiver(post_save, sender=Accommodation)
+def update_location_search(sender, instance, **kwargs):
+    from .search import trigram_index, location_search_index
+    location_id = instance.pk
+
+    def update_indexes():
+        trigram_index.update_locations([location_id])
+        location_search_index.update_locations([location_id])
+
+    transaction.on_commit(update_indexes)
+
+@receiver(post_delete, sender=Location)
+def remove_location_search(sender, instance, **kwargs):
+    from .search import trigram_index, location_search_index
+    location_id = instance.pk
+
+    def remove_from_indexes():
+        trigram_index.remove_locations([location_id])
+        location_search_index.remove_locations([location_id])
+
+    transaction.on_commit(remove_from_indexes)
+
+@receiver(m2m_changed, sender=Spot.tags.through)
+@receiver(m2m_changed, sender=Spot.activity.through)
+@receiver(m2m_changed, sender=FoodPlace.tags.through)
+def update_location_search_terms(sender, instance, action, reverse, pk_set, **kwargs):
+    from .search import location_search_index
+
+    if not action.startswith('post_'):
+        return
+
+    # the index only sees committed text, a rolled back change never reaches it
+    if not reverse:
+        location_ids = [instance.pk]
+        transaction.on_commit(lambda: location_search_index.update_locations(location_ids))
+    elif pk_set:
+        location_ids = list(pk_set)
+        transaction.on_commit(lambda: location_search_index.update_locations(location_ids))
+    else:
+        # clearing a tag or activity from the reverse side does not report which locations were affected
+        transaction.on_commit(location_search_index.invalidate)
+
+# which cached catalog responses a change to each model can affect; locations covers the list payloads
+# (fees, food prices, ratings, images and tags are all part of a location card)
+CATALOG_GROUPS = {
+    Location: ('locations',),
+    Spot: ('locations',),
+    FoodPlace: ('locations',),
+    Accommodation: ('locations',),
+    LocationImage: ('locations',),
+    Review: ('locations',),
+    Food: ('locations',),
+    FeeType: ('locations', 'fees'),
+    AudienceType: ('locations', 'fees'),
+    Tag: ('locations', 'tags'),
+    FoodTag: ('locations', 'tags'),
+    Activity: ('tags',),
+    Event: ('events',),
+    Spot.tags.through: ('locations',),
+    Spot.activity.through: ('locations',),
+    FoodPlace.tags.through: ('locations',),
+}
+
+def bump_catalog_versions(groups):
+    # bumped only once the change is committed, so a new version never points at old data
+    transaction.on_commit(lambda: CatalogVersion.bump(groups))
+
+def bump_catalog_on_change(sender, **kwargs):
+    bump_catalog_versions(CATALOG_GROUPS[sender])
+
+def bump_catalog_on_m2m_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_catalog_versions(CATALOG_GROUPS[sender])
+
+# connected per model rather than to every sender, so unrelated models keep Django's fast bulk deletes
+for catalog_model in CATALOG_GROUPS:
+    if catalog_model._meta.auto_created:
+        m2m_changed.connect(bump_catalog_on_m2m_change, sender=catalog_model)
+    else:
+        post_save.connect(bump_catalog_on_change, sender=catalog_model)
+        post_delete.connect(bump_catalog_on_change, sender=catalog_model)
+
+def get_response_scopes(sender, instance):
+    # the cached responses (see cache.py) a changed row shows up in
+    if isinstance(instance, Location):
+        return [f"location:{instance.pk}"]
+
+    if sender in (LocationImage, Review, Food, Service):
+        return [f"location:{instance.location_id}"]
+
+    if sender is FeeType:
+        return [f"location:{instance.spot_id}"]
+
+    if sender is AudienceType:
+        spot_id = FeeType.objects.filter(id=instance.fee_type_id).values_list('spot_id', flat=True).first()
+        return [f"location:{spot_id}"] if spot_id else []
+
+    if sender in (Tag, FoodTag, Activity):
+        return ['locations', 'tags']
+
+    if sender is Event:
+        return ['events']
+
+    if sender is User:
+        # reviews on a spot page show the reviewer's name
+        location_ids = Review.objects.filter(user=instance).values_list('location_id', flat=True).distinct()
+        return [f"location:{location_id}" for location_id in location_ids]
+
+    return []
+
+def invalidate_cached_responses(sender, instance, **kwargs):
+    invalidate_responses(get_response_scopes(sender, instance))
+
+for response_model in (Location, Spot, FoodPlace, Accommodation, LocationImage, Review, Food, Service, FeeType, AudienceType, Tag, FoodTag, Activity, Event, User):
+    post_save.connect(invalidate_cached_responses, sender=response_model)
+    post_delete.connect(invalidate_cached_responses, sender=response_model)
+
+@receiver(m2m_changed, sender=Spot.tags.through)
+@receiver(m2m_changed, sender=Spot.activity.through)
+@receiver(m2m_changed, sender=FoodPlace.tags.through)
+def invalidate_cached_location_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        invalidate_responses([f"location:{instance.pk}"])
+    elif pk_set:
+        invalidate_responses([f"location:{pk}" for pk in pk_set])
+    else:
+        invalidate_responses(['locations'])
+
+# one event per change to an itinerary's days or items, carrying the itinerary and day ids and an action name;
+# bulk operations send it once for the whole batch, single saves and deletes through the row signals below
+itinerary_changed = Signal()
+itinerary_change_batch = threading.local()
+
+def send_itinerary_changed(action, itinerary_ids=(), day_ids=()):
+    itinerary_ids = set(itinerary_ids)
+    day_ids = set(day_ids)
+
+    if day_ids:
+        itinerary_ids.update(Day.objects.filter(id__in=day_ids).order_by().values_list('itinerary_id', flat=True).distinct())
+
+    if itinerary_ids:
+        itinerary_changed.send(sender=Itinerary, itinerary_ids=itinerary_ids, day_ids=day_ids, action=action)
+
+@contextmanager
+def batched_itinerary_changes(action):
+    # row signals fired inside the block (e.g. by a cascading delete) are collected and sent as a single event
+    if getattr(itinerary_change_batch, 'changes', None) is not None:
+        yield itinerary_change_batch.changes
+        return
+
+    changes = itinerary_change_batch.changes = {'itinerary_ids': set(), 'day_ids': set()}
+
+    try:
+        yield changes
+    finally:
+        itinerary_change_batch.changes = None
+
+    send_itinerary_changed(action, changes['itinerary_ids'], changes['day_ids'])
+
+def record_itinerary_change(action, itinerary_ids=(), day_ids=()):
+    changes = getattr(itinerary_change_batch, 'changes', None)
+
+    if changes is None:
+        send_itinerary_changed(action, itinerary_ids, day_ids)
+    else:
+        changes['itinerary_ids'].update(itinerary_ids)
+        changes['day_ids'].update(day_ids)
+
+@receiver(itinerary_changed)
+def bump_itinerary_versions(sender, itinerary_ids, **kwargs):
+    Itinerary.bump_version(pk__in=itinerary_ids)
+
+@receiver(post_save, sender=Day)
+@receiver(post_delete, sender=Day)
+def record_day_change(sender, instance, **kwargs):
+    record_itinerary_change('day', itinerary_ids=[instance.itinerary_id])
+
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+def record_item_change(sender, instance, **kwargs):
+    if instance.day_id:
+        record_itinerary_change('item', day_ids=[instance.day_id])
+
+
+# dashboard rollups; the changes are queued and written once per transaction by RollupManager
+COUNTED_MODELS = {
+    User: 'users',
+    Location: 'locations',
+    Spot: 'spots',
+    FoodPlace: 'food_places',
+    Accommodation: 'accommodations',
+    Itinerary: 'itineraries',
+}
+PREFERENCE_FIELDS = ('art', 'activity', 'culture', 'entertainment', 'history', 'nature', 'religion')
+
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        # a saved subclass only reports itself, its location row is counted along with it. Location.save copies
+        # a plain location's __dict__ into the subtype it creates, so the models already counted come along too
+        models = {sender, *(parent for parent in sender._meta.parents if parent in COUNTED_MODELS)}
+        counted = instance.__dict__.setdefault('_counted_models', set())
+        names = [COUNTED_MODELS[model] for model in models - counted]
+        counted.update(models)
+
+        if names:
+            RollupManager().queue(counters={name: 1 for name in names})
+
+def count_deleted(sender, instance, **kwargs):
+    RollupManager().queue(counters={COUNTED_MODELS[sender]: -1})
+
+for counted_model in COUNTED_MODELS:
+    post_save.connect(count_created, sender=counted_model)
+    post_delete.connect(count_deleted, sender=counted_model)
+
+def get_preference_flags(instance):
+    # read from __dict__ so a deferred field is never loaded just for the rollup
+    return {field: bool(instance.__dict__.get(field)) for field in PREFERENCE_FIELDS}
+
+@receiver(post_init, sender=Preferences)
+def remember_preference_flags(sender, instance, **kwargs):
+    instance._saved_flags = get_preference_flags(instance) if instance.pk else None
+
+@receiver(post_save, sender=Preferences)
+def count_preferences(sender, instance, created, **kwargs):
+    flags = get_preference_flags(instance)
+    saved_flags = None if created else instance._saved_flags
+    counters = {f"preferences_{field}": int(flags[field]) - int(bool(saved_flags and saved_flags[field])) for field in PREFERENCE_FIELDS}
+
+    if created:
+        counters['preferences'] = 1
+
+    RollupManager().queue(counters=counters)
+    instance._saved_flags = flags
+
+@receiver(post_delete, sender=Preferences)
+def uncount_preferences(sender, instance, **kwargs):
+    flags = instance._saved_flags or get_preference_flags(instance)
+    counters = {f"preferences_{field}": -int(flags[field]) for field in PREFERENCE_FIELDS}
+    counters['preferences'] = -1
+
+    RollupManager().queue(counters=counters)
+
+def get_review_stats(instance):
+    return (instance.location_id, instance.__dict__.get('rating') or 0)
+
+@receiver(post_init, sender=Review)
+def remember_review_stats(sender, instance, **kwargs):
+    instance._saved_stats = get_review_stats(instance) if instance.pk else None
+
+@receiver(post_save, sender=Review)
+def add_review_stats(sender, instance, created, **kwargs):
+    # an edited rating takes the old one back out, read on load like the preference flags
+    location_id, rating = stats = get_review_stats(instance)
+    location_deltas = defaultdict(lambda: defaultdict(int))
+    saved_stats = None if created else instance._saved_stats
+
+    if stats != saved_stats:
+        location_deltas[location_id]['review_count'] += 1
+        location_deltas[location_id]['rating_total'] += rating
+
+        if saved_stats:
+            location_deltas[saved_stats[0]]['review_count'] -= 1
+            location_deltas[saved_stats[0]]['rating_total'] -= saved_stats[1]
+
+    RollupManager().queue(location_deltas=location_deltas, location_dates=[(instance.location_id, instance.datetime_created)])
+    instance._saved_stats = stats
+
+@receiver(post_delete, sender=Review)
+def remove_review_stats(sender, instance, **kwargs):
+    location_id, rating = instance._saved_stats or get_review_stats(instance)
+    RollupManager().queue(
+        location_deltas={location_id: {'review_count': -1, 'rating_total': -rating}},
+        location_dates=[(instance.location_id, instance.datetime_created)]
+    )
+
+@receiver(post_save, sender=Bookmark)
+def add_bookmark_stats(sender, instance, created, **kwargs):
+    location_deltas = {instance.location_id: {'bookmark_count': 1}} if created else None
+    RollupManager().queue(location_deltas=location_deltas, location_dates=[(instance.location_id, instance.datetime_created)])
+
+@receiver(post_delete, sender=Bookmark)
+def remove_bookmark_stats(sender, instance, **kwargs):
+    RollupManager().queue(location_deltas={instance.location_id: {'bookmark_count': -1}}, location_dates=[(instance.location_id, instance.datetime_created)])
+
+def get_item_position(instance):
+    return (instance.__dict__.get('location_id'), instance.__dict__.get('day_id'))
+
+@receiver(post_init, sender=ItineraryItem)
+def remember_item_position(sender, instance, **kwargs):
+    instance._saved_position = get_item_position(instance) if instance.pk else None
+
+@receiver(post_save, sender=ItineraryItem)
+def add_item_stats(sender, instance, created, **kwargs):
+    # the visits follow an item onto the day it was saved on and off the day it was loaded from
+    position = get_item_position(instance)
+    saved_position = None if created else instance._saved_position
+
+    if position != saved_position:
+        item_changes = [(*position, 1)] + ([(*saved_position, -1)] if saved_position else [])
+        RollupManager().queue(item_changes=item_changes)
+
+    instance._saved_position = position
+
+@receiver(post_delete, sender=ItineraryItem)
+def remove_item_stats(sender, instance, **kwargs):
+    RollupManager().queue(item_changes=[(instance.location_id, instance.day_id, -1)])
+
+@receiver(post_init, sender=Day)
+def remember_day_completed(sender, instance, **kwargs):
+    instance._saved_completed = bool(instance.__dict__.get('completed')) if instance.pk else None
+
+@receiver(post_save, sender=Day)
+def refresh_monthly_report(sender, instance, created, **kwargs):
+    completed = bool(instance.completed)
+    saved_completed = None if created else instance._saved_completed
+
+    if saved_completed is not None and completed != saved_completed:
+        RollupManager().queue(completed_before={instance.pk: saved_completed}, months=[instance.date])
+    elif completed:
+        RollupManager().queue(months=[instance.date])
+
+    instance._saved_completed = completed
+
+@receiver(post_delete, sender=Day)
+def refresh_deleted_day_stats(sender, instance, **kwargs):
+    # the items deleted along with the day can no longer look up its date or whether it was completed
+    completed = instance._saved_completed if instance._saved_completed is not None else bool(instance.completed)
+    RollupManager().queue(day_dates={instance.pk: instance.date}, completed_before={instance.pk: completed})
+
+@receiver(post_save, sender=Itinerary)
+def refresh_monthly_visitors(sender, instance, created, **kwargs):
+    # the group size counts towards the visitors of every month the itinerary has completed days in
+    if not created:
+        RollupManager().queue(itinerary_ids=[instance.pk])
+
+@receiver(itinerary_changed)
+def refresh_visited_location_stats(sender, itinerary_ids, day_ids, action, **kwargs):
+    # completing days and bulk item writes change the daily stats without any item signal; the bulk writers
+    # queue their own item changes, completed days move the items they already have into the visits
+    if action == 'completed':
+        RollupManager().queue(itinerary_ids=itinerary_ids, completed_before={day_id: False for day_id in day_ids})
+    elif action not in ('item', 'ordering', 'calendar'):
+        RollupManager().queue(itinerary_ids=itinerary_ids)
+
+@receiver(post_save, sender=LocationImage)
+@receiver(post_save, sender=Food)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Driver)
+def render_image_variants(sender, instance, update_fields=None, **kwargs):
+    # once the upload is committed; a save that kept the image finds its variants already rendered
+    if instance.image and (update_fields is None or 'image' in update_fields):
+        name = instance.image.name
+        transaction.on_commit(lambda: image_variants.queue([name]))
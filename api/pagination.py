@@ -0,0 +1,201 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    # opt-in: without a cursor or page_size the endpoint keeps returning the plain list it always has.
+    # CursorPagination only keeps the first ordering field plus an offset in its cursor, which duplicates or skips
+    # rows once a tie on that field runs past the offset cap; this cursor carries the value of every ordering field
+    # of the row a page stops at, and the ordering always ends on the unique id
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def is_requested(self, request):
+        return self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+
+    def get_ordering(self, request, queryset, view):
+        # search results are paged by their similarity rank rather than by id
+        if 'similarity' in queryset.query.annotations:
+            return ('-similarity', 'id')
+
+        ordering = tuple(super().get_ordering(request, queryset, view))
+
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('id',)
+
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_position(request)
+
+        ordering = [self.reverse_field(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def reverse_field(self, field):
+        return field[1:] if field.startswith('-') else f"-{field}"
+
+    def get_position_filter(self, ordering, position):
+        # rows strictly after the position in the (possibly reversed) ordering, compared field by field
+        condition = Q()
+
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+
+            for previous_field, value in zip(ordering[:index], position):
+                step &= Q(**{previous_field.lstrip('-'): value})
+
+            condition |= step
+
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_position(self, position, reverse):
+        if position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        cursor = json.dumps({'p': position, 'r': int(reverse)}, default=encode_value)
+        encoded = urlsafe_b64encode(cursor.encode()).decode('ascii')
+
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_position(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if not self.page:
+            # an empty page reached backwards means the cursor was on the very first row
+            return self.encode_position(None, False)
+
+        return self.encode_position(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.encode_position(self.get_position(self.page[0]), True)
+
+
+def encode_value(value):
+    # dates and datetimes keep their full precision so the position compares equal to the row it came from
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    raise TypeError(f"{type(value).__name__} cannot be part of a cursor")
+
+
+def is_stream_requested(request):
+    return request.query_params.get('stream', '').lower() in ('1', 'true')
+
+def stream_json_response(queryset, serializer_class, context=None):
+    chunk_size = settings.STREAMING_CHUNK_SIZE
+
+    def serialize(chunk):
+        return serializer_class(chunk, many=True, context=context).data
+
+    def generate():
+        yield '['
+        separator = ''
+        chunk = []
+
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(instance)
+
+            if len(chunk) == chunk_size:
+                for row in serialize(chunk):
+                    yield separator + json.dumps(row, cls=JSONEncoder)
+                    separator = ','
+                chunk = []
+
+        for row in serialize(chunk):
+            yield separator + json.dumps(row, cls=JSONEncoder)
+            separator = ','
+
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+def list_response(request, queryset, serializer_class, ordering=None, context=None):
+    if is_stream_requested(request):
+        return stream_json_response(queryset, serializer_class, context)
+
+    paginator = KeysetPagination(ordering)
+    page = paginator.paginate_queryset(queryset, request)
+
+    if page is not None:
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = serializer_class(queryset, many=True, context=context)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class StreamingListMixin():
+    def list(self, request, *args, **kwargs):
+        if is_stream_requested(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            return stream_json_response(queryset, self.get_serializer_class(), self.get_serializer_context())
+
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,511 @@
+import re
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q, Case, When, Value, FloatField
+from django.db.models.functions import Greatest
+from django.contrib.postgres.search import TrigramWordSimilarity
+from rest_framework.filters import BaseFilterBackend
+
+NON_WORD_CHARACTERS = re.compile(r'[^\w]+')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'its',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with',
+}
+
+
+def get_words(text):
+    return [word for word in NON_WORD_CHARACTERS.split((text or '').lower().replace('_', ' ')) if word]
+
+def get_terms(text):
+    return [word for word in get_words(text) if word not in STOPWORDS]
+
+def get_trigrams(text):
+    # mirrors pg_trgm: every word is padded with two spaces in front and one behind
+    trigrams = set()
+
+    for word in get_words(text):
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return trigrams
+
+
+class SearchIndex(ABC):
+    # an in-process index per worker: only the very first search waits for it, later rebuilds (which pick up bulk
+    # writes that skip the signals) read a new snapshot on a background thread while searches keep using the
+    # current one, and locations changed in the meantime are applied again once it is swapped in
+    max_age = 300
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.changed = None
+        self.rebuilding = False
+        self.built_at = 0
+
+    @abstractmethod
+    def is_built(self):
+        pass
+
+    @abstractmethod
+    def read(self):
+        # a complete snapshot of the index, built without holding the lock
+        pass
+
+    @abstractmethod
+    def swap(self, snapshot):
+        pass
+
+    @abstractmethod
+    def invalidate(self):
+        pass
+
+    @abstractmethod
+    def update_locations(self, location_ids):
+        pass
+
+    def build(self):
+        with self.lock:
+            self.changed = set()
+
+        try:
+            snapshot = self.read()
+        except Exception:
+            with self.lock:
+                self.changed = None
+            raise
+
+        with self.lock:
+            self.swap(snapshot)
+            self.built_at = time.monotonic()
+            changed, self.changed = self.changed, None
+
+        if changed:
+            self.update_locations(changed)
+
+    def rebuild_in_background(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+
+            self.rebuilding = True
+
+        def rebuild():
+            try:
+                self.build()
+            finally:
+                with self.lock:
+                    self.rebuilding = False
+
+                connections.close_all()
+
+        threading.Thread(target=rebuild, daemon=True).start()
+
+    def ensure_built(self):
+        with self.lock:
+            if not self.is_built():
+                self.build()
+            elif time.monotonic() - self.built_at > self.max_age:
+                self.rebuild_in_background()
+
+    def record_changes(self, location_ids):
+        # returns whether there is an index to apply them to
+        with self.lock:
+            if self.changed is not None:
+                self.changed.update(location_ids)
+
+            return self.is_built()
+
+
+class TrigramIndex(SearchIndex):
+    fields = ('name', 'address')
+    field_weights = {'name': 1.0, 'address': 0.5}
+
+    def __init__(self):
+        super().__init__()
+        self.postings = None
+        self.trigrams = None
+
+    def is_built(self):
+        return self.postings is not None
+
+    def invalidate(self):
+        with self.lock:
+            self.postings = None
+            self.trigrams = None
+
+    def get_rows(self, location_ids=None):
+        from .models import Location
+        locations = Location.objects.all()
+
+        if location_ids is not None:
+            locations = locations.filter(id__in=location_ids)
+
+        return locations.values('id', *self.fields).iterator(chunk_size=2000)
+
+    def add_row(self, postings, trigrams, row):
+        # the trigrams of every location are kept so that an update can take it back out of the postings
+        trigrams[row['id']] = {field: get_trigrams(row[field]) for field in self.fields}
+
+        for field, field_trigrams in trigrams[row['id']].items():
+            for trigram in field_trigrams:
+                postings[field][trigram].add(row['id'])
+
+    def remove_location(self, location_id):
+        for field, field_trigrams in self.trigrams.pop(location_id, {}).items():
+            for trigram in field_trigrams:
+                self.postings[field][trigram].discard(location_id)
+
+                if not self.postings[field][trigram]:
+                    del self.postings[field][trigram]
+
+    def read(self):
+        postings = {field: defaultdict(set) for field in self.fields}
+        trigrams = {}
+
+        for row in self.get_rows():
+            self.add_row(postings, trigrams, row)
+
+        return postings, trigrams
+
+    def swap(self, snapshot):
+        self.postings, self.trigrams = snapshot
+
+    def update_locations(self, location_ids):
+        # an index that was never built is left alone, the first search builds it from scratch
+        if not self.record_changes(location_ids):
+            return
+
+        rows = list(self.get_rows(location_ids))
+
+        with self.lock:
+            if self.postings is None:
+                return
+
+            for location_id in location_ids:
+                self.remove_location(location_id)
+
+            for row in rows:
+                self.add_row(self.postings, self.trigrams, row)
+
+    def remove_locations(self, location_ids):
+        if not self.record_changes(location_ids):
+            return
+
+        with self.lock:
+            if self.postings is None:
+                return
+
+            for location_id in location_ids:
+                self.remove_location(location_id)
+
+    def search(self, query, fields=None, threshold=0.0):
+        query_trigrams = get_trigrams(query)
+
+        if not query_trigrams:
+            return {}
+
+        self.ensure_built()
+        scores = defaultdict(float)
+
+        with self.lock:
+            for field in fields or self.fields:
+                if field not in self.postings:
+                    continue
+
+                # share of the query's trigrams found in the field, an approximation of pg_trgm's word_similarity
+                matches = defaultdict(int)
+                for trigram in query_trigrams:
+                    for location_id in self.postings[field].get(trigram, ()):
+                        matches[location_id] += 1
+
+                for location_id, count in matches.items():
+                    similarity = count / len(query_trigrams)
+
+                    if similarity >= threshold:
+                        scores[location_id] = max(scores[location_id], similarity * self.field_weights.get(field, 1.0))
+
+        return scores
+
+trigram_index = TrigramIndex()
+
+
+class LocationSearchIndex(SearchIndex):
+    # BM25F over the text fields of a location, weighted so that name and tag hits outrank description hits
+    k1 = 1.2
+    b = 0.75
+    max_age = 600
+    field_weights = {
+        'name': 3.0,
+        'tags': 2.0,
+        'activities': 2.0,
+        'address': 1.0,
+        'description': 1.0,
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.documents = None
+        self.postings = None
+        self.total_lengths = None
+
+    def is_built(self):
+        return self.documents is not None
+
+    def get_location_documents(self, location_ids=None):
+        from .models import Location, Spot, FoodPlace
+        locations = Location.objects.all()
+
+        if location_ids is not None:
+            locations = locations.filter(id__in=location_ids)
+
+        documents = {}
+        for row in locations.values('id', 'name', 'address', 'description', 'location_type', 'is_closed').iterator(chunk_size=2000):
+            documents[row['id']] = {
+                'location_type': row['location_type'],
+                'is_closed': row['is_closed'],
+                'fields': {
+                    'name': row['name'],
+                    'address': row['address'],
+                    'description': row['description'],
+                    'tags': [],
+                    'activities': [],
+                },
+            }
+
+        related = [
+            (Spot.tags.through.objects.values_list('spot_id', 'tag__name'), 'spot_id', 'tags'),
+            (FoodPlace.tags.through.objects.values_list('foodplace_id', 'foodtag__name'), 'foodplace_id', 'tags'),
+            (Spot.activity.through.objects.values_list('spot_id', 'activity__name'), 'spot_id', 'activities'),
+        ]
+
+        for rows, location_field, field in related:
+            if location_ids is not None:
+                rows = rows.filter(**{f"{location_field}__in": location_ids})
+
+            for location_id, name in rows.iterator(chunk_size=2000):
+                if location_id in documents:
+                    documents[location_id]['fields'][field].append(name)
+
+        return documents
+
+    def add_document(self, snapshot, location_id, document):
+        documents, postings, total_lengths = snapshot
+        terms = defaultdict(dict)
+        lengths = {}
+
+        for field, value in document['fields'].items():
+            words = get_terms(' '.join(value) if isinstance(value, list) else value)
+            lengths[field] = len(words)
+            total_lengths[field] += len(words)
+
+            for term, frequency in Counter(words).items():
+                terms[term][field] = frequency
+
+        for term in terms:
+            postings[term].add(location_id)
+
+        documents[location_id] = {
+            'location_type': document['location_type'],
+            'is_closed': document['is_closed'],
+            'lengths': lengths,
+            'terms': terms,
+        }
+
+    def remove_document(self, location_id):
+        document = self.documents.pop(location_id, None)
+
+        if document is None:
+            return
+
+        for field, length in document['lengths'].items():
+            self.total_lengths[field] -= length
+
+        for term in document['terms']:
+            self.postings[term].discard(location_id)
+
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def read(self):
+        snapshot = ({}, defaultdict(set), defaultdict(int))
+
+        for location_id, document in self.get_location_documents().items():
+            self.add_document(snapshot, location_id, document)
+
+        return snapshot
+
+    def swap(self, snapshot):
+        self.documents, self.postings, self.total_lengths = snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.documents = None
+
+    def update_locations(self, location_ids):
+        # an index that was never built is left alone, the first search builds it from scratch
+        if not self.record_changes(location_ids):
+            return
+
+        documents = self.get_location_documents(location_ids)
+
+        with self.lock:
+            if self.documents is None:
+                return
+
+            for location_id in location_ids:
+                self.remove_document(location_id)
+
+                if location_id in documents:
+                    self.add_document((self.documents, self.postings, self.total_lengths), location_id, documents[location_id])
+
+    def remove_locations(self, location_ids):
+        if not self.record_changes(location_ids):
+            return
+
+        with self.lock:
+            if self.documents is None:
+                return
+
+            for location_id in location_ids:
+                self.remove_document(location_id)
+
+    def search(self, query, location_type=None, hide_closed=False):
+        self.ensure_built()
+
+        with self.lock:
+            total_documents = len(self.documents)
+
+            if not total_documents:
+                return []
+
+            average_lengths = {
+                field: (self.total_lengths[field] / total_documents) or 1
+                for field in self.field_weights
+            }
+
+            scores = defaultdict(float)
+            for term in set(get_terms(query)):
+                matches = self.postings.get(term)
+
+                if not matches:
+                    continue
+
+                idf = math.log(1 + (total_documents - len(matches) + 0.5) / (len(matches) + 0.5))
+
+                for location_id in matches:
+                    document = self.documents[location_id]
+
+                    if location_type and document['location_type'] != location_type:
+                        continue
+
+                    if hide_closed and document['is_closed']:
+                        continue
+
+                    weighted_frequency = 0
+                    for field, frequency in document['terms'][term].items():
+                        normalization = 1 - self.b + self.b * document['lengths'][field] / average_lengths[field]
+                        weighted_frequency += self.field_weights[field] * frequency / normalization
+
+                    scores[location_id] += idf * weighted_frequency * (self.k1 + 1) / (self.k1 + weighted_frequency)
+
+        return sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))
+
+location_search_index = LocationSearchIndex()
+
+
+def warm_search_indexes():
+    # called by every server worker as it loads (see project/wsgi.py), so the first searches do not wait for the
+    # indexes; a worker forked from a preloaded master lost the threads and builds them on its first search instead
+    for index in (trigram_index, location_search_index):
+        if not index.is_built():
+            index.rebuild_in_background()
+
+
+def has_trigram_extension(connection):
+    if connection.vendor != 'postgresql':
+        return False
+
+    if not hasattr(connection, 'has_pg_trgm'):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            connection.has_pg_trgm = cursor.fetchone() is not None
+
+    return connection.has_pg_trgm
+
+
+class TrigramSearchFilter(BaseFilterBackend):
+    search_params = ('query', 'search')
+
+    def get_search_query(self, request):
+        for param in self.search_params:
+            query = request.query_params.get(param, '').strip()
+
+            if query:
+                return query
+
+        return None
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+
+        if not query:
+            return queryset
+
+        fields = [field for field in getattr(view, 'search_fields', ['name']) if field in TrigramIndex.fields]
+        threshold = settings.SEARCH_TRIGRAM_THRESHOLD
+        connection = connections[queryset.db]
+
+        if has_trigram_extension(connection):
+            return self.filter_postgres(queryset, query, fields, threshold, connection)
+
+        return self.filter_in_process(queryset, query, fields, threshold)
+
+    def get_postgres_matches(self, queryset, query, fields):
+        # %> is the operator the gin_trgm_ops indexes of migration 0003 serve; the similarity is only computed for
+        # the rows they return, to rank them
+        condition = Q()
+        similarities = []
+        for field in fields:
+            condition |= Q(**{f"{field}__trigram_word_similar": query})
+            similarity = TrigramWordSimilarity(query, field)
+            weight = TrigramIndex.field_weights.get(field, 1.0)
+            similarities.append(similarity * weight if weight != 1.0 else similarity)
+
+        similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+        return queryset.filter(condition).annotate(similarity=similarity).order_by('-similarity', 'name')
+
+    def filter_postgres(self, queryset, query, fields, threshold, connection):
+        # %> reads its threshold from the session, so the matches are ranked right here in a transaction of their
+        # own and SET LOCAL ends with it instead of staying on a persistent or pooled connection
+        with transaction.atomic(using=queryset.db):
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL pg_trgm.word_similarity_threshold = %s", [threshold])
+
+            ranked = list(self.get_postgres_matches(queryset, query, fields).values_list('id', 'similarity')[:settings.SEARCH_MAX_RESULTS])
+
+        return self.filter_ranked(queryset, ranked)
+
+    def filter_in_process(self, queryset, query, fields, threshold):
+        scores = trigram_index.search(query, fields, threshold)
+        ranked = sorted(scores.items(), key=lambda entry: -entry[1])[:settings.SEARCH_MAX_RESULTS]
+
+        return self.filter_ranked(queryset, ranked)
+
+    def filter_ranked(self, queryset, ranked):
+        if not ranked:
+            return queryset.none()
+
+        similarity = Case(
+            *[When(id=location_id, then=Value(score)) for location_id, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+        return queryset.filter(id__in=[location_id for location_id, score in ranked]).annotate(similarity=similarity).order_by('-similarity', 'name')
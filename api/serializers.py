@@ -3,11 +3,14 @@ from .models import *
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.hashers import make_password
-from django.db.models import Avg
+from django.db.models import Avg, Count, Min, Max, Sum, OuterRef, Subquery, Prefetch
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
 from datetime import datetime
 
+from .images import get_variant_urls
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -53,6 +56,48 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return super().validate(attrs)
 
+def get_primary_image(obj):
+    # looked up once per location however many fields show it
+    if not hasattr(obj, '_primary_image'):
+        if is_prefetched(obj, 'images'):
+            obj._primary_image = min((image for image in obj.images.all() if image.is_primary_image), key=lambda image: image.pk, default=None)
+        else:
+            obj._primary_image = obj.images.filter(is_primary_image=True).first()
+
+    return obj._primary_image
+
+def get_requested_fields(request):
+    # ?fields=id,name keeps only those fields, ?exclude=fee,ratings drops them
+    def parse(param):
+        value = request.query_params.get(param) if request is not None else None
+        return {name.strip() for name in value.split(',') if name.strip()} if value else None
+
+    return parse('fields'), parse('exclude')
+
+def is_field_requested(request, name):
+    fields, exclude = get_requested_fields(request)
+    return (fields is None or name in fields) and (exclude is None or name not in exclude)
+
+
+class DynamicFieldsMixin():
+    # fields left out by the request are removed before serialization, so their method fields never run
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, exclude = get_requested_fields(self.context.get('request'))
+
+        if fields is None and exclude is None:
+            return
+
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (exclude is not None and name in exclude):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_field_names(cls, request):
+        fields, exclude = get_requested_fields(request)
+        return {name for name in cls.Meta.fields if (fields is None or name in fields) and (exclude is None or name not in exclude)}
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
@@ -155,9 +200,14 @@ class FoodPlaceSerializers(serializers.ModelSerializer):
         return [tag.name for tag in obj.tags.all()]
 
 class FoodSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Food
-        fields = ['id', 'item', 'price', 'image']
+        fields = ['id', 'item', 'price', 'image', 'image_variants']
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj.image.name, obj.variants_name)
 
 class AccommodationSerializers(serializers.ModelSerializer):
     class Meta:
@@ -165,9 +215,14 @@ class AccommodationSerializers(serializers.ModelSerializer):
         fields = []
 
 class ServiceSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Service
-        fields = ['id', 'item', 'description', 'price', 'image']
+        fields = ['id', 'item', 'description', 'price', 'image', 'image_variants']
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj.image.name, obj.variants_name)
 
 class ReviewSerializers(serializers.ModelSerializer):
     user = UserSerializers()
@@ -176,20 +231,62 @@ class ReviewSerializers(serializers.ModelSerializer):
         exclude = ['location']
 
 #Location-related Serializers
-class LocationQuerySerializers(serializers.ModelSerializer):
+class LocationQuerySerializers(DynamicFieldsMixin, serializers.ModelSerializer):
     tags = serializers.SerializerMethodField()
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
     schedule = serializers.SerializerMethodField()
     fee = serializers.SerializerMethodField()
     ratings = serializers.SerializerMethodField()
 
     class Meta:
         model = Location
-        fields = ('tags', 'id', 'name', 'primary_image', 'address', 'schedule', 'fee', 'ratings')
+        fields = ('tags', 'id', 'name', 'primary_image', 'primary_image_variants', 'address', 'schedule', 'fee', 'ratings')
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        # every per-row lookup below becomes a correlated subquery or a prefetch, so a page costs the same
+        # number of queries regardless of its size; `fields` limits this to the fields actually being output
+        def wants(*names):
+            return fields is None or any(name in fields for name in names)
+
+        audience_types = AudienceType.objects.filter(fee_type__spot_id=OuterRef('pk')).order_by().values('fee_type__spot_id')
+        foods = Food.objects.filter(location_id=OuterRef('pk')).order_by().values('location_id')
+        reviews = Review.objects.filter(location_id=OuterRef('pk')).order_by().values('location_id')
+        primary_images = LocationImage.objects.filter(location_id=OuterRef('pk'), is_primary_image=True).order_by('pk')
+
+        if wants('tags', 'schedule'):
+            queryset = queryset.select_related('spot')
+
+        if wants('tags'):
+            queryset = queryset.prefetch_related('spot__tags')
+
+        if wants('fee'):
+            queryset = queryset.annotate(
+                min_required_fee=Subquery(audience_types.filter(fee_type__is_required=True).annotate(lowest=Min('price')).values('lowest')),
+                max_required_fee=Subquery(audience_types.filter(fee_type__is_required=True).annotate(highest=Max('price')).values('highest')),
+                total_optional_fee=Subquery(audience_types.filter(fee_type__is_required=False).annotate(total=Sum('price')).values('total')),
+                min_food_price=Subquery(foods.annotate(lowest=Min('price')).values('lowest')),
+                max_food_price=Subquery(foods.annotate(highest=Max('price')).values('highest')),
+            )
+
+        if wants('ratings'):
+            queryset = queryset.annotate(
+                average_rating=Subquery(reviews.annotate(rating_avg=Avg('rating')).values('rating_avg')),
+                total_reviews=Coalesce(Subquery(reviews.annotate(review_count=Count('id')).values('review_count')), 0),
+            )
+
+        if wants('primary_image', 'primary_image_variants'):
+            queryset = queryset.annotate(
+                primary_image_name=Subquery(primary_images.values('image')[:1]),
+                primary_image_variants_name=Subquery(primary_images.values('variants_name')[:1]),
+            )
+
+        return queryset
 
     def get_schedule(self, obj):
         if obj.location_type == "1":
-            spot = Spot.objects.get(id=obj.id)
+            spot = obj.spot if Location.spot.is_cached(obj) else Spot.objects.get(id=obj.id)
             return {
                 "opening": spot.opening_time,
                 "closing": spot.closing_time 
@@ -198,6 +295,9 @@ class LocationQuerySerializers(serializers.ModelSerializer):
         return None    
     
     def get_fee(self, obj):
+        if hasattr(obj, 'min_required_fee'):
+            return self.get_annotated_fee(obj)
+
         if obj.location_type == "1":
             spot = Spot.objects.get(id=obj.id)
             min_fee = 0
@@ -256,22 +356,64 @@ class LocationQuerySerializers(serializers.ModelSerializer):
         
         return None
 
+    def get_annotated_fee(self, obj):
+        if obj.location_type == "1":
+            if obj.max_required_fee is None:
+                max_fee = 0
+            else:
+                max_fee = obj.max_required_fee + (obj.total_optional_fee or 0)
+
+            return {
+                "min": obj.min_required_fee if obj.min_required_fee is not None else 0,
+                "max": max_fee
+            }
+
+        elif obj.location_type == "2":
+            if obj.min_food_price is None:
+                return {'min': 300.0, 'max': 300.0}
+
+            return {
+                'min': obj.min_food_price,
+                'max': obj.max_food_price
+            }
+
+        return None
+
     def get_tags(self, obj):
         if obj.location_type == "1":
-            spot = Spot.objects.get(id=obj.id)
+            spot = obj.spot if Location.spot.is_cached(obj) else Spot.objects.get(id=obj.id)
             return [tag.name for tag in spot.tags.all()]
 
         return None
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary_image=True).first()
+        if hasattr(obj, 'primary_image_name'):
+            if obj.primary_image_name:
+                return LocationImage._meta.get_field('image').storage.url(obj.primary_image_name)
+
+            return "/media/location_images/Placeholder.png"
+
+        primary_image = get_primary_image(obj)
 
         if primary_image:
             return primary_image.image.url
 
         return "/media/location_images/Placeholder.png"
 
+    def get_primary_image_variants(self, obj):
+        if hasattr(obj, 'primary_image_name'):
+            return get_variant_urls(obj.primary_image_name, obj.primary_image_variants_name)
+
+        primary_image = get_primary_image(obj)
+        return get_variant_urls(primary_image.image.name, primary_image.variants_name) if primary_image else None
+
     def get_ratings(self, obj):
+        if hasattr(obj, 'total_reviews'):
+            return {
+                'total_reviews': obj.total_reviews,
+                'average_rating': round(obj.average_rating or 0, 2),
+            }
+
         reviews = Review.objects.filter(location_id=obj.id)
         average_rating = reviews.aggregate(Avg('rating'))['rating__avg'] if reviews.exists() else 0
 
@@ -283,6 +425,7 @@ class LocationQuerySerializers(serializers.ModelSerializer):
     
 class LocationPlanSerializers(serializers.ModelSerializer):
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
     max_cost = serializers.SerializerMethodField()
     min_cost = serializers.SerializerMethodField()
     opening = serializers.SerializerMethodField()
@@ -292,20 +435,23 @@ class LocationPlanSerializers(serializers.ModelSerializer):
 
     class Meta:
         model = Location
-        fields = ['id', 'name', 'primary_image', 'address', 'longitude', 'latitude', 'min_cost', 'max_cost', 'opening', 'closing', 'location_type', 'event', 'activities']
+        fields = ['id', 'name', 'primary_image', 'primary_image_variants', 'address', 'longitude', 'latitude', 'min_cost', 'max_cost', 'opening', 'closing', 'location_type', 'event', 'activities']
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary_image=True).first()
+        primary_image = get_primary_image(obj)
 
         if primary_image:
             return primary_image.image.url
 
         return None
+
+    def get_primary_image_variants(self, obj):
+        primary_image = get_primary_image(obj)
+        return get_variant_urls(primary_image.image.name, primary_image.variants_name) if primary_image else None
     
     def get_activities(self, obj):
         if obj.location_type == '1':
-            spot = Spot.objects.get(id=obj.id)
-            return spot.get_activities
+            return obj.spot.get_activities
 
         return []
     
@@ -317,23 +463,16 @@ class LocationPlanSerializers(serializers.ModelSerializer):
 
     def get_opening(self, obj):
         if obj.location_type == "1":
-            spot = Spot.objects.get(pk=obj.id)
-
-            if spot:
-                return spot.opening_time
+            return obj.spot.opening_time
         return None
 
     def get_closing(self, obj):
         if obj.location_type == "1":
-            spot = Spot.objects.get(pk=obj.id)
-
-            if spot:
-                return spot.closing_time
+            return obj.spot.closing_time
         return None
     
     def get_event(self, obj):
-        location = Location.objects.get(pk=obj.id)
-        return EventSerializer(location.nearby_events, many=True).data
+        return EventSerializer(obj.get_nearby_events(self.context.get('current_events')), many=True).data
 
 
 class LocationBasicSerializer(serializers.ModelSerializer):
@@ -342,15 +481,23 @@ class LocationBasicSerializer(serializers.ModelSerializer):
         model = Location
         fields = '__all__'
 
-class LocationSerializers(serializers.ModelSerializer):
+class LocationSerializers(DynamicFieldsMixin, serializers.ModelSerializer):
     images = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     details = serializers.SerializerMethodField()
     rating_percentages = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
 
     class Meta:
         model = Location
-        fields = ('id', 'location_type', 'name', 'address', 'description', 'latitude', 'longitude',  'images', 'details', 'rating_percentages', 'is_bookmarked', 'owner', 'website', 'email', 'contact')
+        fields = ('id', 'location_type', 'name', 'address', 'description', 'latitude', 'longitude',  'images', 'image_variants', 'details', 'rating_percentages', 'is_bookmarked', 'owner', 'website', 'email', 'contact')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # without a user the output is the same for everyone, which is what the response cache stores
+        if 'user' not in self.context:
+            self.fields.pop('is_bookmarked', None)
 
     def get_details(self, obj):
         if obj.location_type == '1':
@@ -411,6 +558,10 @@ class LocationSerializers(serializers.ModelSerializer):
 
         return images
 
+    def get_image_variants(self, obj):
+        # one entry per url in images, the placeholder shown for a location without images has no variants
+        return [get_variant_urls(image.image.name, image.variants_name) for image in obj.images.all()] or [None]
+
 
 class LocationTopSerializer(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
@@ -421,12 +572,20 @@ class LocationTopSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'average_rating', 'total_reviews']
 
     def get_average_rating(self, obj):
-        reviews = Review.objects.filter(location=obj)
-        average_rating = reviews.aggregate(Avg('rating'))['rating__avg'] if reviews.exists() else 0
+        # the dashboard annotates both from the location stats rollup
+        if hasattr(obj, 'average_rating'):
+            average_rating = obj.average_rating
+        else:
+            reviews = Review.objects.filter(location=obj)
+            average_rating = reviews.aggregate(Avg('rating'))['rating__avg'] if reviews.exists() else 0
+
         average_rating = round(average_rating, 2) if average_rating is not None else 0
         return average_rating
 
     def get_total_reviews(self, obj):
+        if hasattr(obj, 'total_reviews'):
+            return obj.total_reviews
+
         return Review.objects.filter(location=obj).count()
 
 
@@ -533,15 +692,46 @@ class SpotPopularSerializers(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 #Itinerary Serializers
-class ItineraryListSerializers(serializers.ModelSerializer):
+class ItineraryListSerializers(DynamicFieldsMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     trip_duration = serializers.SerializerMethodField()
+    # only present when the queryset went through setup_eager_loading
+    start_date = serializers.DateField(source='first_date', read_only=True)
+    end_date = serializers.DateField(source='last_date', read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Itinerary 
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # cover image and duration come from annotations, so the list costs one query however many trips there are
+        first_items = ItineraryItem.objects.filter(day__itinerary=OuterRef('pk')).order_by('day__date', 'day__id', 'order', 'id')
+        primary_images = LocationImage.objects.filter(location_id=OuterRef('cover_location_id'), is_primary_image=True).order_by('pk')
+        days = Day.objects.filter(itinerary=OuterRef('pk')).order_by().values('itinerary')
+
+        return queryset.annotate(
+            cover_location_id=Subquery(first_items.values('location_id')[:1]),
+            first_date=Subquery(days.annotate(earliest=Min('date')).values('earliest')),
+            last_date=Subquery(days.annotate(latest=Max('date')).values('latest')),
+            day_count=Coalesce(Subquery(days.annotate(total=Count('id')).values('total')), 0),
+            item_count=Coalesce(Subquery(
+                ItineraryItem.objects.filter(day__itinerary=OuterRef('pk')).order_by().values('day__itinerary').annotate(total=Count('id')).values('total')
+            ), 0),
+        ).annotate(
+            cover_image_name=Subquery(primary_images.values('image')[:1]),
+            cover_image_variants_name=Subquery(primary_images.values('variants_name')[:1]),
+        )
+
     def get_image(self, object):
+        if hasattr(object, 'cover_location_id'):
+            if object.cover_image_name:
+                return LocationImage._meta.get_field('image').storage.url(object.cover_image_name)
+
+            return None
+
         days = Day.objects.filter(itinerary=object)
 
         for day in days:
@@ -554,18 +744,30 @@ class ItineraryListSerializers(serializers.ModelSerializer):
 
         return None
 
+    def get_image_variants(self, object):
+        if hasattr(object, 'cover_location_id'):
+            return get_variant_urls(object.cover_image_name, object.cover_image_variants_name)
+
+        item = ItineraryItem.objects.filter(day__itinerary=object).order_by('day__date', 'day__id', 'order', 'id').first()
+        primary_image = get_primary_image(item.location) if item else None
+        return get_variant_urls(primary_image.image.name, primary_image.variants_name) if primary_image else None
+
     def get_trip_duration(self, object):
-        days = Day.objects.filter(itinerary=object)
+        if hasattr(object, 'day_count'):
+            day_count, first_date = object.day_count, object.first_date
+        else:
+            days = Day.objects.filter(itinerary=object)
+            day_count = len(days)
+            first_date = days.first().date if days else None
 
-        if not days:
+        if not day_count:
             return "No set duration yet"
 
-        first_day = days.first()
-        num_of_days = "days" if len(days) > 1 else "day"
+        num_of_days = "days" if day_count > 1 else "day"
 
-        formatted_date = datetime.strptime(str(first_day.date), '%Y-%m-%d').strftime('%B %#d')
+        formatted_date = datetime.strptime(str(first_date), '%Y-%m-%d').strftime('%B %#d')
 
-        return f"{formatted_date} • {len(days)} {num_of_days}"
+        return f"{formatted_date} • {day_count} {num_of_days}"
 
 
 class ItinerarySerializers(serializers.ModelSerializer):
@@ -584,14 +786,26 @@ class ItineraryItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'location', 'day', 'details', 'transport_type', 'expense_details']
 
     def get_transport_type(self, obj):
+        # the bundle passes every item of the itinerary keyed by (day, order) instead of a lookup per item
+        items = self.context.get('items_by_order')
+
+        if items is not None and obj.order != 0:
+            return obj.get_transportation_type(items.get((obj.day_id, obj.order - 1)))
+
         return obj.get_transportation_type()
     
     def get_expense_details(self, obj):
         if obj.location.location_type == "1":
-            optional_fees = Spot.objects.get(id=obj.location.id).optional_fees
-            optional_serializer = FeeTypeSerializer(optional_fees, many=True)
+            spot = obj.location.spot
+
+            if is_prefetched(spot, 'feetype_set'):
+                optional_fees = [fee_type for fee_type in spot.feetype_set.all() if not fee_type.is_required]
+                required_fees = [fee_type for fee_type in spot.feetype_set.all() if fee_type.is_required]
+            else:
+                optional_fees = spot.optional_fees
+                required_fees = spot.required_fees
 
-            required_fees = Spot.objects.get(id=obj.location.id).required_fees
+            optional_serializer = FeeTypeSerializer(optional_fees, many=True)
             required_serializer = FeeTypeSerializer(required_fees, many=True)
 
             return {
@@ -616,13 +830,35 @@ class DayDetailSerializers(serializers.ModelSerializer):
         model = Day
         fields = '__all__'
 
-class DaySerializers(serializers.ModelSerializer):
+class DaySerializers(DynamicFieldsMixin, serializers.ModelSerializer):
     itinerary_items = ItineraryItemSerializer(source='itineraryitem_set', many=True)
     date_status = serializers.SerializerMethodField()
 
     class Meta:
         model = Day
         fields = '__all__'
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # items, their location cards, legs and expenses load in a fixed number of prefetch queries
+        items = ItineraryItem.objects.select_related('location', 'location__spot', 'location__foodplace').prefetch_related(
+            'location__images',
+            'location__spot__activity',
+            'location__spot__feetype_set__audience_types',
+            'location__foodplace__food_set',
+        )
+
+        return queryset.prefetch_related(Prefetch('itineraryitem_set', queryset=items))
+
+    @staticmethod
+    def get_eager_context(days):
+        # today's events and each item's predecessor, looked up once for every item of the eager-loaded days
+        today = timezone.now().date()
+
+        return {
+            'current_events': list(Event.objects.filter(start_date__lte=today, end_date__gte=today)),
+            'items_by_order': {(item.day_id, item.order): item for day in days for item in day.itineraryitem_set.all()},
+        }
     
     def get_date_status(self, obj):
         current_date = timezone.now().date()
@@ -644,6 +880,15 @@ class DayRatingsSerializer(serializers.ModelSerializer):
         model = Day
         fields = ['id', 'date', 'locations', 'name', 'day_number', 'image', 'itinerary', 'completed', 'rating']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # one query for the days plus two prefetches, however many days are serialized
+        items = ItineraryItem.objects.select_related('location').prefetch_related(
+            Prefetch('location__images', queryset=LocationImage.objects.filter(is_primary_image=True).order_by('pk'), to_attr='primary_images')
+        )
+
+        return queryset.select_related('itinerary').prefetch_related(Prefetch('itineraryitem_set', queryset=items))
+
     def get_name(self, obj):
         return obj.itinerary.name
 
@@ -651,6 +896,9 @@ class DayRatingsSerializer(serializers.ModelSerializer):
         return f"Day {obj.order}"
 
     def get_locations(self, obj):
+        if is_prefetched(obj, 'itineraryitem_set'):
+            return [item.location.name for item in obj.itineraryitem_set.all()]
+
         items = ItineraryItem.objects.filter(day=obj)
 
         location_names = []
@@ -660,6 +908,14 @@ class DayRatingsSerializer(serializers.ModelSerializer):
         return location_names
     
     def get_image(self, obj):
+        if is_prefetched(obj, 'itineraryitem_set'):
+            items = obj.itineraryitem_set.all()
+
+            if items and items[0].location.primary_images:
+                return items[0].location.primary_images[0].image.url
+
+            return None
+
         item = ItineraryItem.objects.filter(day=obj).first()
         
         if item:
@@ -697,8 +953,17 @@ class CompletedDaySerializer(serializers.ModelSerializer):
         model = Day
         fields = ['id', 'rating', 'itinerary_items']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        spot_items = ItineraryItem.objects.filter(location__location_type='1').select_related('location')
+        return queryset.prefetch_related(Prefetch('itineraryitem_set', queryset=spot_items, to_attr='spot_items'))
+
     def get_itinerary_items(self, obj):
-        itinerary_items = ItineraryItem.objects.filter(day=obj, location__location_type='1')
+        if hasattr(obj, 'spot_items'):
+            itinerary_items = obj.spot_items
+        else:
+            itinerary_items = ItineraryItem.objects.filter(day=obj, location__location_type='1')
+
         return ItineraryItemNameSerializer(itinerary_items, many=True).data
 
 class LocationRecommenderSerializers(serializers.ModelSerializer):
@@ -774,7 +1039,7 @@ class RecentBookmarkSerializer(serializers.ModelSerializer):
 
         return None
     
-class BookmarkLocationSerializer(serializers.ModelSerializer):
+class BookmarkLocationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     details = LocationQuerySerializers(source='location', read_only=True)
 
     class Meta:
@@ -787,23 +1052,28 @@ class BookmarkCountSerializer(serializers.Serializer):
     location_name = serializers.CharField(source='name')
 
 #Recommender Serializers
-class RecommendedLocationSerializer(serializers.ModelSerializer):
+class RecommendedLocationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
     tags = serializers.SerializerMethodField()
     ratings = serializers.SerializerMethodField()
     distance = serializers.SerializerMethodField()
     
     class Meta:
         model = Location
-        fields = ('id', 'name', 'primary_image', 'tags', 'ratings', 'distance')
+        fields = ('id', 'name', 'primary_image', 'primary_image_variants', 'tags', 'ratings', 'distance')
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary_image=True).first()
+        primary_image = get_primary_image(obj)
 
         if primary_image:
             return primary_image.image.url
 
         return None
+
+    def get_primary_image_variants(self, obj):
+        primary_image = get_primary_image(obj)
+        return get_variant_urls(primary_image.image.name, primary_image.variants_name) if primary_image else None
     
     def get_distance(self, obj):
         location_id = self.context.get('location_id')
@@ -894,7 +1164,7 @@ class EventSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'longitude', 'latitude']
 
 
-class EventSerializerAdmin(serializers.ModelSerializer):
+class EventSerializerAdmin(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = '__all__'
@@ -929,9 +1199,14 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['name']
 
 class DriverSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Driver
-        fields = '__all__'
+        exclude = ['variants_name']
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj.image.name, obj.variants_name)
 
 class ContactFormSerializer(serializers.ModelSerializer):
     user = UserSerializers()
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIRECTORY = 'blobs'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def is_immutable(name):
+    # a blob is named after its content, and the variants rendered from it (see images.py) live under its name
+    name = name.lstrip('/')
+    return name.startswith(f"{BLOB_DIRECTORY}/") or name.startswith(f"variants/{BLOB_DIRECTORY}/")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # uploads are stored once per content under blobs/ab/cd/<sha256>.<ext> whatever name upload_to gave them, so
+    # re-uploads and the same photo on several locations share a file; nothing deletes a blob on replace,
+    # the gc_media command removes the ones no row references anymore
+    named_directories = ('variants',)
+
+    def __init__(self, named_directories=None, **kwargs):
+        super().__init__(**kwargs)
+
+        if named_directories is not None:
+            self.named_directories = tuple(named_directories)
+
+    def is_named(self, name):
+        # files under these directories keep the name they are saved with
+        return name.lstrip('/').split('/', 1)[0] in self.named_directories
+
+    def get_blob_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+
+        for chunk in content.chunks():
+            digest.update(chunk)
+
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return f"{BLOB_DIRECTORY}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # an upload's blob name is only known once _save has read its content; two uploads racing to write the
+        # same blob end up with a suffixed copy of it, which is harmless
+        if self.is_named(name) or name.startswith(f"{BLOB_DIRECTORY}/"):
+            return super().get_available_name(name, max_length)
+
+        return name
+
+    def _save(self, name, content):
+        if self.is_named(name):
+            return super()._save(name, content)
+
+        name = self.get_blob_name(name, content)
+
+        if self.exists(name):
+            # a fresh mtime keeps gc_media's grace period from collecting a blob an upload is about to reference
+            os.utime(self.path(name))
+            return name
+
+        return super()._save(name, content)
+
+    def get_blob_names(self, directory=BLOB_DIRECTORY):
+        if not self.exists(directory):
+            return
+
+        directories, files = self.listdir(directory)
+
+        for file_name in sorted(files):
+            yield f"{directory}/{file_name}"
+
+        for child in sorted(directories):
+            yield from self.get_blob_names(f"{directory}/{child}")
+
+    def delete_blob(self, name):
+        # along with the variants rendered from it and the directories that leaves empty
+        variants = f"variants/{name}"
+
+        if self.exists(variants):
+            for file_name in self.listdir(variants)[1]:
+                self.delete(f"{variants}/{file_name}")
+
+        self.delete(name)
+
+        for directory in (variants, posixpath.dirname(name), posixpath.dirname(posixpath.dirname(name))):
+            try:
+                os.rmdir(self.path(directory))
+            except OSError:
+                pass
+
+
+def get_referenced_names():
+    # every file name a FileField of any model points at
+    from django.apps import apps
+    from django.db.models import FileField
+
+    names = set()
+
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField):
+                values = model._default_manager.exclude(**{field.name: ''}).values_list(field.name, flat=True).distinct()
+                names.update(name.lstrip('/') for name in values if name)
+
+    return names
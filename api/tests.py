@@ -1,3 +1,1399 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from PIL import Image
+
+from .exports import is_parquet_available
+from .management.commands.benchmark_import import time_imports
+from .images import get_variant_name, log_render_result, mark_rendered
+from .managers import RollupManager, MonthlyReportManager, TrendingManager
+from .serializers import ItineraryListSerializers
+from .views import serve_media
+from .search import TrigramSearchFilter, has_trigram_extension, location_search_index, trigram_index
+from .models import *
+
+# tests that go through cached views keep their responses in memory instead of the shared 'responses' cache
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses'},
+}
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='trending@example.com', first_name='Test', last_name='User')
+        cls.old_favorite = Spot.objects.create(name="Old Favorite", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        cls.rising = Spot.objects.create(name="Rising Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        manager = TrendingManager()
+        now = timezone.now()
+        manager.record_click(self.old_favorite.id, moment=now - timedelta(days=5), amount=10)
+        manager.record_click(self.rising.id, moment=now - timedelta(hours=1), amount=4)
+
+    def test_recent_clicks_outrank_older_ones(self):
+        trending = TrendingManager().get_trending(location_type='1')
+
+        self.assertEqual([location.id for location in trending], [self.rising.id, self.old_favorite.id])
+        self.assertEqual(LocationClickBucket.objects.get(location=self.rising, granularity='D').amount, 4)
+
+    def test_stale_lists_are_served_while_the_refresh_is_claimed(self):
+        manager = TrendingManager()
+        manager.compute_trending()
+        TrendingLocation.objects.update(computed_at=timezone.now() - timedelta(hours=1))
+        manager.record_click(self.old_favorite.id, amount=100)
+
+        cache.add(manager.refresh_key, 1)
+        trending = manager.get_trending(location_type='1')
+        self.assertEqual([location.id for location in trending], [self.rising.id, self.old_favorite.id])
+
+        cache.delete(manager.refresh_key)
+        trending = manager.get_trending(location_type='1')
+        self.assertEqual([location.id for location in trending], [self.old_favorite.id, self.rising.id])
+
+    def test_limit_must_be_within_the_top_n(self):
+        for limit in (-1, 0, TrendingManager.top_n + 1, 'all'):
+            response = self.client.get('/api/recommendations/trending/', {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/api/recommendations/trending/', {'type': 'spot', 'limit': 1})
+        self.assertEqual([location['id'] for location in response.data['recommendations']], [self.rising.id])
+
+
+class TrigramSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.falls = Spot.objects.create(name="Kawasan Falls", address="Badian", latitude=10.3, longitude=123.9, location_type='1')
+        cls.beach = Spot.objects.create(name="White Beach", address="Moalboal", latitude=10.3, longitude=123.9, location_type='1')
+
+    def setUp(self):
+        trigram_index.invalidate()
+
+    def search(self, query):
+        response = APIClient().get('/api/location/', {'query': query})
+        return [location['id'] for location in response.data]
+
+    @mock.patch('api.search.has_trigram_extension', return_value=False)
+    def test_fallback_matches_misspelled_names_and_addresses(self, has_trigram_extension):
+        self.assertEqual(self.search('kawasn'), [self.falls.id])
+        self.assertEqual(self.search('moalbol'), [self.beach.id])
+
+    @mock.patch('api.search.has_trigram_extension', return_value=False)
+    def test_fallback_index_is_updated_in_place(self, has_trigram_extension):
+        self.search('kawasan')
+        postings = trigram_index.postings
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beach.name = "Kawasan Beach"
+            self.beach.save()
+
+        self.assertEqual(set(self.search('kawasan')), {self.falls.id, self.beach.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.falls.delete()
+
+        self.assertEqual(self.search('kawasan'), [self.beach.id])
+        self.assertIs(trigram_index.postings, postings)
+
+
+class TrigramPostgresSearchTest(TransactionTestCase):
+    # the threshold is set with SET LOCAL, which only ends with the outermost transaction, so these run outside
+    # the transaction a TestCase wraps every test in
+    def setUp(self):
+        if not has_trigram_extension(connection):
+            self.skipTest("pg_trgm is not installed")
+
+        self.falls = Spot.objects.create(name="Kawasan Falls", address="Badian", latitude=10.3, longitude=123.9, location_type='1')
+        self.beach = Spot.objects.create(name="White Beach", address="Moalboal", latitude=10.3, longitude=123.9, location_type='1')
+
+    def search(self, query):
+        response = APIClient().get('/api/location/', {'query': query})
+        return [location['id'] for location in response.data]
+
+    def test_search_leaves_the_session_threshold_alone(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW pg_trgm.word_similarity_threshold")
+            threshold = cursor.fetchone()[0]
+
+        self.assertEqual(self.search('kawasn'), [self.falls.id])
+        self.assertEqual(self.search('moalbol'), [self.beach.id])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW pg_trgm.word_similarity_threshold")
+            self.assertEqual(cursor.fetchone()[0], threshold)
+
+    def test_matches_are_found_through_the_trigram_indexes(self):
+        # a table this small is scanned anyway unless sequential scans are ruled out
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+            plan = TrigramSearchFilter().get_postgres_matches(Location.objects.all(), 'kawasn', ['name', 'address']).explain()
+
+        self.assertIn('api_location_name_trgm', plan)
+        self.assertIn('api_location_address_trgm', plan)
+
+
+class LocationSearchIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.falls = Spot.objects.create(name="Kawasan Falls", address="Badian", description="Turquoise waterfall for canyoneering", latitude=10.3, longitude=123.9, location_type='1')
+        cls.beach = Spot.objects.create(name="White Beach", address="Moalboal", description="Sardine run and snorkeling", latitude=10.3, longitude=123.9, location_type='1')
+
+    def setUp(self):
+        location_search_index.build()
+
+    def search(self, query):
+        return [location_id for location_id, score in location_search_index.search(query)]
+
+    def test_committed_updates_are_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beach.description = "Sardine run and a waterfall nearby"
+            self.beach.save()
+
+        self.assertEqual(self.search('waterfall'), [self.falls.id, self.beach.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beach.tags.add(Tag.objects.create(name="Canyoneering"))
+
+        self.assertEqual(set(self.search('canyoneering')), {self.falls.id, self.beach.id})
+
+    def test_deleted_locations_are_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.falls.delete()
+
+        self.assertEqual(self.search('waterfall'), [])
+        self.assertEqual(self.search('sardine'), [self.beach.id])
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.beach.description = "Whale sharks"
+                    self.beach.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+
+        self.assertEqual(self.search('whale'), [])
+        self.assertEqual(self.search('sardine'), [self.beach.id])
+
+    def test_stale_index_keeps_serving_while_it_is_rebuilt(self):
+        location_search_index.built_at -= location_search_index.max_age + 1
+
+        with mock.patch.object(location_search_index, 'rebuild_in_background') as rebuild_in_background:
+            self.assertEqual(self.search('waterfall'), [self.falls.id])
+
+        rebuild_in_background.assert_called_once_with()
+
+    def test_changes_made_during_a_rebuild_reach_the_new_snapshot(self):
+        read = location_search_index.read
+
+        def read_then_change():
+            snapshot = read()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.beach.description = "Sardine run and a waterfall nearby"
+                self.beach.save()
+
+            return snapshot
+
+        with mock.patch.object(location_search_index, 'read', side_effect=read_then_change):
+            location_search_index.build()
+
+        self.assertEqual(self.search('waterfall'), [self.falls.id, self.beach.id])
+
+
+class PaginatedLocationQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email='reviewer@example.com', first_name='Test', last_name='User')
+        tag = Tag.objects.create(name='Nature')
+
+        for i in range(12):
+            spot = Spot.objects.create(name=f"Spot {i}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+            spot.tags.add(tag)
+            LocationImage.objects.create(location=spot, image=f"location_images/spot_{i}.jpg", is_primary_image=True)
+            Review.objects.create(location=spot, user=user, comment="Nice", rating=4)
+
+            fee = FeeType.objects.create(spot=spot, name="Tour Fee", is_required=False)
+            AudienceType.objects.create(fee_type=fee, name="Adult", price=100)
+
+            foodplace = FoodPlace.objects.create(name=f"FoodPlace {i}", address="Cebu", latitude=10.3, longitude=123.9, location_type='2')
+            Food.objects.create(location=foodplace, item="Adobo", price=150)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        client = APIClient()
+
+        # catalog version lookup, count, page and tag prefetch
+        for page_size in (2, 24):
+            with self.assertNumQueries(4):
+                response = client.get('/api/location/paginated/', {'page_size': page_size})
+
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_sparse_fieldset_skips_unused_lookups(self):
+        # no tag prefetch and no per-row lookups for the fields that were left out
+        with self.assertNumQueries(3):
+            response = APIClient().get('/api/location/paginated/', {'page_size': 24, 'fields': 'id,name'})
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+    def test_annotated_fields_match_model_lookups(self):
+        spot = Location.objects.get(name="Spot 0")
+        response = APIClient().get('/api/location/paginated/', {'page_size': 24})
+        result = next(location for location in response.data['results'] if location['id'] == spot.id)
+
+        self.assertEqual(result['tags'], ['Nature'])
+        self.assertEqual(result['fee'], {'min': spot.get_min_cost, 'max': spot.get_max_cost})
+        self.assertEqual(result['ratings'], {'total_reviews': 1, 'average_rating': 4})
+        self.assertEqual(result['primary_image'], '/media/location_images/spot_0.jpg')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='keyset@example.com', first_name='Test', last_name='User')
+
+        for i in range(10):
+            # most events share a start date, so the pages have to split a tie on the leading ordering field
+            start_date = date(2024, 1, 1) if i < 7 else date(2024, 1, i)
+            Event.objects.create(name=f"Event {i}", start_date=start_date, end_date=start_date, description="Fiesta", latitude=10.3, longitude=123.9)
+
+        for i in range(5):
+            Spot.objects.create(name=f"Tie Spot {i}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+    def setUp(self):
+        caches['responses'].clear()
+        trigram_index.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params, direction='next'):
+        pages = []
+        response = self.client.get(url, params)
+
+        while True:
+            pages.append([row['id'] for row in response.data['results']])
+
+            if not response.data[direction]:
+                return pages, response
+
+            response = self.client.get(response.data[direction])
+
+    def test_pages_split_ties_without_duplicates_or_gaps(self):
+        expected = list(Event.objects.order_by('start_date', 'id').values_list('id', flat=True))
+        pages, last = self.walk('/api/event/', {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([event_id for page in pages for event_id in page], expected)
+
+        previous_pages, first = self.walk(last.data['previous'], {}, direction='previous')
+        self.assertEqual([event_id for page in reversed(previous_pages) for event_id in page], expected[:-1])
+        self.assertIsNone(first.data['previous'])
+
+    @mock.patch('api.search.has_trigram_extension', return_value=False)
+    def test_equal_similarity_pages_by_id(self, has_trigram_extension):
+        pages, last = self.walk('/api/location/', {'query': 'tie spot', 'page_size': 2})
+
+        self.assertEqual([location_id for page in pages for location_id in page], sorted(Location.objects.values_list('id', flat=True)))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/event/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    @override_settings(STREAMING_CHUNK_SIZE=3)
+    def test_stream_matches_the_plain_list(self):
+        response = self.client.get('/api/event/', {'stream': 'true'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.client.get('/api/event/').data)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='catalog@example.com', first_name='Test', last_name='User')
+        Tag.objects.create(name='Nature')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_catalog_returns_not_modified(self):
+        etag = self.client.get('/api/tags/get/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tags/get/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_invalidates_etag(self):
+        etag = self.client.get('/api/tags/get/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Beach')
+
+        response = self.client.get('/api/tags/get/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocationResponseCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='cached@example.com', first_name='Test', last_name='User')
+        cls.other_user = User.objects.create(email='other@example.com', first_name='Other', last_name='User')
+        cls.spot = Spot.objects.create(name="Cached Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        Bookmark.objects.create(user=cls.user, location=cls.spot)
+
+    def setUp(self):
+        caches['responses'].clear()
+
+    def get_location(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/location/{self.spot.id}/')
+
+    def test_cached_location_keeps_bookmark_per_user(self):
+        first = self.get_location(self.user)
+
+        # only the bookmark lookup is left once the location is cached
+        with self.assertNumQueries(1):
+            second = self.get_location(self.other_user)
+
+        self.assertTrue(first.data['is_bookmarked'])
+        self.assertFalse(second.data['is_bookmarked'])
+        self.assertEqual(first.data['name'], second.data['name'])
+
+    def test_location_change_invalidates_cached_response(self):
+        self.get_location(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spot.name = "Renamed Spot"
+            self.spot.save()
+
+        self.assertEqual(self.get_location(self.user).data['name'], "Renamed Spot")
+
+
+class ItineraryListQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.single_user = User.objects.create(email='single@example.com', first_name='Test', last_name='User')
+        cls.frequent_user = User.objects.create(email='frequent@example.com', first_name='Test', last_name='User')
+        cls.create_itineraries(cls.single_user, 1)
+        cls.create_itineraries(cls.frequent_user, 6)
+
+    @classmethod
+    def create_itineraries(cls, user, count):
+        for i in range(count):
+            itinerary = Itinerary.objects.create(user=user, name=f"Trip {i}")
+
+            for offset in range(3):
+                day = Day.objects.create(itinerary=itinerary, date=date(2024, 2, 1 + i * 3 + offset), order=offset + 1)
+                spot = Spot.objects.create(name=f"{user.email} spot {i}-{offset}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+                LocationImage.objects.create(location=spot, image=f"location_images/{user.id}_{i}_{offset}.jpg", is_primary_image=True)
+                ItineraryItem.objects.create(day=day, location=spot, order=0)
+
+    def get_list(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/itinerary/list/')
+
+    def test_query_count_does_not_depend_on_itinerary_count(self):
+        # one annotated query for the list, whatever the number of itineraries, days and items
+        with self.assertNumQueries(1):
+            single = self.get_list(self.single_user)
+
+        with self.assertNumQueries(1):
+            frequent = self.get_list(self.frequent_user)
+
+        self.assertEqual(len(single.data), 1)
+        self.assertEqual(len(frequent.data), 6)
+
+        trip = next(itinerary for itinerary in frequent.data if itinerary['name'] == "Trip 1")
+        # the annotations agree with the per-row lookups the serializer falls back to
+        unannotated = ItineraryListSerializers(Itinerary.objects.get(user=self.frequent_user, name="Trip 1")).data
+        self.assertEqual(trip['trip_duration'], unannotated['trip_duration'])
+        self.assertIsNotNone(trip['image'])
+        self.assertEqual(trip['image'], unannotated['image'])
+
+    def test_fields_trim_the_itinerary_and_day_lists(self):
+        client = APIClient()
+        client.force_authenticate(self.single_user)
+        itinerary = Itinerary.objects.get(user=self.single_user)
+
+        self.assertEqual([set(trip) for trip in client.get('/api/itinerary/list/', {'fields': 'id,name'}).data], [{'id', 'name'}])
+        days = client.get(f'/api/itinerary/{itinerary.id}/days/', {'exclude': 'itinerary_items'}).data
+        self.assertEqual(len(days), 3)
+        self.assertNotIn('itinerary_items', days[0])
+        self.assertIn('date_status', days[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ItineraryBundleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='traveler@example.com', first_name='Test', last_name='User')
+        cls.itinerary = Itinerary.objects.create(user=cls.user)
+
+        for i in range(3):
+            day = Day.objects.create(itinerary=cls.itinerary, date=f"2024-01-0{i + 1}", order=i + 1)
+
+            for order in range(3):
+                spot = Spot.objects.create(name=f"Spot {i}-{order}", address="Cebu", latitude=10.3 + order / 100, longitude=123.9, location_type='1')
+                fee = FeeType.objects.create(spot=spot, name="Entrance", is_required=True)
+                AudienceType.objects.create(fee_type=fee, name="Adult", price=50)
+                ItineraryItem.objects.create(day=day, location=spot, order=order)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bundle_matches_days_and_is_cached_by_version(self):
+        days = self.client.get(f'/api/itinerary/{self.itinerary.id}/days/').data
+
+        # itinerary, catalog versions, events, days, items, images, activities, fee types and audience types
+        with self.assertNumQueries(9):
+            bundle = self.client.get(f'/api/itinerary/{self.itinerary.id}/bundle/').data
+
+        self.assertEqual(bundle['days'], days)
+
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/itinerary/{self.itinerary.id}/bundle/')
+
+        Day.objects.filter(itinerary=self.itinerary).first().save()
+        self.assertNotEqual(self.client.get(f'/api/itinerary/{self.itinerary.id}/bundle/').data['version'], bundle['version'])
+
+
+class CompletedDayFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.light_user = User.objects.create(email='light@example.com', first_name='Test', last_name='User')
+        cls.heavy_user = User.objects.create(email='heavy@example.com', first_name='Test', last_name='User')
+        cls.create_days(cls.light_user, 1)
+        cls.create_days(cls.heavy_user, 8)
+
+    @classmethod
+    def create_days(cls, user, count):
+        itinerary = Itinerary.objects.create(user=user)
+
+        for i in range(count):
+            day = Day.objects.create(itinerary=itinerary, date=date(2024, 3, 1 + i), order=i + 1, completed=True, rating=4)
+
+            for order in range(2):
+                spot = Spot.objects.create(name=f"{user.email} stop {i}-{order}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+                LocationImage.objects.create(location=spot, image=f"location_images/{user.id}_{i}_{order}.jpg", is_primary_image=True)
+                ItineraryItem.objects.create(day=day, location=spot, order=order)
+
+    def get(self, user, url, params=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(url, params)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        # days with their itinerary, then the items with their locations, then the primary images
+        for user, count in ((self.light_user, 1), (self.heavy_user, 8)):
+            with self.assertNumQueries(3):
+                response = self.get(user, '/api/days/completed/')
+
+            self.assertEqual(len(response.data), count)
+            self.assertEqual(len(response.data[0]['locations']), 2)
+
+        # the rated days feed only prefetches the spot items
+        with self.assertNumQueries(2):
+            response = self.get(self.light_user, '/api/days/completed/all/')
+
+        self.assertEqual(len(response.data), 9)
+
+    def test_keyset_pages_cover_every_day_once(self):
+        expected = [day['id'] for day in self.get(self.heavy_user, '/api/days/completed/').data]
+        seen = []
+        response = self.get(self.heavy_user, '/api/days/completed/', {'page_size': 3})
+
+        while True:
+            seen.extend(day['id'] for day in response.data['results'])
+
+            if not response.data['next']:
+                break
+
+            with self.assertNumQueries(3):
+                response = self.get(self.heavy_user, response.data['next'])
+
+        self.assertEqual(seen, expected)
+
+        pages = self.get(self.light_user, '/api/days/completed/all/', {'page_size': 4}).data
+        self.assertEqual([day['id'] for day in pages['results']], list(Day.objects.order_by('date', 'id').values_list('id', flat=True)[:4]))
+
+
+class DayItemsBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='planner@example.com', first_name='Test', last_name='User')
+        cls.itinerary = Itinerary.objects.create(user=cls.user)
+        cls.first_day = Day.objects.create(itinerary=cls.itinerary, date="2024-01-01", order=1)
+        cls.second_day = Day.objects.create(itinerary=cls.itinerary, date="2024-01-02", order=2)
+        cls.spots = [
+            Spot.objects.create(name=f"Spot {i}", address="Cebu", latitude=10.3, longitude=123.9 + i / 100, location_type='1')
+            for i in range(4)
+        ]
+        cls.items = [ItineraryItem.objects.create(day=cls.first_day, location=spot, order=i) for i, spot in enumerate(cls.spots[:3])]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.itinerary.refresh_from_db()
+
+    def post(self, operations, version=None):
+        return self.client.post(f'/api/day/{self.first_day.id}/items/batch/', {'operations': operations, 'version': version}, format='json')
+
+    def test_batch_applies_operations_and_renumbers(self):
+        response = self.post([
+            {'op': 'add', 'location': self.spots[3].id, 'order': 0},
+            {'op': 'remove', 'id': self.items[1].id},
+            {'op': 'move', 'id': self.items[2].id, 'day': self.second_day.id},
+        ], version=self.itinerary.version)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['version'], self.itinerary.version)
+        self.assertEqual(
+            list(ItineraryItem.objects.filter(day=self.first_day).values_list('location_id', 'order')),
+            [(self.spots[3].id, 0), (self.spots[0].id, 1)]
+        )
+        self.assertEqual(list(ItineraryItem.objects.filter(day=self.second_day).values_list('id', 'order')), [(self.items[2].id, 0)])
+        self.assertEqual([day['id'] for day in response.data['days']], [self.first_day.id, self.second_day.id])
+
+    def test_stale_version_is_rejected_without_changes(self):
+        response = self.post([{'op': 'remove', 'id': self.items[0].id}], version=self.itinerary.version - 1)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], self.itinerary.version)
+        self.assertEqual(ItineraryItem.objects.filter(day=self.first_day).count(), 3)
+
+    def test_invalid_batch_writes_nothing(self):
+        response = self.post([{'op': 'remove', 'id': self.items[0].id}, {'op': 'add', 'location': 0}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ItineraryItem.objects.filter(day=self.first_day).count(), 3)
+
+    def test_malformed_operations_are_rejected(self):
+        for operations in ([1], [{'op': 'remove', 'id': self.items[0].id}, 'remove'], [None]):
+            response = self.post(operations)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(ItineraryItem.objects.filter(day=self.first_day).count(), 3)
+
+
+class ItineraryCalendarQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='calendar@example.com', first_name='Test', last_name='User')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_itinerary(self, end_date):
+        return self.client.post('/api/itinerary/', {'start_date': '01/01/2024', 'end_date': end_date}, format='json')
+
+    def test_create_itinerary_query_count_does_not_depend_on_length(self):
+        with self.assertNumQueries(7):
+            self.create_itinerary('01/02/2024')
+
+        with self.assertNumQueries(7):
+            response = self.create_itinerary('02/29/2024')
+
+        days = Day.objects.filter(itinerary_id=response.data['id'])
+        self.assertEqual(days.count(), 60)
+        self.assertEqual(list(days.values_list('order', flat=True)), list(range(1, 61)))
+
+    def test_calendar_update_adds_removes_and_renumbers(self):
+        itinerary_id = self.create_itinerary('01/10/2024').data['id']
+
+        response = self.client.post(f'/api/itinerary/{itinerary_id}/calendar/', {'startDate': '01/05/2024', 'endDate': '03/04/2024'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 60)
+        self.assertEqual([day['order'] for day in response.data['days']], list(range(1, 61)))
+        self.assertEqual(str(Day.objects.filter(itinerary_id=itinerary_id).earliest('date').date), '2024-01-05')
+
+    def create_planned_itinerary(self, end_date):
+        itinerary_id = self.create_itinerary(end_date).data['id']
+
+        for day in Day.objects.filter(itinerary_id=itinerary_id):
+            for order in range(2):
+                spot = Spot.objects.create(name=f"Stop {day.id}-{order}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+                ItineraryItem.objects.create(day=day, location=spot, order=order)
+
+        return itinerary_id
+
+    def test_calendar_shrink_query_count_does_not_depend_on_removed_days(self):
+        # the cascade is collected and deleted with one query per table and the post_delete signals of the days
+        # and items are batched into one version bump and one rollup flush on commit, so dropping two days or
+        # eight (with their items) costs the same; the removed items' planned visits come off their stats rows, and
+        # the monthly reports are left alone since none of the days were completed
+        for end_date in ('01/05/2024', '01/11/2024'):
+            itinerary_id = self.create_planned_itinerary(end_date)
+
+            with self.assertNumQueries(28), self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/api/itinerary/{itinerary_id}/calendar/', {'startDate': '01/02/2024', 'endDate': '01/04/2024'}, format='json')
+
+            self.assertEqual([day['order'] for day in response.data['days']], [1, 2, 3])
+            self.assertEqual(ItineraryItem.objects.filter(day__itinerary_id=itinerary_id).count(), 6)
+
+    def test_reversed_range_is_rejected_without_changes(self):
+        itinerary_id = self.create_itinerary('01/03/2024').data['id']
+        itinerary_count = Itinerary.objects.count()
+
+        response = self.client.post(f'/api/itinerary/{itinerary_id}/calendar/', {'startDate': '01/03/2024', 'endDate': '01/01/2024'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Day.objects.filter(itinerary_id=itinerary_id).count(), 3)
+
+        self.assertEqual(self.create_itinerary('12/31/2023').status_code, 400)
+        self.assertEqual(Itinerary.objects.count(), itinerary_count)
+
+        with self.assertRaises(ValueError):
+            Itinerary.objects.get(pk=itinerary_id).set_calendar(date(2024, 1, 3), date(2024, 1, 1))
+
+
+class ItineraryChangeEventTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='recommended@example.com', first_name='Test', last_name='User')
+        cls.itinerary = Itinerary.objects.create(user=cls.user)
+        cls.days = [Day.objects.create(itinerary=cls.itinerary, date=f"2024-01-0{i + 1}", order=i + 1) for i in range(3)]
+        cls.model = ModelItinerary.objects.create()
+        spots = [Spot.objects.create(name=f"Spot {i}", address="Cebu", latitude=10.3, longitude=123.9 + i / 100, location_type='1') for i in range(5)]
+
+        for order, spot in enumerate(spots):
+            ModelItineraryLocationOrder.objects.create(itinerary=cls.model, spot=spot, order=order)
+            ItineraryItem.objects.create(day=cls.days[0], location=spot, order=order)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.itinerary.refresh_from_db()
+        self.events = []
+        itinerary_changed.connect(self.record_event)
+
+    def tearDown(self):
+        itinerary_changed.disconnect(self.record_event)
+
+    def record_event(self, itinerary_ids, action, **kwargs):
+        self.events.append((action, itinerary_ids))
+
+    def test_apply_recommendation_sends_one_event(self):
+        response = self.client.post(f'/api/recommendations/{self.model.id}/apply/', {'day_id': self.days[0].id}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['day']['itinerary_items']), 5)
+        self.assertEqual(self.events, [('recommendation', {self.itinerary.id})])
+        self.assertEqual(Itinerary.objects.get(id=self.itinerary.id).version, self.itinerary.version + 1)
+
+    def test_mark_days_complete_updates_in_one_statement(self):
+        # savepoint, the days not completed yet, update, itinerary lookup for the event, version bump and release
+        with self.assertNumQueries(6):
+            self.client.patch('/api/days/complete/', {'ids': [day.id for day in self.days]}, format='json')
+
+        self.assertEqual(Day.objects.filter(itinerary=self.itinerary, completed=True).count(), 3)
+        self.assertEqual(self.events, [('completed', {self.itinerary.id})])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchRequestTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='batch@example.com', first_name='Test', last_name='User')
+        cls.spot = Spot.objects.create(name="Batched Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        Bookmark.objects.create(user=cls.user, location=cls.spot)
+        Tag.objects.create(name='Nature')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_returns_each_response_in_order(self):
+        response = self.client.post('/api/batch/', {'requests': ['bookmarks/', '/api/tags/get/', 'location/0/', 'missing/']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['responses']], [200, 200, 404, 404])
+        self.assertEqual(response.data['responses'][0]['body'], self.client.get('/api/bookmarks/').data)
+        self.assertEqual(len(response.data['responses'][1]['body']), 1)
+
+    def test_requests_keep_the_batch_user(self):
+        client = APIClient()
+        response = client.post('/api/batch/', {'requests': ['bookmarks/']}, format='json')
+
+        self.assertEqual(response.data['responses'][0]['status'], 401)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.client.post('/api/batch/', {'requests': 'bookmarks/'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/batch/', {'requests': ['bookmarks/'] * 21}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/batch/', {'requests': ['batch/']}, format='json').data['responses'][0]['status'], 400)
+
+    def test_failed_requests_do_not_leak_the_exception(self):
+        with self.assertLogs('api.batch', level='ERROR'):
+            response = self.client.post('/api/batch/', {'requests': ['day/0/detail/', 'tags/get/']}, format='json')
+
+        self.assertEqual([result['status'] for result in response.data['responses']], [500, 200])
+        self.assertEqual(response.data['responses'][0]['body'], {'error': "Internal server error"})
+
+
+class DashboardRollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='admin@example.com', first_name='Test', last_name='User', is_staff=True)
+        cls.tag = Tag.objects.create(name='Nature')
+        cls.spot = Spot.objects.create(name="Rolled Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        cls.spot.tags.add(cls.tag)
+        cls.itinerary = Itinerary.objects.create(user=cls.user)
+        cls.day = Day.objects.create(itinerary=cls.itinerary, date="2024-01-01", order=1)
+        RollupManager().rebuild()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create(email='counted@example.com', first_name='Other', last_name='User')
+            other.preferences.nature = True
+            other.preferences.save()
+
+        counts = self.client.get('/api/dashboard/counts/').data['dashboard_datacount']
+        self.assertEqual((counts['user_count'], counts['location_count'], counts['spot_count']), (2, 1, 1))
+        self.assertEqual(self.client.get('/api/dashboard/preference/').data['preference_percentages']['nature'], 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+            self.spot.delete()
+
+        counts = self.client.get('/api/dashboard/counts/').data['dashboard_datacount']
+        self.assertEqual((counts['user_count'], counts['location_count'], counts['spot_count']), (1, 0, 0))
+        self.assertEqual(DashboardCounter.objects.get(name='preferences_nature').value, 0)
+
+    def test_location_stats_follow_reviews_bookmarks_and_visits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(location=self.spot, user=self.user, comment="Nice", rating=4)
+            Bookmark.objects.create(user=self.user, location=self.spot)
+            ItineraryItem.objects.create(day=self.day, location=self.spot, order=0)
+
+        self.assertEqual(self.client.get('/api/dashboard/top-spots/').data['top_spots'][0]['average_rating'], 4)
+        self.assertEqual(self.client.get('/api/dashboard/top-bookmarks/').data['top_bookmarks'][0]['bookmark_count'], 1)
+        self.assertEqual(self.client.get('/api/dashboard/user-spot-tags/').data, [])
+
+        # completing days is a single update without item signals, the itinerary change event covers it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/days/complete/', {'ids': [self.day.id]}, format='json')
+
+        self.assertEqual(self.client.get('/api/dashboard/user-spot-tags/').data, [{'tag': 'Nature', 'count': 1, 'percentage': 100}])
+
+    def test_rolled_back_changes_are_not_counted(self):
+        try:
+            with transaction.atomic(), self.captureOnCommitCallbacks(execute=True):
+                Review.objects.create(location=self.spot, user=self.user, comment="Nice", rating=4)
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertEqual(self.client.get('/api/dashboard/top-spots/').data['top_spots'], [])
+
+    def test_location_saved_as_its_subtype_is_counted_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.create(name="Plain Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+        self.assertEqual(DashboardCounter.objects.get(name='locations').value, 2)
+        self.assertEqual(DashboardCounter.objects.get(name='spots').value, 2)
+
+    def test_rolled_back_savepoint_only_drops_its_own_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.create(user=self.user, location=self.spot)
+
+            try:
+                with transaction.atomic():
+                    Review.objects.create(location=self.spot, user=self.user, comment="Nice", rating=4)
+                    raise ValueError
+            except ValueError:
+                pass
+
+            ItineraryItem.objects.create(day=self.day, location=self.spot, order=0)
+
+        stats = LocationStats.objects.get(location=self.spot)
+        self.assertEqual((stats.review_count, stats.bookmark_count), (0, 1))
+
+    def test_location_stats_are_updated_in_place(self):
+        other_day = Day.objects.create(itinerary=self.itinerary, date="2024-01-02", order=2, completed=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(location=self.spot, user=self.user, comment="Nice", rating=4)
+            item = ItineraryItem.objects.create(day=self.day, location=self.spot, order=0)
+            ItineraryItem.objects.create(day=other_day, location=self.spot, order=0)
+
+        # each change is added to the stored counts, the second block ends up where a full recount would
+        with self.captureOnCommitCallbacks(execute=True):
+            review.rating = 2
+            review.save()
+            item.day = other_day
+            item.save()
+            self.day.completed = True
+            self.day.save()
+            ItineraryItem.objects.create(day=self.day, location=self.spot, order=1)
+
+        stats = LocationStats.objects.get(location=self.spot)
+        self.assertEqual((stats.review_count, stats.rating_total, stats.visit_count), (1, 2, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_day.delete()
+            Review.objects.filter(id=review.id).delete()
+
+        stats.refresh_from_db()
+        self.assertEqual((stats.review_count, stats.rating_total, stats.visit_count), (0, 0, 1))
+
+        RollupManager().refresh_locations([self.spot.id])
+        stats.refresh_from_db()
+        self.assertEqual((stats.review_count, stats.rating_total, stats.visit_count), (0, 0, 1))
+
+
+class MonthlyReportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='reported@example.com', first_name='Test', last_name='User')
+        cls.other_user = User.objects.create(email='reported2@example.com', first_name='Other', last_name='User')
+        cls.spots = [Spot.objects.create(name=f"Spot {i}", address="Cebu", latitude=10.3, longitude=123.9, location_type='1') for i in range(2)]
+
+        for user, people, dates in ((cls.user, 2, ("2023-01-10", "2023-02-03")), (cls.other_user, 3, ("2023-01-10", "2023-03-20"))):
+            itinerary = Itinerary.objects.create(user=user, number_of_people=people)
+
+            for order, day_date in enumerate(dates):
+                day = Day.objects.create(itinerary=itinerary, date=day_date, order=order + 1, completed=True)
+
+                for spot in cls.spots[:order + 1]:
+                    ItineraryItem.objects.create(day=day, location=spot, order=0)
+
+        cls.admin = User.objects.create(email='reports@example.com', first_name='Test', last_name='Admin', is_staff=True)
+        MonthlyReportManager().rebuild()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_month_report_for_any_year(self):
+        response = self.client.get('/api/monthly-report/1/', {'year': 2023})
+
+        # a report only reads the rollups: reports, location visits and visitors
+        with self.assertNumQueries(3):
+            self.assertEqual(MonthlyReportManager().get_report(date(2023, 1, 1), date(2023, 1, 1)), response.data)
+
+        self.assertEqual(response.data['completed_trips'], 2)
+        self.assertEqual(response.data['unique_visitor_counts'], 5)
+        self.assertEqual(response.data['location_frequency'], [{'location__name': 'Spot 0', 'frequency': 2}])
+        self.assertEqual(response.data['completed_trips_info'], [
+            {'date': date(2023, 1, 10), 'total_locations_visited': 2, 'percentage_completed_trips': 100.0}
+        ])
+
+    def test_quarter_report_sums_months_and_keeps_visitors_distinct(self):
+        response = self.client.get('/api/report/', {'start': '2023-01', 'end': '2023-03'})
+
+        self.assertEqual(response.data['completed_trips'], 4)
+        self.assertEqual(response.data['unique_visitor_counts'], 5)
+        self.assertEqual(response.data['location_frequency'], [
+            {'location__name': 'Spot 0', 'frequency': 4},
+            {'location__name': 'Spot 1', 'frequency': 2},
+        ])
+        self.assertEqual([info['total_locations_visited'] for info in response.data['completed_trips_info']], [2, 2, 2])
+
+    def test_changes_refresh_the_month_on_commit(self):
+        computed_at = dict(MonthlyReport.objects.values_list('month', 'computed_at'))
+        planned = Day.objects.create(itinerary=Itinerary.objects.get(user=self.user), date="2023-02-20", order=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ItineraryItem.objects.create(day=Day.objects.get(date="2023-03-20"), location=self.spots[0], order=2)
+            # a day that isn't completed leaves February alone
+            ItineraryItem.objects.create(day=planned, location=self.spots[0], order=0)
+
+        self.assertEqual(
+            [month for month, computed in MonthlyReport.objects.values_list('month', 'computed_at') if computed != computed_at[month]],
+            [date(2023, 3, 1)]
+        )
+        self.assertEqual(self.client.get('/api/report/', {'start': '2023-03'}).data['location_frequency'][0]['frequency'], 2)
+
+        # reopening March's only completed day drops its report
+        reopened = Day.objects.get(date="2023-03-20")
+        reopened.completed = False
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reopened.save()
+
+        self.assertEqual(list(MonthlyReport.objects.values_list('month', flat=True)), [date(2023, 1, 1), date(2023, 2, 1)])
+
+    def test_reports_are_staff_only(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/report/', {'start': '2023-01'}).status_code, 401)
+
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/report/', {'start': '2023-01'}).status_code, 403)
+        self.assertEqual(client.get('/api/monthly-report/1/', {'year': 2023}).status_code, 403)
+
+    def test_empty_months_are_not_stored_and_ranges_are_capped(self):
+        # reading never writes, a range over empty months costs the same three queries
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/report/', {'start': '2022-11', 'end': '2023-01'})
+
+        self.assertEqual(response.data['completed_trips'], 2)
+
+        response = self.client.get('/api/report/', {'start': '9999-12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['completed_trips'], response.data['completed_trips_info']), (0, []))
+        self.assertEqual(self.client.get('/api/monthly-report/12/', {'year': 9999}).status_code, 200)
+        self.assertEqual(list(MonthlyReport.objects.values_list('month', flat=True)), [date(2023, 1, 1), date(2023, 2, 1), date(2023, 3, 1)])
+
+        self.assertEqual(self.client.get('/api/report/', {'start': '2000-01', 'end': '2009-12'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/report/', {'start': '2000-01', 'end': '2010-01'}).status_code, 400)
+
+
+class LocationDailyStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='owner@example.com', first_name='Test', last_name='User')
+        cls.spot = Spot.objects.create(name="Daily Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1', owner=cls.user)
+        cls.itinerary = Itinerary.objects.create(user=cls.user)
+        cls.days = [Day.objects.create(itinerary=cls.itinerary, date=f"2024-03-0{i + 1}", order=i + 1) for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_events_update_the_daily_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(location=self.spot, user=self.user, comment="Nice", rating=4)
+            Bookmark.objects.create(user=self.user, location=self.spot)
+
+            for day in self.days:
+                ItineraryItem.objects.create(day=day, location=self.spot, order=0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/days/complete/', {'ids': [self.days[0].id, self.days[2].id]}, format='json')
+
+        self.assertEqual(self.client.get(f'/api/user/business/{self.spot.id}/stats/').data, {
+            'total_bookmarks': 1,
+            'average_rating': 4.0,
+            'total_reviews': 1,
+            'total_visits': 2,
+            'total_planned': 3,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Day.objects.get(pk=self.days[2].pk).delete()
+
+        self.assertEqual(LocationDailyStats.objects.get(location=self.spot, date=date(2024, 3, 3)).planned_visits, 0)
+
+        # the totals are read from the stats row, which a rebuild agrees with
+        with self.assertNumQueries(2):
+            totals = self.client.get(f'/api/user/business/{self.spot.id}/stats/').data
+
+        self.assertEqual((totals['total_visits'], totals['total_planned']), (1, 2))
+        RollupManager().refresh_locations([self.spot.id])
+        self.assertEqual(self.client.get(f'/api/user/business/{self.spot.id}/stats/').data, totals)
+
+    def test_series_buckets_the_daily_rows(self):
+        LocationDailyStats.objects.bulk_create([
+            LocationDailyStats(location=self.spot, date=date(2024, 1, 1), clicks=2, reviews=1, rating_total=5),
+            LocationDailyStats(location=self.spot, date=date(2024, 1, 3), clicks=3, reviews=1, rating_total=4),
+            LocationDailyStats(location=self.spot, date=date(2024, 2, 10), planned_visits=1),
+        ])
+        url = f'/api/user/business/{self.spot.id}/stats/series/'
+
+        with self.assertNumQueries(2):
+            weeks = self.client.get(url, {'bucket': 'week', 'start': '2024-01-01', 'end': '2024-01-14'}).data['series']
+
+        self.assertEqual([(week['date'], week['clicks'], week['average_rating']) for week in weeks], [(date(2024, 1, 1), 5, 4.5), (date(2024, 1, 8), 0, 0)])
+
+        months = self.client.get(url, {'bucket': 'month', 'start': '2024-01-01', 'end': '2024-03-31'}).data['series']
+        self.assertEqual([month['planned_visits'] for month in months], [0, 1, 0])
+        self.assertEqual(len(self.client.get(url, {'start': '2024-01-01', 'end': '2024-12-31'}).data['series']), 366)
+        self.assertEqual(self.client.get(url, {'bucket': 'year'}).status_code, 400)
+
+    def test_stats_are_for_the_owner_and_staff(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='other-owner@example.com', first_name='Test', last_name='User'))
+
+        self.assertEqual(client.get(f'/api/user/business/{self.spot.id}/stats/').status_code, 404)
+        self.assertEqual(client.get(f'/api/user/business/{self.spot.id}/stats/series/').status_code, 404)
+
+        client.force_authenticate(User.objects.create(email='stats-admin@example.com', first_name='Test', last_name='Admin', is_staff=True))
+        self.assertEqual(client.get(f'/api/user/business/{self.spot.id}/stats/series/').status_code, 200)
+
+    def test_series_range_is_capped(self):
+        url = f'/api/user/business/{self.spot.id}/stats/series/'
+
+        self.assertEqual(self.client.get(url, {'start': '0001-01-01', 'end': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'end': '0001-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2022-01-01', 'end': '2024-12-31'}).status_code, 200)
+
+        # the last bucket ends on date.max
+        for bucket, start, count in (('day', '9997-01-01', 1095), ('week', '9990-01-01', 522), ('month', '9990-01-01', 120)):
+            response = self.client.get(url, {'bucket': bucket, 'start': start, 'end': '9999-12-31'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['series']), count)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardBundleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='dashboard@example.com', first_name='Test', last_name='User', is_staff=True)
+        Spot.objects.create(name="Dashboard Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bundle_matches_widgets_and_is_cached(self):
+        bundle = self.client.get('/api/dashboard/bundle/').data
+
+        self.assertFalse(bundle['cached'])
+        self.assertEqual(len(bundle['widgets']), 13)
+        self.assertEqual(bundle['widgets']['counts']['data'], self.client.get('/api/dashboard/counts/').data)
+        self.assertEqual(bundle['widgets']['tags_percent']['status'], 200)
+        self.assertIn('duration_ms', bundle['widgets']['top_spots'])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/dashboard/bundle/').data
+
+        self.assertTrue(cached['cached'])
+        self.assertEqual(cached['computed_at'], bundle['computed_at'])
+
+    def test_bundle_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='not-staff@example.com', first_name='Test', last_name='User'))
+
+        self.assertEqual(client.get('/api/dashboard/bundle/').status_code, 403)
+
+
+@override_settings(STREAMING_CHUNK_SIZE=2)
+class AnalyticsExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='exporter@example.com', first_name='Test', last_name='User', is_staff=True)
+        spot = Spot.objects.create(name="Exported Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        itinerary = Itinerary.objects.create(user=cls.admin)
+
+        for i in range(5):
+            day = Day.objects.create(itinerary=itinerary, date=f"2024-01-0{i + 1}", order=i + 1, completed=True, rating=i)
+            ItineraryItem.objects.create(day=day, location=spot, order=0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get_rows(self, response):
+        content = b''.join(response.streaming_content)
+
+        if response['Content-Type'] == 'application/gzip':
+            content = gzip.decompress(content)
+
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_csv_export_streams_every_chunk(self):
+        response = self.client.get('/api/export/visits/')
+        rows = self.get_rows(response)
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="visits.csv"')
+        self.assertEqual(rows[0][:3], ['id', 'location_id', 'location_name'])
+        self.assertEqual(len(rows), 6)
+
+    def test_date_range_and_gzip(self):
+        response = self.client.get('/api/export/day_ratings/', {'start': '2024-01-02', 'end': '2024-01-03', 'gzip': 'true'})
+
+        self.assertEqual([row[-2:] for row in self.get_rows(response)], [['date', 'rating'], ['2024-01-02', '1'], ['2024-01-03', '2']])
+        self.assertEqual(self.client.get('/api/export/clicks/', {'start': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/export/unknown/').status_code, 400)
+
+    @skipUnless(is_parquet_available(), "pyarrow is not installed")
+    def test_parquet_export_has_one_row_group_per_chunk(self):
+        import pyarrow.parquet as pq
+
+        response = self.client.get('/api/export/visits/', {'output': 'parquet'})
+        parquet = pq.ParquetFile(io.BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(parquet.metadata.num_rows, 5)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+
+
+@override_settings(IMPORT_BATCH_SIZE=2, IMAGE_WORKERS=0)
+class BulkImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        RollupManager().rebuild()
+
+    def write_csv(self, rows):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'import.csv')
+
+        with open(path, 'w', newline='') as file:
+            csv.writer(file).writerows(rows)
+
+        return path
+
+    def test_spot_import_does_what_the_row_signals_did(self):
+        header = ['Place', 'Address', 'IsClosed', 'Start', 'End', 'Latitude', 'Longitude', 'Historical', 'Nature', 'Religious', 'Art', 'Activities', 'Entertainment', 'Culture', 'Image', 'Description']
+        path = self.write_csv([header] + [
+            [f"Imported Spot {i}", "Cebu", '0', '7:00:00', '6:00 PM', '10.3', '123.9', '1', str(i % 2), '0', '0', '0', '0', '0', f"/a{i}.jpg,/b{i}.jpg", "Imported"]
+            for i in range(3)
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_spots', file=path, stdout=io.StringIO())
+
+        spot = Spot.objects.get(name="Imported Spot 1")
+        self.assertEqual((spot.location_type, str(spot.closing_time)), ('1', '18:00:00'))
+        self.assertEqual(sorted(spot.tags.values_list('name', flat=True)), ['Historical', 'Nature'])
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(list(spot.images.order_by('id').values_list('image', 'is_primary_image')), [('/a1.jpg', True), ('/b1.jpg', False)])
+        self.assertEqual(list(AudienceType.objects.filter(fee_type__spot=spot).values_list('fee_type__name', 'name', 'price')), [("Entrance Fee", "General", 0)])
+        self.assertEqual(DashboardCounter.objects.get(name='spots').value, 3)
+        self.assertEqual(DashboardCounter.objects.get(name='locations').value, 3)
+        self.assertEqual(LocationStats.objects.count(), 3)
+        self.assertEqual(CatalogVersion.objects.get(group='locations').version, 1)
+
+    def test_reimport_only_applies_changed_rows(self):
+        header = ['Place', 'Address', 'IsClosed', 'Latitude', 'Longitude', 'Image']
+        rows = [[f"Hotel {i}", "Cebu", '0', '10.3', '123.9', f"/hotel{i}.jpg"] for i in range(3)]
+        call_command('import_accommodations', file=self.write_csv([header] + rows), stdout=io.StringIO())
+
+        # a hash lookup per batch of two rows and the accommodation names, nothing is written
+        with self.assertNumQueries(5):
+            call_command('import_accommodations', file=self.write_csv([header] + rows), stdout=io.StringIO())
+
+        rows[0][1] = "Lapu-Lapu"
+        rows[0][5] = "/hotel0-lobby.jpg"
+        output = io.StringIO()
+        call_command('import_accommodations', file=self.write_csv([header] + rows[:2]), close_missing=True, stdout=output)
+
+        self.assertIn("Imported 1 rows", output.getvalue())
+        self.assertEqual(Accommodation.objects.count(), 3)
+        self.assertEqual(Accommodation.objects.get(name="Hotel 0").address, "Lapu-Lapu")
+        self.assertEqual(list(LocationImage.objects.filter(location__name="Hotel 0").order_by('id').values_list('image', 'is_primary_image')), [('/hotel0.jpg', True), ('/hotel0-lobby.jpg', False)])
+        self.assertTrue(Accommodation.objects.get(name="Hotel 2").is_closed)
+
+        # a closed row that comes back is applied again
+        call_command('import_accommodations', file=self.write_csv([header] + rows), stdout=io.StringIO())
+        self.assertFalse(Accommodation.objects.get(name="Hotel 2").is_closed)
+
+    @override_settings(IMPORT_BATCH_SIZE=500)
+    def test_bulk_import_beats_row_by_row(self):
+        # wall time depends on the database's latency, the number of round trips it pays doesn't
+        results = time_imports(40)
+        (row_seconds, row_queries), (bulk_seconds, bulk_queries) = results['row by row'], results['bulk']
+
+        self.assertGreaterEqual(row_queries / bulk_queries, 20)
+        self.assertFalse(Spot.objects.exists())
+
+    def test_activity_import_rolls_back_on_unknown_spot(self):
+        Spot.objects.create(name="Known Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        path = self.write_csv([['Location', 'Hiking', 'Diving'], ['Known Spot', '1', '1'], ['Unknown Spot', '1', '0']])
+
+        with self.assertRaises(CommandError):
+            call_command('import_activities', file=path, stdout=io.StringIO())
+
+        self.assertFalse(Activity.objects.exists())
+        self.assertFalse(Spot.activity.through.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "the load generator writes with COPY")
+class GenerateLoadDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(6):
+            Spot.objects.create(name=f"Spot {i}", address="Cebu", latitude=10.3 + i / 100, longitude=123.9, location_type='1')
+
+        FoodPlace.objects.create(name="Food Place", address="Cebu", latitude=10.3, longitude=123.91, location_type='2')
+
+    def test_generates_consistent_rows(self):
+        call_command('generate_load_data', users=30, workers=1, chunk_size=8, seed=7, skip_refresh=True, stdout=io.StringIO())
+
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Preferences.objects.count(), 30)
+        self.assertTrue(Itinerary.objects.exists())
+        self.assertFalse(Itinerary.objects.filter(day__isnull=True).exists())
+        self.assertFalse(Review.objects.exclude(rating__range=(1, 5)).exists())
+        self.assertEqual(Bookmark.objects.values('user', 'location').distinct().count(), Bookmark.objects.count())
+
+        # every generated click lands in a daily bucket
+        clicks = UserClick.objects.aggregate(total=Sum('amount'))['total']
+        self.assertEqual(LocationClickBucket.objects.filter(granularity='D').aggregate(total=Sum('amount'))['total'], clicks)
+
+        # the sequences moved past the copied rows
+        self.assertGreater(User.objects.create(email="after@example.com").pk, User.objects.exclude(email="after@example.com").order_by('-pk')[0].pk)
+
+
+@override_settings(IMAGE_WORKERS=0, CACHES=LOCMEM_CACHES)
+class ImageVariantTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = self.settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def get_image(self, size, mode='RGB', format='PNG'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'red').save(buffer, format)
+        return ContentFile(buffer.getvalue(), name=f"upload.{format.lower()}")
+
+    def get_size(self, name, variant, extension):
+        with default_storage.open(get_variant_name(name, variant, extension)) as file, Image.open(file) as image:
+            return image.size
+
+    def test_upload_renders_variants_without_upscaling(self):
+        spot = Spot.objects.create(name="Variant Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image = LocationImage.objects.create(location=spot, image=self.get_image((900, 600), 'RGBA'), is_primary_image=True)
+
+        name = image.image.name
+        self.assertEqual(self.get_size(name, 'thumbnail', 'webp'), (160, 160))
+        self.assertEqual(self.get_size(name, 'card', 'jpeg'), (480, 320))
+        self.assertEqual(self.get_size(name, 'hero', 'webp'), (900, 600))
+
+        response = APIClient().get('/api/location/paginated/', {'fields': 'id,primary_image_variants'})
+        result = response.data['results'][0]
+        self.assertEqual(result['primary_image_variants']['card']['webp'], default_storage.url(get_variant_name(name, 'card', 'webp')))
+
+    def test_variants_are_only_linked_once_rendered(self):
+        spot = Spot.objects.create(name="Pending Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            image = LocationImage.objects.create(location=spot, image=self.get_image((900, 600)), is_primary_image=True)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='variants@example.com', first_name='Test', last_name='User'))
+        response = client.get(f'/api/location/{spot.id}/')
+        self.assertEqual((response.data['images'], response.data['image_variants']), ([image.image.url], [None]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants_name, image.image.name)
+        self.assertEqual(client.get(f'/api/location/{spot.id}/').data['image_variants'][0]['thumbnail']['jpeg'], default_storage.url(get_variant_name(image.image.name, 'thumbnail', 'jpeg')))
+
+        # linking the variants changes the location cards, so conditional GETs of the catalog see a new version
+        LocationImage.objects.filter(pk=image.pk).update(variants_name='')
+        version = CatalogVersion.objects.get(group='locations').version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_rendered(image.image.name)
+
+        self.assertEqual(CatalogVersion.objects.get(group='locations').version, version + 1)
+
+    def test_queued_render_failures_are_logged(self):
+        failed = Future()
+        failed.set_exception(RuntimeError("worker died"))
+        unreadable = Future()
+        unreadable.set_result(('drivers/notes.jpg', 0, "cannot identify image file"))
+
+        with self.assertLogs('api.images') as logs:
+            log_render_result('drivers/driver.jpg', failed)
+            log_render_result('drivers/notes.jpg', unreadable)
+
+        self.assertEqual([record.levelname for record in logs.records], ['ERROR', 'WARNING'])
+        self.assertIn("drivers/driver.jpg", logs.output[0])
+
+    def test_backfill_renders_only_stale_images(self):
+        name = default_storage.save('drivers/driver.jpg', self.get_image((2000, 1500), format='JPEG'))
+        default_storage.save('drivers/notes.txt', ContentFile(b"not an image"))
+        output = io.StringIO()
+        call_command('generate_image_variants', workers=1, stdout=output)
+
+        self.assertIn("Rendered variants of 1 images, 0 already up to date", output.getvalue())
+        self.assertEqual(self.get_size(name, 'hero', 'jpeg'), (960, 720))
+
+        output = io.StringIO()
+        call_command('generate_image_variants', workers=1, stdout=output)
+        self.assertIn("Rendered variants of 0 images, 1 already up to date", output.getvalue())
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = self.settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_identical_uploads_share_a_blob(self):
+        first = default_storage.save('location_images/Spot/Spot.JPG', ContentFile(b"same photo"))
+        second = default_storage.save('location_images/Other/Other.jpg', ContentFile(b"same photo"))
+        third = default_storage.save('location_images/Spot/Spot.jpg', ContentFile(b"another photo"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertRegex(first, r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(list(default_storage.get_blob_names())), 2)
+
+    def test_blobs_are_served_immutable(self):
+        name = default_storage.save('drivers/driver.png', ContentFile(b"driver"))
+        default_storage.save('variants/drivers/legacy.png/card.webp', ContentFile(b"legacy variant"))
+
+        request = RequestFactory().get(default_storage.url(name))
+        response = serve_media(request, name)
+        self.assertEqual(b''.join(response.streaming_content), b"driver")
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        response = serve_media(request, 'variants/drivers/legacy.png/card.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Cache-Control', response)
+
+        # without DEBUG the front server serves media, django does not route it
+        self.assertEqual(APIClient().get(default_storage.url(name)).status_code, 404)
+
+    def test_gc_deletes_unreferenced_blobs_and_their_variants(self):
+        spot = Spot.objects.create(name="GC Spot", address="Cebu", latitude=10.3, longitude=123.9, location_type='1')
+        kept = LocationImage.objects.create(location=spot, image=ContentFile(b"kept", name="kept.png")).image.name
+        replaced = LocationImage.objects.create(location=spot, image=ContentFile(b"replaced", name="replaced.png"))
+        orphan = replaced.image.name
+        default_storage.save(f"variants/{orphan}/card.webp", ContentFile(b"variant"))
+        replaced.delete()
+
+        call_command('gc_media', stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+        output = io.StringIO()
+        call_command('gc_media', grace_hours=-1, stdout=output)
+
+        self.assertIn("Deleted 1 orphaned blobs", output.getvalue())
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(f"variants/{orphan}"))
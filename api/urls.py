@@ -20,6 +20,7 @@ urlpatterns = [
     path('location/visited/', get_visited_locations, name="get_visited_locations"),
 
     path('location/paginated/', PaginatedLocationViewSet.as_view({'get': 'list'}, name="paginated_locations")),
+    path('location/search/', search_locations, name="search_locations"),
 
     path('location/', LocationViewSet.as_view({'get': 'list'}), name="locations"),
     path('location/plan/', LocationPlanViewSet.as_view({'get': 'list'}), name="locations-plan"),
@@ -31,6 +32,7 @@ urlpatterns = [
     path('itinerary/<int:itinerary_id>/', get_itinerary, name="get_itinerary"),
     path('itinerary/<int:itinerary_id>/calendar/', update_itinerary_calendar,name="update-itinerary-calendar"),
     path('itinerary/<int:itinerary_id>/days/', get_related_days, name="get_related_days"),
+    path('itinerary/<int:itinerary_id>/bundle/', get_itinerary_bundle, name="get_itinerary_bundle"),
     path('itinerary/<int:itinerary_id>/delete/', delete_itinerary, name="delete_itinerary"),
     path('itinerary/<int:itinerary_id>/edit/name/', edit_itinerary_name, name="edit_itinerary"),
     path('itinerary/<int:itinerary_id>/edit/', edit_itinerary, name='edit_itinerary_detail'),
@@ -41,6 +43,7 @@ urlpatterns = [
     path('day/<int:day_id>/complete/', mark_day_complete, name="mark_day_complete"),
     path('day/<int:day_id>/detail/', get_completed_day, name="get-completed-day"),
     path('day/<int:day_id>/rate/', rate_day, name="rate-day"),
+    path('day/<int:day_id>/items/batch/', batch_update_day_items, name="batch-update-day-items"),
     path('days/complete/', mark_days_complete, name="mark_days_complete"),
     path('days/completed/all/', get_all_completed_days, name='get_all_completed_days'),
 
@@ -56,6 +59,7 @@ urlpatterns = [
     path('recommendations/<int:model_id>/apply/', apply_recommendation, name='apply-recommendation'),
     path('recommendations/location/<int:location_id>/', get_location_recommendations, name='get_location_recommendation'),
     path('recommendations/homepage/', get_homepage_recommendations, name='get_homepage_recommendations'), 
+    path('recommendations/trending/', get_trending_recommendations, name='get_trending_recommendations'),
     path('recommendations/<int:day_id>/nearby/spot/', get_spot_chain_recommendations, name="get_spot_chain_recommendations"),
     path('recommendations/<int:day_id>/nearby/foodplace/', get_food_chain_recommendations, name="get_food_chain_recommendations"),
     path('recommendations/foodplace/', get_foodplace_recommendations, name="get_foodplace_recommendations"),
@@ -77,6 +81,7 @@ urlpatterns = [
     path('user/business/<int:location_id>/edit/', edit_business, name='edit_business'),
     path('user/active/', get_active_trips, name="get-active-trips"),
     path('user/business/<int:location_id>/stats/', get_business_stats, name='get_business_stats'),
+    path('user/business/<int:location_id>/stats/series/', get_business_stats_series, name='get_business_stats_series'),
 
     path('user/business/<int:location_id>/edit/add_foodtags/', add_foodtags, name='add_foodtags'), #edit foodplace tags
     path('user/business/<int:location_id>/edit/remove_foodtags/', remove_foodtags, name='remove_foodtags'), #edit foodplace tags
@@ -122,6 +127,7 @@ urlpatterns = [
     path('dashboard/user-spot-tags/', get_visited_spot_tag, name='get_visited_spot_tag'),
     path('dashboard/user-spot-activity/', get_visited_spot_activity, name='get_visited_spot_activity'),
     path('dashboard/user-foodplace-tags/', get_visited_foodplace_tag, name='get_visited_foodplace_tag'),
+    path('dashboard/bundle/', get_dashboard_bundle, name='get_dashboard_bundle'),
 
     path('event/', get_all_events, name='get_all_events'),
     path('event/<int:event_id>/', get_event, name='get_event'),
@@ -154,10 +160,15 @@ urlpatterns = [
     path('contact/list/', list_contact_forms, name="list_contact_forms"),
     path('contact/<int:form_id>/toggle-response/', update_admin_response, name="toggle_admin_response"),
     path('monthly-report/<int:month>/', monthly_report, name="monthly_report"),
+    path('report/', get_report, name="get_report"),
+    path('export/<str:name>/', export_analytics, name="export_analytics"),
 
     path('generate-otp/', generate_user_otp, name="generate_user_otp"),
     path('verify-otp/', verify_otp_user, name="verify_user_otp"),
     path('notify-change-password/', notify_and_change_password, name="notify_and_change_password"),
 
-    path('click/<int:location_id>/', user_click, name="user_click")
+    path('click/<int:location_id>/', user_click, name="user_click"),
+
+    path('cache/stats/', get_cache_stats, name="get_cache_stats"),
+    path('batch/', batch_requests, name="batch"),
 ]
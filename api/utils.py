@@ -1,5 +1,7 @@
+from datetime import datetime, time
 from django.utils import timezone
-from .models import OTP
+from django.views.decorators.http import condition
+from .models import OTP, CatalogVersion
 import random
 import string
 
@@ -12,4 +14,31 @@ def generate_otp(user):
     otp_instance.expiration_time = expiration_time
     otp_instance.save()
 
-    return otp_code
\ No newline at end of file
+    return otp_code
+
+def catalog_condition(*groups, daily=False):
+    # answers If-None-Match / If-Modified-Since with a 304 from the catalog version counters alone;
+    # daily responses (e.g. upcoming events) also change when the date does
+    def get_versions(request):
+        if not hasattr(request, 'catalog_versions'):
+            request.catalog_versions = CatalogVersion.get_versions(groups)
+
+        return request.catalog_versions
+
+    def get_etag(request, *args, **kwargs):
+        etag = "-".join(f"{group}.{version}" for group, version, updated_at in get_versions(request))
+
+        if daily:
+            etag += f"-{timezone.localdate().isoformat()}"
+
+        return etag
+
+    def get_last_modified(request, *args, **kwargs):
+        timestamps = [updated_at for group, version, updated_at in get_versions(request) if updated_at]
+
+        if daily:
+            timestamps.append(timezone.make_aware(datetime.combine(timezone.localdate(), time.min)))
+
+        return max(timestamps) if timestamps else None
+
+    return condition(etag_func=get_etag, last_modified_func=get_last_modified)
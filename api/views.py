@@ -1,6 +1,8 @@
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.views.static import serve
+from django.conf import settings
 from django.core.mail import send_mail
-from django.core.files.storage import default_storage
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -8,15 +10,18 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status, viewsets
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.filters import SearchFilter
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils.crypto import get_random_string
-from django.db.models import Q, Max, Sum
-from datetime import datetime
+from django.utils.decorators import method_decorator
+from django.db.models import Q, F, Max, Sum, Prefetch, Exists, OuterRef
+from django.db.models.functions import Cast
+from django.db import transaction
+from datetime import datetime, date
 import calendar
+import time
 
 import pandas as pd
 import json
@@ -24,7 +29,13 @@ import json
 from .managers import *
 from .models import *
 from .serializers import *
-from .utils import generate_otp
+from .utils import generate_otp, catalog_condition
+from .cache import cache_response, response_cache, cached_views
+from .search import TrigramSearchFilter, location_search_index
+from .pagination import KeysetPagination, StreamingListMixin, is_stream_requested, list_response
+from .batch import run_batch
+from .exports import ExportError, generate_export
+from .storage import is_immutable, IMMUTABLE_CACHE_CONTROL
 
 import random
 import numpy as np
@@ -69,26 +80,24 @@ class UserRegistrationView(CreateAPIView):
 
         return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
 
-class LocationPlanViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(catalog_condition('locations'), name='list')
+class LocationPlanViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationQuerySerializers
-    filter_backends = [SearchFilter]
-    search_fields = ['name']
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['name', 'address']
+    pagination_class = KeysetPagination
 
     action = {
         'list': 'list',
     }
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        query = self.request.query_params.get('query', None)
+        queryset = LocationQuerySerializers.setup_eager_loading(super().get_queryset(), LocationQuerySerializers.get_requested_field_names(self.request))
         hide = self.request.query_params.get('hide', None) 
         # requests = [request.location.id for request in OwnershipRequest.objects.filter(is_approved=False)]
         # queryset = queryset.exclude(id__in=requests)
 
-        if query:
-            queryset = queryset.filter(name__istartswith=query)
-
         if hide:
             queryset = queryset.filter(is_closed=False)
 
@@ -96,27 +105,25 @@ class LocationPlanViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
     
-class LocationViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(catalog_condition('locations'), name='list')
+class LocationViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationQuerySerializers
-    filter_backends = [SearchFilter]
-    search_fields = ['name']
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['name', 'address']
+    pagination_class = KeysetPagination
 
     action = {
         'list': 'list',
     }
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        query = self.request.query_params.get('query', None)
+        queryset = LocationQuerySerializers.setup_eager_loading(super().get_queryset(), LocationQuerySerializers.get_requested_field_names(self.request))
         hide = self.request.query_params.get('hide', None) 
         location_type = self.request.query_params.get('type', None)
         # requests = [request.location.id for request in OwnershipRequest.objects.filter(is_approved=False)]
         # queryset = queryset.exclude(id__in=requests)
 
-        if query:
-            queryset = queryset.filter(name__istartswith=query)
-
         if hide:
             queryset = queryset.filter(is_closed=False)
 
@@ -168,11 +175,12 @@ class CustomNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
 
+@method_decorator(catalog_condition('locations'), name='list')
 class PaginatedLocationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationQuerySerializers
-    filter_backends = [SearchFilter]
-    search_fields = ['name']
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['name', 'address']
     pagination_class = CustomNumberPagination
 
     action = {
@@ -180,14 +188,10 @@ class PaginatedLocationViewSet(viewsets.ReadOnlyModelViewSet):
     }
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        query = self.request.query_params.get('query', None)
+        queryset = LocationQuerySerializers.setup_eager_loading(super().get_queryset(), LocationQuerySerializers.get_requested_field_names(self.request))
         hide = self.request.query_params.get('hide', None) 
         location_type = self.request.query_params.get('type', None)
 
-        if query:
-            queryset = queryset.filter(name__istartswith=query)
-
         if hide:
             queryset = queryset.filter(is_closed=False)
 
@@ -201,6 +205,24 @@ class PaginatedLocationViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset
     
+@api_view(['GET'])
+@catalog_condition('locations')
+def search_locations(request):
+    query = request.query_params.get('query', '')
+    hide = request.query_params.get('hide', None)
+    location_types = {'spot': '1', 'foodplace': '2', 'accommodation': '3'}
+    location_type = location_types.get(request.query_params.get('type', None))
+
+    results = location_search_index.search(query, location_type=location_type, hide_closed=bool(hide))
+
+    paginator = CustomNumberPagination()
+    result_page = paginator.paginate_queryset(results, request)
+    locations = LocationQuerySerializers.setup_eager_loading(Location.objects.all(), LocationQuerySerializers.get_requested_field_names(request)).in_bulk([location_id for location_id, score in result_page])
+    ranked_locations = [locations[location_id] for location_id, score in result_page if location_id in locations]
+
+    serializer = LocationQuerySerializers(ranked_locations, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+    
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def forgot_password(request):
@@ -304,8 +326,8 @@ def change_password_with_token(request, uidb64, token):
 def get_related_days(request, itinerary_id):
     itinerary = Itinerary.objects.get(id=itinerary_id)
 
-    days = Day.objects.filter(itinerary=itinerary)
-    day_serializer = DaySerializers(days, many=True)
+    days = DaySerializers.setup_eager_loading(Day.objects.filter(itinerary=itinerary))
+    day_serializer = DaySerializers(days, many=True, context={'request': request})
 
     return Response(day_serializer.data, status=status.HTTP_200_OK)
 
@@ -313,8 +335,8 @@ def get_related_days(request, itinerary_id):
 @permission_classes([IsAuthenticated])
 def get_itinerary_list(request):
     user = request.user
-    itineraries = Itinerary.objects.filter(user=user)
-    serializer = ItineraryListSerializers(itineraries, many=True)
+    itineraries = ItineraryListSerializers.setup_eager_loading(Itinerary.objects.filter(user=user))
+    serializer = ItineraryListSerializers(itineraries, many=True, context={'request': request})
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
@@ -332,6 +354,34 @@ def get_itinerary(request, itinerary_id):
 
     return Response(itinerary_serializer.data, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_itinerary_bundle(request, itinerary_id):
+    try:
+        itinerary = Itinerary.objects.get(id=itinerary_id)
+    except Itinerary.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if itinerary.user_id != request.user.id:
+        return Response({'message': "Access Denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    today = timezone.now().date()
+    catalog_versions = CatalogVersion.get_versions(['locations', 'events'])
+    version_stamp = ".".join(str(version) for group, version, updated_at in catalog_versions)
+
+    def build():
+        days = DaySerializers.setup_eager_loading(Day.objects.filter(itinerary=itinerary))
+
+        return {
+            'itinerary': ItinerarySerializers(itinerary).data,
+            'version': itinerary.version,
+            'days': DaySerializers(days, many=True, context=DaySerializers.get_eager_context(days)).data,
+        }
+
+    data = response_cache.get_or_build('itinerary_bundle', f"{itinerary.id}:{itinerary.version}:{version_stamp}:{today.isoformat()}", build)
+
+    return Response(data, status=status.HTTP_200_OK)
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_itinerary(request, itinerary_id):
@@ -348,20 +398,44 @@ def delete_itinerary(request, itinerary_id):
 @permission_classes([IsAuthenticated])
 def update_ordering(request, day_id):
     items = request.data.get("items")
+    day = Day.objects.get(id=day_id)
 
+    itinerary_items = ItineraryItem.objects.in_bulk([int(item["id"]) for item in items])
     for order, item in enumerate(items):
-        itinerary_item = ItineraryItem.objects.get(id=item["id"])
-        itinerary_item.order = order
-        itinerary_item.save()
+        itinerary_items[int(item["id"])].order = order
 
-    serializer = ItineraryItemSerializer(items, many=True)
+    ItineraryItem.objects.bulk_update(itinerary_items.values(), ['order'])
+    send_itinerary_changed('ordering', itinerary_ids=[day.itinerary_id])
 
-    day = Day.objects.get(id=day_id)
-    itinerary_items = ItineraryItem.objects.filter(day=day)
-    serializer = ItineraryItemSerializer(itinerary_items, many=True)
+    day = DaySerializers.setup_eager_loading(Day.objects.filter(id=day_id)).get()
+    serializer = ItineraryItemSerializer(day.itineraryitem_set.all(), many=True)
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_update_day_items(request, day_id):
+    try:
+        day = Day.objects.select_related('itinerary').get(id=day_id)
+    except Day.DoesNotExist:
+        return Response({'error': 'Day not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if day.itinerary.user_id != request.user.id:
+        return Response({'message': "Access Denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        version, day_ids = DayItemsManager().apply_operations(day, request.data.get('operations'), request.data.get('version'))
+    except ItineraryVersionConflict as conflict:
+        return Response({'error': str(conflict), 'version': conflict.version}, status=status.HTTP_409_CONFLICT)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    days = DaySerializers.setup_eager_loading(Day.objects.filter(id__in=day_ids)).in_bulk()
+    days = [days[day_id] for day_id in day_ids]
+    serializer = DaySerializers(days, many=True, context=DaySerializers.get_eager_context(days))
+
+    return Response({'version': version, 'days': serializer.data}, status=status.HTTP_200_OK)
+
 @api_view(["PATCH"])
 def edit_itinerary_name(request, itinerary_id):
     name = request.data.get("name")
@@ -371,16 +445,22 @@ def edit_itinerary_name(request, itinerary_id):
 
     return Response(status=status.HTTP_200_OK)
 
+def add_bookmark_status(request, data, id):
+    if is_field_requested(request, 'is_bookmarked'):
+        data['is_bookmarked'] = Bookmark.objects.filter(location_id=id, user=request.user).exists()
+
+    return data
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response('location', lambda request, id: [f"location:{id}", 'locations'], extend=add_bookmark_status)
 def get_location(request, id):
-    user = request.user
     try:
         location = Location.objects.get(pk=id)
     except Location.DoesNotExist:
         return Response({'error': 'Location not found'}, status=404)
 
-    serializer = LocationSerializers(location, context={'user': user})
+    serializer = LocationSerializers(location, context={'request': request})
     data = serializer.data
 
     return Response(data)
@@ -399,7 +479,7 @@ def get_visited_locations(request):
         if review.location not in location:
             locations.append(review.location)
 
-    serializers = RecommendedLocationSerializer(locations, many=True)
+    serializers = RecommendedLocationSerializer(locations, many=True, context={'request': request})
     return Response(serializers.data, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
@@ -416,20 +496,14 @@ def create_itinerary(request):
     itinerary_serializer = ItinerarySerializers(data=itinerary_data)
 
     if itinerary_serializer.is_valid():
+        start_date = datetime.strptime(start_date, '%m/%d/%Y').date()
+        end_date = datetime.strptime(end_date, '%m/%d/%Y').date()
+
+        if end_date < start_date:
+            return Response({'error': 'end_date must not be before start_date'}, status=status.HTTP_400_BAD_REQUEST)
+
         itinerary = itinerary_serializer.save()
-        current_date = datetime.strptime(start_date, '%m/%d/%Y')
-        end_date = datetime.strptime(end_date, '%m/%d/%Y')
-        
-        order = 1
-        while current_date <= end_date:
-            Day.objects.create(
-                date=current_date,
-                itinerary=itinerary,
-                order=order
-            )
-
-            order = order + 1
-            current_date += timedelta(days=1)
+        itinerary.set_calendar(start_date, end_date)
         
         return Response({'id': itinerary.id}, status=status.HTTP_201_CREATED)
 
@@ -469,6 +543,8 @@ def location(request):
         return Response(serializer.data)
     
 @api_view(["GET"])
+@catalog_condition('locations')
+@cache_response('spot', lambda request, pk: [f"location:{pk}", 'locations'])
 def spot(request, pk):
     if request.method == "GET":
         spot = get_object_or_404(Spot, id=pk)
@@ -571,19 +647,13 @@ def update_itinerary_calendar(request, itinerary_id):
     start_date = datetime.strptime(start_date, '%m/%d/%Y').date()
     end_date = datetime.strptime(end_date, '%m/%d/%Y').date()
 
-    days = []
-
-    while start_date <= end_date:
-        day, created = Day.objects.get_or_create(
-            date=start_date,
-            itinerary=itinerary
-        )
+    if end_date < start_date:
+        return Response({'error': 'endDate must not be before startDate'}, status=status.HTTP_400_BAD_REQUEST)
 
-        days.append(day)
-        start_date += timedelta(days=1)
+    itinerary.set_calendar(start_date, end_date)
 
-
-    day_serializers = DaySerializers(days, many=True)
+    days = DaySerializers.setup_eager_loading(itinerary.day_set.order_by('date', 'id'))
+    day_serializers = DaySerializers(days, many=True, context=DaySerializers.get_eager_context(days))
 
     return Response({
         'message': "Calendar Updated Successfully",
@@ -594,22 +664,20 @@ def update_itinerary_calendar(request, itinerary_id):
 def apply_recommendation(request, model_id):
     day_id = request.data.get("day_id")
     day = Day.objects.get(id=day_id)
-
-    ItineraryItem.objects.filter(day=day).delete()
-
     model = ModelItinerary.objects.get(id=model_id)
-    location_orders = model.modelitinerarylocationorder_set.all()
-
-    items = []
-    for location_order in location_orders:
-        item = ItineraryItem.objects.create(
-            day=day,
-            location=location_order.spot,
-            order=location_order.order
-        )
-        items.append(item)
+    location_orders = model.modelitinerarylocationorder_set.values_list('spot_id', 'order')
 
-    day_serializer = DaySerializers(day)
+    # the day's items are replaced in one transaction and reported as a single itinerary change
+    with transaction.atomic(), batched_itinerary_changes('recommendation') as changes:
+        ItineraryItem.objects.filter(day=day).delete()
+        items = ItineraryItem.objects.bulk_create([
+            ItineraryItem(day=day, location_id=spot_id, order=order) for spot_id, order in location_orders
+        ])
+        changes['itinerary_ids'].add(day.itinerary_id)
+        RollupManager().queue(item_changes=[(item.location_id, day.id, 1) for item in items])
+
+    days = list(DaySerializers.setup_eager_loading(Day.objects.filter(id=day.id)))
+    day_serializer = DaySerializers(days[0], context=DaySerializers.get_eager_context(days))
 
     return Response({
         'message': 'Successfully applied recommendation',
@@ -647,10 +715,14 @@ def delete_day(request, day_id):
 def get_location_reviews(request, location_id):
     user = request.user 
     if request.method == "GET":
+        reviews = Review.objects.filter(location_id=location_id).exclude(user=user).select_related('user').order_by('-datetime_created')
+
+        if is_stream_requested(request) or 'cursor' in request.query_params:
+            return list_response(request, reviews, ReviewSerializers, ordering=('-datetime_created', '-id'))
+
         paginator = PageNumberPagination()
         paginator.page_size = 5
 
-        reviews = Review.objects.filter(location_id=location_id).exclude(user=user).order_by('-datetime_created')
         result_page = paginator.paginate_queryset(reviews, request)
         review_serializer = ReviewSerializers(result_page, many=True)
         
@@ -670,10 +742,11 @@ def get_user_review(request, location_id):
 @permission_classes([IsAuthenticated])
 def get_bookmarks(request):
     user = request.user
-    bookmarks = Bookmark.objects.filter(user=user)
+    bookmarks = Bookmark.objects.filter(user=user).prefetch_related(
+        Prefetch('location', queryset=LocationQuerySerializers.setup_eager_loading(Location.objects.all()))
+    )
 
-    serializer = BookmarkLocationSerializer(bookmarks, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return list_response(request, bookmarks, BookmarkLocationSerializer, ordering=('-datetime_created', '-id'), context={'request': request})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -876,7 +949,7 @@ def get_location_recommendations(request, location_id):
         recommendation = Location.objects.get(pk=id)
         recommendations.append(recommendation)
 
-    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True)
+    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'request': request})
 
     return Response({
         'recommendations': recommendation_serializers.data
@@ -908,6 +981,18 @@ def get_homepage_recommendations(request):
 
     # get the user's review of specific places as an indication that leaving a review = visited
     visited_list.update(review.location.id for review in Review.objects.filter(user=user))
+
+    # users without preferences, visits or clicks have nothing to score against, so fall back to what is trending
+    has_history = visited_list or UserClick.objects.filter(user=user).exists()
+    if not any(preferences) and not has_history:
+        recommendations = TrendingManager().get_trending(location_type='1', limit=8)
+
+        if recommendations:
+            recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'visited_list': visited_list, 'request': request})
+            return Response({
+                'recommendations': recommendation_serializers.data
+                }, status=status.HTTP_200_OK)
+
     manager = RecommendationsManager()
     recommendation_ids = manager.get_homepage_recommendation(user, preferences, visited_list)
 
@@ -916,7 +1001,30 @@ def get_homepage_recommendations(request):
         recommendation = Location.objects.get(pk=id)
         recommendations.append(recommendation)
 
-    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'visited_list': visited_list})
+    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'visited_list': visited_list, 'request': request})
+
+    return Response({
+        'recommendations': recommendation_serializers.data
+        }, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_trending_recommendations(request):
+    location_types = {'spot': '1', 'foodplace': '2', 'accommodation': '3'}
+    location_type = location_types.get(request.query_params.get('type', None))
+    manager = TrendingManager()
+
+    try:
+        limit = int(request.query_params.get('limit', manager.top_n))
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not 1 <= limit <= manager.top_n:
+        return Response({'error': f'limit must be between 1 and {manager.top_n}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    recommendations = manager.get_trending(location_type=location_type, limit=limit)
+    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'request': request})
 
     return Response({
         'recommendations': recommendation_serializers.data
@@ -928,8 +1036,7 @@ def get_homepage_recommendations(request):
 def get_all_users(request):
     if request.method == 'GET':
         users = User.objects.filter(is_superuser=False)
-        serializer = UserSerializers(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, users, UserSerializers)
 
 
 @api_view(["DELETE"])
@@ -1038,9 +1145,8 @@ def get_ownership_requests(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_all_ownership_requests(request):
-    requests = OwnershipRequest.objects.filter(is_approved=False)
-    serializer = OwnershipRequestSerializer(requests, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    requests = OwnershipRequest.objects.filter(is_approved=False).select_related('user', 'location')
+    return list_response(request, requests, OwnershipRequestSerializer, ordering=('-timestamp', '-id'))
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
@@ -1083,18 +1189,13 @@ def mark_day_as_completed(request, day_id):
 @permission_classes([IsAuthenticated])
 def get_completed_days(request):
     user = request.user
-    itineraries = Itinerary.objects.filter(user=user)
-    completed_days = []
-
-    for itinerary in itineraries:
-        days = Day.objects.filter(itinerary=itinerary)
+    completed_days = Day.objects.filter(
+        Exists(ItineraryItem.objects.filter(day=OuterRef('pk'))),
+        itinerary__user=user,
+    ).order_by('-itinerary_id', 'date', 'id')
+    completed_days = DayRatingsSerializer.setup_eager_loading(completed_days)
 
-        for day in days:
-            if ItineraryItem.objects.filter(day=day).count() != 0:
-                completed_days.append(day)
-
-    serializer = DayRatingsSerializer(completed_days, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return list_response(request, completed_days, DayRatingsSerializer, ordering=('-itinerary_id', 'date', 'id'))
 
 @api_view(['GET'])
 def get_completed_day(request, day_id):
@@ -1115,11 +1216,12 @@ def mark_day_complete(request, day_id):
 @api_view(['PATCH'])
 def mark_days_complete(request):
     ids = request.data.get('ids')
-    
-    for id in ids:
-        day = Day.objects.get(id=id)
-        day.completed = True 
-        day.save()
+
+    with transaction.atomic():
+        # only the days this request completes move their items into the visit counts
+        day_ids = list(Day.objects.select_for_update().filter(id__in=ids, completed=False).order_by().values_list('id', flat=True))
+        Day.objects.filter(id__in=day_ids).update(completed=True)
+        send_itinerary_changed('completed', day_ids=day_ids)
 
     return Response(status=status.HTTP_200_OK)
 
@@ -1139,15 +1241,15 @@ def rate_day(request, day_id):
 @permission_classes([IsAuthenticated])
 def get_active_trips(request):
     user = request.user
-    itineraries = Itinerary.objects.filter(user=user)
     current_date = datetime.now().date()
 
-    days = []
-    for itinerary in itineraries:
-        matching_days = Day.objects.filter(itinerary=itinerary, date__lte=current_date, completed=False)
-        matching_days = matching_days.annotate(num_items=Count('itineraryitem')).filter(num_items__gt=0)
-
-        days.extend(matching_days)
+    days = Day.objects.filter(
+        Exists(ItineraryItem.objects.filter(day=OuterRef('pk'))),
+        itinerary__user=user,
+        date__lte=current_date,
+        completed=False,
+    ).order_by('-itinerary_id', 'date', 'id')
+    days = DayRatingsSerializer.setup_eager_loading(days)
 
     serializer = DayRatingsSerializer(days, many=True)
 
@@ -1236,9 +1338,7 @@ def edit_business(request, location_id):
             is_primary_image=True,
         )
 
-        old_image_path = location_image.image.path
-        default_storage.delete(old_image_path)
-
+        # the old blob may be shared with other images, gc_media removes it once nothing references it
         location_image.image = image
         location_image.save() 
 
@@ -1260,7 +1360,7 @@ def delete_user_business(request, location_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_set_preferences(request):
-    return request.user.set_preferences
+    return Response(request.user.set_preferences, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -1307,6 +1407,7 @@ def delete_food(request, location_id, food_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response('food_details', lambda request, location_id: [f"location:{location_id}"])
 def get_food_details(request, location_id):
     try:
         location = FoodPlace.objects.get(id=location_id)
@@ -1320,25 +1421,15 @@ def get_food_details(request, location_id):
 
 @api_view(['GET'])
 def get_preference_percentages(request):
-    preferences_count = Preferences.objects.aggregate(
-        total_users=Count('user'),
-        art_users=Count('user', filter=models.Q(art=True)),
-        activity_users=Count('user', filter=models.Q(activity=True)),
-        culture_users=Count('user', filter=models.Q(culture=True)),
-        entertainment_users=Count('user', filter=models.Q(entertainment=True)),
-        history_users=Count('user', filter=models.Q(history=True)),
-        nature_users=Count('user', filter=models.Q(nature=True)),
-        religion_users=Count('user', filter=models.Q(religion=True))
-    )
+    counters = RollupManager().get_counters()
 
     preference_percentages = {}
     counts = []
-    total_users = preferences_count['total_users']
-    for preference, count in preferences_count.items():
-        if preference != 'total_users' and preference.endswith('_users'):
-            preference_name = preference[:-6]
-            preference_percentages[preference_name] = (count / total_users) * 100
-            counts.append({'preference_name': preference_name, 'count': count})
+    total_users = counters['preferences']
+    for preference_name in PREFERENCE_FIELDS:
+        count = counters[f"preferences_{preference_name}"]
+        preference_percentages[preference_name] = (count / total_users) * 100
+        counts.append({'preference_name': preference_name, 'count': count})
 
     return Response({'preference_percentages': preference_percentages,
                      'counts': counts}, status=status.HTTP_200_OK)
@@ -1346,32 +1437,31 @@ def get_preference_percentages(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_counts(request):
-    user_count = User.objects.count()
-    location_count = Location.objects.count()
-    spot_count = Spot.objects.count()
-    accommodation_count = Accommodation.objects.count()
-    food_place_count = FoodPlace.objects.count()
-    itinerary_count = Itinerary.objects.count()
+    counters = RollupManager().get_counters()
 
     counts = {
-        'user_count': user_count,
-        'location_count': location_count,
-        'spot_count': spot_count,
-        'accommodation_count': accommodation_count,
-        'food_place_count': food_place_count,
-        'itinerary_count': itinerary_count,
+        'user_count': counters['users'],
+        'location_count': counters['locations'],
+        'spot_count': counters['spots'],
+        'accommodation_count': counters['accommodations'],
+        'food_place_count': counters['food_places'],
+        'itinerary_count': counters['itineraries'],
     }
 
     return Response({'dashboard_datacount':counts}, status=status.HTTP_200_OK)
 
 
+def get_top_rated_locations(location_model):
+    # ratings come from the location stats rollup instead of aggregating every review
+    return location_model.objects.filter(stats__review_count__gt=0).annotate(
+        average_rating=Cast('stats__rating_total', models.FloatField()) / F('stats__review_count'),
+        total_reviews=F('stats__review_count')
+    ).order_by('-average_rating', '-total_reviews', 'id')[:10]
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_top_spots(request):
-    top_spots = Spot.objects.annotate(
-        average_rating=Avg('review__rating'),
-        total_reviews=Count('review')
-    ).exclude(total_reviews=0).order_by('-average_rating', '-total_reviews')[:10]
+    top_spots = get_top_rated_locations(Spot)
 
     spots = LocationTopSerializer(top_spots, many=True)
     return Response({'top_spots': spots.data}, status=status.HTTP_200_OK)
@@ -1431,14 +1521,13 @@ def get_foodtags_percent(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_visited_spot_tag(request):
-    completed_days = Day.objects.filter(completed=True)
-    visited_spots = Spot.objects.filter(location_ptr__itineraryitem__day__in=completed_days).exclude(tags__name__isnull=True)
-    tags_occurrences = visited_spots.values('tags__name').annotate(tag_count=Count('tags__name')).order_by('-tag_count')
+    # every visit of a spot counts once for each of its tags
+    tags_occurrences = Tag.objects.annotate(tag_count=Sum('spots__stats__visit_count')).filter(tag_count__gt=0).order_by('-tag_count').values('name', 'tag_count')
     total_tags = sum(tag['tag_count'] for tag in tags_occurrences)
     
     data = [
         {
-            'tag': tag['tags__name'],
+            'tag': tag['name'],
             'count': tag['tag_count'],
             'percentage': (tag['tag_count'] / total_tags) * 100
         } for tag in tags_occurrences
@@ -1450,14 +1539,17 @@ def get_visited_spot_tag(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_visited_spot_activity(request):
-    completed_days = Day.objects.filter(completed=True)
-    visited_spots = Spot.objects.filter(location_ptr__itineraryitem__day__in=completed_days).exclude(activity__name__isnull=True)
-    activities_occurrences = visited_spots.values('activity__name').annotate(activity_count=Count('activity__name')).order_by('-activity_count')
+    activities_occurrences = (
+        Activity.objects.annotate(activity_count=Sum('spots__stats__visit_count'))
+            .filter(activity_count__gt=0)
+            .order_by('-activity_count')
+            .values('name', 'activity_count')
+    )
     total_activities = sum(activity['activity_count'] for activity in activities_occurrences)
     
     data = [
         {
-            'activity': activity['activity__name'],
+            'activity': activity['name'],
             'count': activity['activity_count'],
             'percentage': (activity['activity_count'] / total_activities) * 100
         } for activity in activities_occurrences
@@ -1469,14 +1561,12 @@ def get_visited_spot_activity(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_visited_foodplace_tag(request):
-    completed_days = Day.objects.filter(completed=True)
-    visited_foodplaces = FoodPlace.objects.filter(location_ptr__itineraryitem__day__in=completed_days).exclude(tags__name__isnull=True)
-    foodtags_occurrences = visited_foodplaces.values('tags__name').annotate(tag_count=Count('tags__name')).order_by('-tag_count')
+    foodtags_occurrences = FoodTag.objects.annotate(tag_count=Sum('foodplaces__stats__visit_count')).filter(tag_count__gt=0).order_by('-tag_count').values('name', 'tag_count')
     total_foodtags = sum(tag['tag_count'] for tag in foodtags_occurrences)
     
     data = [
         {
-            'foodtag': tag['tags__name'],
+            'foodtag': tag['name'],
             'count': tag['tag_count'],
             'percentage': (tag['tag_count'] / total_foodtags) * 100
         } for tag in foodtags_occurrences
@@ -1488,10 +1578,7 @@ def get_visited_foodplace_tag(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_top_accommodations(request):
-    top_accommodations = Accommodation.objects.annotate(
-        average_rating=Avg('review__rating'),
-        total_reviews=Count('review')
-    ).exclude(total_reviews=0).order_by('-average_rating', '-total_reviews')[:10]
+    top_accommodations = get_top_rated_locations(Accommodation)
 
     accommodations = LocationTopSerializer(top_accommodations, many=True)
     return Response({'top_accommodations': accommodations.data}, status=status.HTTP_200_OK)
@@ -1500,10 +1587,7 @@ def get_top_accommodations(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_top_foodplaces(request):
-    top_food_places = FoodPlace.objects.annotate(
-        average_rating=Avg('review__rating'),
-        total_reviews=Count('review')
-    ).exclude(total_reviews=0).order_by('-average_rating', '-total_reviews')[:10]
+    top_food_places = get_top_rated_locations(FoodPlace)
 
     food_places = LocationTopSerializer(top_food_places, many=True)
     return Response({'top_food_places': food_places.data}, status=status.HTTP_200_OK)
@@ -1513,9 +1597,9 @@ def get_top_foodplaces(request):
 @permission_classes([IsAuthenticated])
 def get_top_bookmarks(request):
     top_bookmarked_locations = (
-        Location.objects.annotate(bookmark_count=Count('bookmark'))
-            .filter(bookmark_count__gt=0)
-            .order_by('-bookmark_count')[:10]
+        Location.objects.filter(stats__bookmark_count__gt=0)
+            .annotate(bookmark_count=F('stats__bookmark_count'))
+            .order_by('-bookmark_count', 'id')[:10]
     )
     serializer = BookmarkCountSerializer(top_bookmarked_locations, many=True)
     return Response({'top_bookmarks':serializer.data}, status=status.HTTP_200_OK)
@@ -1585,6 +1669,7 @@ def delete_service(request, location_id, service_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response('service_details', lambda request, location_id: [f"location:{location_id}"])
 def get_service_details(request, location_id):
     try:
         location = Accommodation.objects.get(id=location_id)
@@ -1599,26 +1684,27 @@ def get_service_details(request, location_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_all_completed_days(request):
-    completed_days = Day.objects.filter(completed=True, rating__gt=0)
+    completed_days = CompletedDaySerializer.setup_eager_loading(Day.objects.filter(completed=True, rating__gt=0))
 
-    serializer = CompletedDaySerializer(completed_days, many=True)
-
-    return Response(serializer.data)
+    return list_response(request, completed_days, CompletedDaySerializer, ordering=('date', 'id'))
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@catalog_condition('events')
+@cache_response('events', lambda request: ['events'])
 def get_all_events(request):
     events = Event.objects.all()
-    serializer = EventSerializerAdmin(events, many=True)
-    return Response(serializer.data)
+    return list_response(request, events, EventSerializerAdmin, ordering=('start_date', 'id'), context={'request': request})
 
 @api_view(["GET"])
+@catalog_condition('events', daily=True)
+@cache_response('upcoming_events', lambda request: ['events'], daily=True)
 def get_upcoming_events(request):
     today = timezone.now().date()
     upcoming_events = Event.objects.filter(start_date__gte=today)
 
-    serializer = EventSerializerAdmin(upcoming_events, many=True)
+    serializer = EventSerializerAdmin(upcoming_events, many=True, context={'request': request})
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 @api_view(["POST"])
@@ -1695,42 +1781,71 @@ def delete_event(request, event_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_business_stats(request, location_id):
+    user = request.user
     try:
-        location = Location.objects.get(id=location_id)
+        if user.is_staff:
+            location = Location.objects.get(id=location_id)
+        else:
+            location = Location.objects.get(owner=user, id=location_id)
     except Location.DoesNotExist:
         return Response({'error': 'Location not found or you do not have access'}, status=status.HTTP_404_NOT_FOUND)
 
-    total_bookmarks = Bookmark.objects.filter(location=location).count()
-    average_rating = Review.objects.filter(location=location).aggregate(Avg('rating'))['rating__avg']
-    average_rating = round(average_rating, 2) if average_rating is not None else 0
-    total_reviews = Review.objects.filter(location=location).count()
-    total_visits = ItineraryItem.objects.filter(
-        location=location,
-        day__completed=True
-    ).count()
-
-    total_planned = ItineraryItem.objects.filter(
-        location=location,
-    ).count()
+    # lifetime totals come from the location's stats row, the daily rows are only read for the series
+    totals = RollupManager().get_location_totals(location.id)
+    average_rating = round(totals['rating_total'] / totals['reviews'], 2) if totals['reviews'] else 0
 
     stats = {
-        'total_bookmarks': total_bookmarks,
+        'total_bookmarks': totals['bookmarks'],
         'average_rating': average_rating,
-        'total_reviews': total_reviews,
-        'total_visits': total_visits,
-        'total_planned': total_planned,
+        'total_reviews': totals['reviews'],
+        'total_visits': totals['completed_visits'],
+        'total_planned': totals['planned_visits'],
     }
 
     return Response(stats, status=status.HTTP_200_OK)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_business_stats_series(request, location_id):
+    bucket = request.query_params.get('bucket', 'day')
+
+    if bucket not in ('day', 'week', 'month'):
+        return Response({'error': 'bucket must be day, week or month'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() if 'end' in request.query_params else timezone.localdate()
+        start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() if 'start' in request.query_params else end - timedelta(days=364)
+    except (ValueError, OverflowError):
+        return Response({'error': 'start and end must be given as YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if end < start:
+        return Response({'error': 'end must not be before start'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_buckets = RollupManager.max_series_buckets[bucket]
+
+    if RollupManager().count_buckets(bucket, start, end) > max_buckets:
+        return Response({'error': f'a {bucket} series covers at most {max_buckets} buckets'}, status=status.HTTP_400_BAD_REQUEST)
+
+    locations = Location.objects.filter(id=location_id)
+
+    if not request.user.is_staff:
+        locations = locations.filter(owner=request.user)
+
+    if not locations.exists():
+        return Response({'error': 'Location not found or you do not have access'}, status=status.HTTP_404_NOT_FOUND)
+
+    series = RollupManager().get_location_series(location_id, bucket, start, end)
+
+    return Response({'bucket': bucket, 'start': start, 'end': end, 'series': series}, status=status.HTTP_200_OK)
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_top_locations_itinerary(request):
     top_locations = Location.objects.filter(
-        itineraryitem__day__completed=True
+        stats__visit_count__gt=0
     ).annotate(
-        total_occurrences=Count('itineraryitem__day')
-    ).order_by('-total_occurrences')
+        total_occurrences=F('stats__visit_count')
+    ).order_by('-total_occurrences', 'id')
 
     paginator = PageNumberPagination()
     paginator.page_size = 10 
@@ -1743,6 +1858,7 @@ def get_top_locations_itinerary(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@catalog_condition('events')
 def get_event(request, event_id):
     event = Event.objects.get(id=event_id)
     serializer = EventSerializerAdmin(event)
@@ -1769,6 +1885,8 @@ def create_fee(request, location_id):
 
 
 @api_view(["GET"])
+@catalog_condition('fees')
+@cache_response('fees', lambda request, location_id: [f"location:{location_id}"])
 def get_fees(request, location_id):
     spot = Spot.objects.get(id=location_id)
     fees = FeeType.objects.filter(spot=spot)
@@ -1903,6 +2021,8 @@ def get_create_foodtag(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@catalog_condition('tags')
+@cache_response('tags', lambda request: ['tags'])
 def get_spot_tags(request):
     tags = Tag.objects.all()
     serializer = TagSerializer(tags, many=True)
@@ -2023,7 +2143,7 @@ def get_spot_chain_recommendations(request, day_id):
         recommendation = Location.objects.get(pk=id)
         recommendations.append(recommendation)
 
-    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'location_id': origin_location.id})
+    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'location_id': origin_location.id, 'request': request})
 
     return Response(recommendation_serializers.data, status=status.HTTP_200_OK)
 
@@ -2045,7 +2165,7 @@ def get_food_chain_recommendations(request, day_id):
         recommendation = Location.objects.get(pk=id)
         recommendations.append(recommendation)
 
-    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'location_id': visit_list[-1]})
+    recommendation_serializers = RecommendedLocationSerializer(recommendations, many=True, context={'location_id': visit_list[-1], 'request': request})
 
     return Response(recommendation_serializers.data, status=status.HTTP_200_OK)
 
@@ -2121,9 +2241,7 @@ def edit_driver(request, driver_id):
 @permission_classes([IsAuthenticated])
 def get_drivers(request):
     drivers = Driver.objects.all()
-    serializer = DriverSerializer(drivers, many=True)
-
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return list_response(request, drivers, DriverSerializer)
 
 
 @api_view(['GET'])
@@ -2149,9 +2267,8 @@ def create_contact_form(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_contact_forms(request):
-    contact_forms = ContactForm.objects.all()
-    serializer = ContactFormSerializer(contact_forms, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    contact_forms = ContactForm.objects.all().select_related('user')
+    return list_response(request, contact_forms, ContactFormSerializer, ordering=('-date_created', '-id'))
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
@@ -2198,78 +2315,49 @@ def get_foodplace_recommendations(request):
         location = Location.objects.get(id=id)
         recommendation_locations.append(location)
 
-    serializer = RecommendedLocationSerializer(recommendation_locations, many=True)
+    serializer = RecommendedLocationSerializer(recommendation_locations, many=True, context={'request': request})
 
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
+@permission_classes([IsAuthenticated])
 def monthly_report(request, month):
-    current_year = datetime.now().year
-
-    # Calculate the first day and the last day of the selected month
-    first_day = datetime(year=current_year, month=month, day=1)
-    last_day = datetime(year=current_year, month=month, day=calendar.monthrange(current_year, month)[1], hour=23, minute=59, second=59)
-
-    # Query to get all completed days in the selected month
-    completed_days = Day.objects.filter(date__range=(first_day, last_day), completed=True)
-
-    unique_visitors_count = (
-        Itinerary.objects
-        .filter(day__in=completed_days)
-        .values('user')
-        .annotate(max_people=Max('number_of_people'))
-        .aggregate(unique_visitors_count=Sum('max_people'))
-    )['unique_visitors_count']
-
-    # Calculate the frequency of each location visited during the month
-    location_frequency = (
-        ItineraryItem.objects
-        .filter(day__date__range=(first_day, last_day), day__completed=True)
-        .values('location__name')
-        .annotate(frequency=Count('location'))
-    )
+    if not request.user.is_staff:
+        return Response({"error": "You do not have permission"}, status=status.HTTP_403_FORBIDDEN)
 
-    # Additional information about completed trips
-    completed_trips_info = []
-
-    # Group itinerary items by date
-    itinerary_items_by_date = {}
-    total_locations_visited_in_month = 0
-
-    for item in ItineraryItem.objects.filter(day__in=completed_days):
-        date_key = item.day.date
-        total_locations_visited_in_month += 1
-
-        if date_key not in itinerary_items_by_date:
-            itinerary_items_by_date[date_key] = {
-                'total_locations_visited': 0,
-                'percentage_completed': 0,
-                'itinerary_items': [],
-            }
-
-        itinerary_items_by_date[date_key]['total_locations_visited'] += 1
-        itinerary_items_by_date[date_key]['itinerary_items'].append({
-            'location__name': item.location.name,
-            'order': item.order,
-        })
-
-    # Process the grouped information
-    for date_key, data in itinerary_items_by_date.items():
-        percentage_completed = (data['total_locations_visited'] / total_locations_visited_in_month) * 100
-
-        completed_trips_info.append({
-            'date': date_key,
-            'total_locations_visited': data['total_locations_visited'],
-            'percentage_completed_trips': percentage_completed,
-        })
-
-    context = {
-        'completed_trips': len(completed_days),
-        'unique_visitor_counts': unique_visitors_count,
-        'location_frequency': list(location_frequency),
-        'completed_trips_info': completed_trips_info,
-    }
+    year = request.query_params.get('year')
+
+    try:
+        month_start = date(int(year) if year else datetime.now().year, month, 1)
+    except ValueError:
+        return Response({"error": "Invalid year or month"}, status=status.HTTP_400_BAD_REQUEST)
+
+    context = MonthlyReportManager().get_report(month_start, month_start)
+
+    return Response(context, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_report(request):
+    # ?start=2024-01&end=2024-03 sums the monthly rollups of a quarter, a year or any other run of months
+    if not request.user.is_staff:
+        return Response({"error": "You do not have permission"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        start = datetime.strptime(request.query_params.get('start', ''), '%Y-%m').date()
+        end = datetime.strptime(request.query_params.get('end') or request.query_params.get('start', ''), '%Y-%m').date()
+    except ValueError:
+        return Response({"error": "start and end must be given as YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if end < start:
+        return Response({"error": "end must not be before start"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if MonthlyReportManager().count_months(start, end) > MonthlyReportManager.max_months:
+        return Response({"error": f"a report covers at most {MonthlyReportManager.max_months} months"}, status=status.HTTP_400_BAD_REQUEST)
+
+    context = MonthlyReportManager().get_report(start, end)
 
     return Response(context, status=status.HTTP_200_OK)
 
@@ -2326,4 +2414,118 @@ def user_click(request, location_id):
         click.amount += 1
         click.save()
 
-    return Response("Clicked", status=status.HTTP_200_OK)
\ No newline at end of file
+    TrendingManager().record_click(location.id)
+
+    return Response("Clicked", status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_cache_stats(request):
+    if not request.user.is_staff:
+        return Response({"error": "You do not have permission"}, status=status.HTTP_403_FORBIDDEN)
+
+    return Response(response_cache.get_stats(cached_views), status=status.HTTP_200_OK)
+
+@api_view(["POST"])
+def batch_requests(request):
+    urls = request.data.get("requests")
+
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+        return Response({"error": "requests must be a list of relative GET urls"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(urls) > settings.BATCH_MAX_REQUESTS:
+        return Response({"error": f"A batch can have at most {settings.BATCH_MAX_REQUESTS} requests"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({"responses": run_batch(request, urls)}, status=status.HTTP_200_OK)
+
+DASHBOARD_WIDGETS = {
+    'preference': 'dashboard/preference/',
+    'counts': 'dashboard/counts/',
+    'top_spots': 'dashboard/top-spots/',
+    'top_accommodations': 'dashboard/top-accommodations/',
+    'top_foodplaces': 'dashboard/top-foodplaces/',
+    'top_bookmarks': 'dashboard/top-bookmarks/',
+    'top_locations_itinerary': 'dashboard/top-locations-itinerary/',
+    'tags_percent': 'dashboard/tags-percent/',
+    'activity_percent': 'dashboard/activity-percent/',
+    'foodtag_percent': 'dashboard/foodtag-percent/',
+    'user_spot_tags': 'dashboard/user-spot-tags/',
+    'user_spot_activity': 'dashboard/user-spot-activity/',
+    'user_foodplace_tags': 'dashboard/user-foodplace-tags/',
+}
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_dashboard_bundle(request):
+    # every widget of the admin dashboard in one response, computed side by side through the batch runner
+    if not request.user.is_staff:
+        return Response({"error": "You do not have permission"}, status=status.HTTP_403_FORBIDDEN)
+
+    cached = True
+
+    def build():
+        nonlocal cached
+        cached = False
+        started = time.perf_counter()
+        results = run_batch(request, list(DASHBOARD_WIDGETS.values()), max_workers=settings.DASHBOARD_BUNDLE_WORKERS)
+
+        return {
+            'computed_at': timezone.now(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'widgets': {
+                name: {'status': result['status'], 'duration_ms': result['duration_ms'], 'data': result['body']}
+                for name, result in zip(DASHBOARD_WIDGETS, results)
+            },
+        }
+
+    bundle = response_cache.get_or_build(
+        'dashboard_bundle',
+        'all',
+        build,
+        timeout=settings.DASHBOARD_BUNDLE_TIMEOUT,
+        # a failing widget is not kept around for the whole timeout
+        cacheable=lambda bundle: all(widget['status'] == status.HTTP_200_OK for widget in bundle['widgets'].values())
+    )
+
+    return Response({**bundle, 'cached': cached}, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_analytics(request, name):
+    # ?output=csv|parquet&start=YYYY-MM-DD&end=YYYY-MM-DD&gzip=true, streamed in fixed-size chunks
+    if not request.user.is_staff:
+        return Response({"error": "You do not have permission"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() if 'start' in request.query_params else None
+        end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() if 'end' in request.query_params else None
+    except ValueError:
+        return Response({"error": "start and end must be given as YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        file_name, content = generate_export(
+            name,
+            file_format=request.query_params.get('output', 'csv'),
+            start=start,
+            end=end,
+            gzip=request.query_params.get('gzip', '').lower() in ('1', 'true')
+        )
+    except ExportError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    content_types = {'csv': 'text/csv', 'gz': 'application/gzip', 'parquet': 'application/vnd.apache.parquet'}
+    response = StreamingHttpResponse(content, content_type=content_types[file_name.rsplit('.', 1)[1]])
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+
+    return response
+
+
+def serve_media(request, path):
+    # development only, see the media settings for production; blobs never change under their name, so clients
+    # and proxies can keep them forever
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+
+    if is_immutable(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import tempfile
 import environ
 import dj_database_url
 
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'api',
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
@@ -197,6 +199,11 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Django only serves media with DEBUG on. In production the front server serves MEDIA_ROOT under MEDIA_URL and
+# sends blobs and their variants, which never change under their name, as immutable; with nginx for example:
+#   location /media/ { root /mount/render-disk; }
+#   location ~ ^/media/(variants/)?blobs/ { root /mount/render-disk; add_header Cache-Control "public, max-age=31536000, immutable"; }
+# whitenoise only serves files collected at startup, so it cannot take over uploads
 MEDIA_URL = '/media/'
 
 if DEV_MODE == "PRODUCTION":
@@ -206,8 +213,9 @@ else:
 
 STORAGES = {
     # ...
+    # uploads are stored and deduplicated by their content hash, see api/storage.py
     'default': {
-        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'BACKEND': 'api.storage.ContentAddressedStorage',
         'OPTIONS': {},
     },
     "staticfiles": {
@@ -240,6 +248,46 @@ CORS_ALLOWED_ORIGINS = [
 
 AUTH_USER_MODEL = 'api.User'
 
+# minimum pg_trgm word similarity for a location to match a search, and the cap on ranked results
+SEARCH_TRIGRAM_THRESHOLD = 0.4
+SEARCH_MAX_RESULTS = 500
+
+# rows serialized per batch when a list endpoint is requested with ?stream=true
+STREAMING_CHUNK_SIZE = 500
+
+# the catalog response cache lives in its own cache, and it has to be one cache for every worker: signals only
+# invalidate it from the process that made the change, while the ETags are computed from the database. It defaults
+# to files under the temp directory, which every worker on one host shares; RESPONSE_CACHE_URL must point to a
+# shared redis cache (e.g. redis://host:6379/1) once workers run on more than one host
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': env.cache('RESPONSE_CACHE_URL', default=f"filecache://{os.path.join(tempfile.gettempdir(), 'irs-responses')}"),
+}
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# batch/ runs at most this many GET requests per call, up to BATCH_MAX_WORKERS of them at once on their own connections
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# dashboard/bundle/ computes every dashboard widget at once on its own pool and keeps the result for this many seconds
+DASHBOARD_BUNDLE_WORKERS = 8
+DASHBOARD_BUNDLE_TIMEOUT = 60
+
+# the import_* commands read and bulk create this many csv rows at a time
+IMPORT_BATCH_SIZE = 500
+
+# resized copies of every uploaded image as (width, height, crop) per variant, each saved in these formats at
+# this quality; uploads are rendered on a pool of IMAGE_WORKERS processes, 0 renders them while saving
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160, True),
+    'card': (480, 320, True),
+    'hero': (1280, 720, False),
+}
+IMAGE_VARIANT_FORMATS = {'webp': 80, 'jpeg': 82}
+IMAGE_WORKERS = 2
+
 AUTHENTICATION_BACKENDS = [
     'api.backends.EmailBackend',  
     'django.contrib.auth.backends.ModelBackend', 